@@ -1,24 +1,54 @@
 import os
+
+# Socket.IO server mode: threading (default), eventlet or gevent. Eventlet and
+# gevent have to patch the standard library before anything else imports it
+SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')
+if SOCKETIO_ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif SOCKETIO_ASYNC_MODE.startswith('gevent'):
+    from gevent import monkey
+    monkey.patch_all()
+
+import sys
 import uuid
 import logging
 import shutil
 import time
 import threading
+import multiprocessing
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for
-from werkzeug.utils import secure_filename
+from flask import Flask, render_template, request, jsonify, send_from_directory, redirect, url_for, abort
+from werkzeug.utils import secure_filename, safe_join
+from modules.scheduler import JobScheduler, parse_tool_limits, parse_client_weights, parse_api_keys
+from modules.executors import ProcessBackend, parse_tool_backends
+from modules.shared_queue import SharedJobQueue, SharedQueueBackend
+from modules.upload_store import UploadStore, pin_inputs, release_inputs
+from modules.resumable_upload import ResumableUploads
+from modules.result_cache import ResultCache, output_paths
+from modules.downloads import ETagCache, OutputIndex
+from modules.email_delivery import SMTPConnectionPool, EmailDelivery, OutgoingEmail, EmailQueueFullError
+from modules.artifact_index import ArtifactIndex, output_artifacts, parse_tool_ttls
+from modules.metrics import ToolMetrics, job_input_paths, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from modules.batch import BatchRunner
+from modules.offload import Offloader
+from modules.admission import AdmissionControl, default_memory_budget
+from modules.cancellation import AbandonedJobReaper
+from modules.profiling import ProfilingSwitch, PROFILE_MODES, PROFILE_SORT_KEYS, profile_paths, pstats_report, is_admin
 
 # Try to import SocketIO, but make it optional for Vercel deployment
 try:
-    from flask_socketio import SocketIO
+    from flask_socketio import SocketIO, join_room
     SOCKETIO_AVAILABLE = True
 except ImportError:
     SOCKETIO_AVAILABLE = False
     SocketIO = None
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
+    join_room = None
+
+# Make `from app import ...` inside the modules resolve to this module when it
+# is started with `python app.py`, instead of importing a second copy of it
+if __name__ == '__main__':
+    sys.modules.setdefault('app', sys.modules[__name__])
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -28,10 +58,16 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'pdf-toolkit-secret-key'
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500 MB max upload size
+# Behind a front-end server that understands X-Sendfile (Apache mod_xsendfile,
+# lighttpd), let it send downloads instead of a Python worker
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
 
 # Configure Socket.IO (optional for Vercel deployment)
 if SOCKETIO_AVAILABLE:
-    socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+    # With several web nodes, SOCKETIO_MESSAGE_QUEUE (e.g. redis://host:6379/0)
+    # lets a node emit to clients connected to another one
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=SOCKETIO_ASYNC_MODE,
+                        message_queue=os.environ.get('SOCKETIO_MESSAGE_QUEUE') or None)
 else:
     # Create a mock socketio object for compatibility
     class MockSocketIO:
@@ -62,44 +98,272 @@ def add_header(response):
     return response
 
 # Configure upload and output folders
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
-OUTPUT_FOLDER = os.path.join(BASE_DIR, 'output')
-TEMP_FOLDER = os.path.join(BASE_DIR, 'temp')
+from modules.config import (BASE_DIR, UPLOAD_FOLDER, OUTPUT_FOLDER, TEMP_FOLDER, CACHE_FOLDER, ARTIFACT_INDEX_PATH,
+                            PROFILE_FOLDER, SHARED_QUEUE_PATH, DEFAULT_TOOL_CONCURRENCY, DEFAULT_TOOL_BACKENDS,
+                            DEFAULT_INTERACTIVE_TOOLS)
 
 # Create folders if they don't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 os.makedirs(TEMP_FOLDER, exist_ok=True)
 
+
 # Email configuration
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 587))
 EMAIL_USER = os.environ.get('EMAIL_USER', '')
 EMAIL_PASSWORD = os.environ.get('EMAIL_PASSWORD', '')
 EMAIL_FROM = os.environ.get('EMAIL_FROM', 'pdf-toolkit@example.com')
+EMAIL_STARTTLS = os.environ.get('EMAIL_STARTTLS', '1').lower() in ('1', 'true', 'yes')
+EMAIL_CONNECTIONS = int(os.environ.get('EMAIL_CONNECTIONS', 2))  # pooled SMTP connections
+EMAIL_QUEUE_SIZE = int(os.environ.get('EMAIL_QUEUE_SIZE', 100))
+EMAIL_MAX_RETRIES = int(os.environ.get('EMAIL_MAX_RETRIES', 3))
+EMAIL_RETRY_DELAY = int(os.environ.get('EMAIL_RETRY_DELAY', 5))  # seconds, doubled after each retry
+
+# NODE_ROLE=web runs no jobs itself: they go to a durable queue shared with
+# `python -m modules.worker` processes, so web and worker nodes can be scaled
+# separately. The default, 'all', runs jobs in this process
+NODE_ROLE = os.environ.get('NODE_ROLE', 'all')
+
+# Job scheduler configuration
+# TOOL_CONCURRENCY overrides the per-tool limits, e.g. "ocr=2,merge=8". On a
+# web node jobs go straight to the shared queue, and JOB_QUEUE_SIZE and
+# JOB_QUEUE_PER_CLIENT apply to that queue as a whole
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', max(4, os.cpu_count() or 1)))
+JOB_QUEUE_SIZE = int(os.environ.get('JOB_QUEUE_SIZE', 100))
+JOB_DEFAULT_CONCURRENCY = int(os.environ.get('JOB_DEFAULT_CONCURRENCY', 4))
+JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 3600))  # seconds a finished job stays queryable
+TOOL_CONCURRENCY = dict(DEFAULT_TOOL_CONCURRENCY)
+TOOL_CONCURRENCY.update(parse_tool_limits(os.environ.get('TOOL_CONCURRENCY', '')))
+
+# CPU-bound tools run in worker processes so they don't serialize on the GIL
+# TOOL_BACKENDS overrides the choice, e.g. "compress=thread,split=process"
+PROCESS_WORKERS = int(os.environ.get('PROCESS_WORKERS', os.cpu_count() or 1))
+TOOL_BACKENDS = dict(DEFAULT_TOOL_BACKENDS)
+TOOL_BACKENDS.update(parse_tool_backends(os.environ.get('TOOL_BACKENDS', '')))
+
+# Under eventlet/gevent, job workers are OS threads, and blocking work started
+# from the hub (inline requests, input probing, job hooks) runs on a pool of OS
+# threads so it doesn't freeze every connection
+OFFLOAD_THREADS = int(os.environ.get('OFFLOAD_THREADS', JOB_WORKERS * 2))
+offloader = Offloader(getattr(socketio, 'async_mode', 'threading'), threads=OFFLOAD_THREADS)
+
+# Jobs are only started while their estimated peak memory fits in the budget;
+# rendering jobs too large for it are run at a lower DPI (down to MIN_RENDER_DPI)
+# or rejected. JOB_MEMORY_BUDGET_MB=0 turns admission control off
+JOB_MEMORY_BUDGET_MB = int(os.environ.get('JOB_MEMORY_BUDGET_MB', default_memory_budget() // (1024 * 1024)))
+MIN_RENDER_DPI = int(os.environ.get('MIN_RENDER_DPI', 100))
+admission_control = AdmissionControl(JOB_MEMORY_BUDGET_MB * 1024 * 1024, min_dpi=MIN_RENDER_DPI) if JOB_MEMORY_BUDGET_MB else None
+
+# Queued jobs are shared out fairly between clients (API key, session or IP
+# address). CLIENT_WEIGHTS gives some of them a bigger share, e.g.
+# "key:SECRET=4,ip:10.0.0.5=2". JOB_QUEUE_PER_CLIENT caps one client's waiting jobs
+CLIENT_WEIGHTS = parse_client_weights(os.environ.get('CLIENT_WEIGHTS', ''))
+# X-API-Key only identifies a client for the keys listed in API_KEYS or CLIENT_WEIGHTS
+API_CLIENTS = parse_api_keys(os.environ.get('API_KEYS', '')) | {
+    client for client in CLIENT_WEIGHTS if client.startswith('key:')
+}
+JOB_QUEUE_PER_CLIENT = int(os.environ.get('JOB_QUEUE_PER_CLIENT', 25))
+
+# Jobs of these tools with at most INTERACTIVE_MAX_PAGES pages go in the
+# interactive lane, which is served first and keeps INTERACTIVE_WORKERS workers
+# to itself, so a quick rotate never waits behind bulk OCR
+INTERACTIVE_TOOLS = [tool.strip() for tool in os.environ.get('INTERACTIVE_TOOLS', DEFAULT_INTERACTIVE_TOOLS).split(',') if tool.strip()]
+INTERACTIVE_MAX_PAGES = int(os.environ.get('INTERACTIVE_MAX_PAGES', 20))
+INTERACTIVE_WORKERS = int(os.environ.get('INTERACTIVE_WORKERS', 1))
+
+# A web node puts every job in the shared queue when it is submitted; the
+# workers apply the per-tool limits and backends and reserve memory for the
+# jobs they run
+if NODE_ROLE == 'web':
+    shared_queue = SharedJobQueue(SHARED_QUEUE_PATH)
+    job_backends = {'shared': SharedQueueBackend(shared_queue, client_weights=CLIENT_WEIGHTS, retention=JOB_RETENTION)}
+    job_tool_limits, job_tool_backends, job_default_backend = {}, {}, 'shared'
+    logger.info(f"Running as a web node; jobs go to the shared queue at {SHARED_QUEUE_PATH}")
+else:
+    shared_queue = None
+    job_backends = {'process': ProcessBackend(max_processes=PROCESS_WORKERS)}
+    job_tool_limits, job_tool_backends, job_default_backend = TOOL_CONCURRENCY, TOOL_BACKENDS, 'thread'
+
+# Create the job scheduler shared by all tool routes
+job_scheduler = JobScheduler(
+    max_workers=JOB_WORKERS,
+    max_queue_size=JOB_QUEUE_SIZE,
+    tool_limits=job_tool_limits,
+    default_limit=JOB_WORKERS if NODE_ROLE == 'web' else JOB_DEFAULT_CONCURRENCY,
+    backends=job_backends,
+    tool_backends=job_tool_backends,
+    default_backend=job_default_backend,
+    job_retention=JOB_RETENTION,
+    offloader=offloader,
+    admission=admission_control,
+    client_weights=CLIENT_WEIGHTS,
+    max_queued_per_client=JOB_QUEUE_PER_CLIENT,
+    interactive_tools=INTERACTIVE_TOOLS,
+    interactive_max_pages=INTERACTIVE_MAX_PAGES,
+    interactive_workers=INTERACTIVE_WORKERS
+)
+
+# Jobs whose Socket.IO room has been empty for JOB_ABANDON_GRACE seconds are
+# cancelled, e.g. when the tab was closed; 0 turns this off
+JOB_ABANDON_GRACE = int(os.environ.get('JOB_ABANDON_GRACE', 60))
+job_reaper = AbandonedJobReaper(job_scheduler, grace=JOB_ABANDON_GRACE) if JOB_ABANDON_GRACE else None
+
+# Per-tool request, latency and throughput metrics, served at /metrics
+tool_metrics = ToolMetrics(job_scheduler)
+job_scheduler.completion_hooks.append(tool_metrics.observe_job)
+
+# Content-addressed store for uploaded files
+upload_store = UploadStore(UPLOAD_FOLDER)
+
+# Cache of finished results for deterministic tools, keyed on input content
+# and options; protect/unlock are left out so passwords never select a cache entry
+RESULT_CACHE_MAX_MB = int(os.environ.get('RESULT_CACHE_MAX_MB', 1024))
+CACHEABLE_TOOLS = {
+    'merge', 'split', 'compress', 'rotate', 'watermark', 'extract-text', 'ocr',
+    'pdf-to-img', 'img-to-pdf', 'pdf-to-word', 'pdf-to-excel', 'pdf-to-ppt'
+}
+result_cache = ResultCache(
+    CACHE_FOLDER,
+    output_folder=OUTPUT_FOLDER,
+    max_bytes=RESULT_CACHE_MAX_MB * 1024 * 1024,
+    upload_store=upload_store
+)
+
+def cache_job_result(job):
+    """Store the outputs of a successful cacheable job"""
+    if job.cache_key and job.state == 'finished' and job.result:
+        result_cache.put(job.cache_key, job.tool, job.message, job.result)
+
+job_scheduler.completion_hooks.append(cache_job_result)
+
+# Uploads and outputs are registered with an expiry when they are created, so
+# cleanup only touches artifacts that are due. TOOL_TTLS overrides the output
+# lifetime per tool, e.g. "split=600,pdf-to-img=600"
+UPLOAD_TTL = int(os.environ.get('UPLOAD_TTL', 900))  # seconds
+OUTPUT_TTL = int(os.environ.get('OUTPUT_TTL', 900))  # seconds
+TOOL_TTLS = parse_tool_ttls(os.environ.get('TOOL_TTLS', ''))
+ARTIFACT_QUOTA_MB = int(os.environ.get('ARTIFACT_QUOTA_MB', 0))  # 0 = no quota
+artifact_index = ArtifactIndex(ARTIFACT_INDEX_PATH, max_bytes=ARTIFACT_QUOTA_MB * 1024 * 1024)
+
+def register_job_outputs(job):
+    """Give a finished job's output files their expiry time"""
+    if job.state == 'finished' and job.result:
+        ttl = TOOL_TTLS.get(job.tool, OUTPUT_TTL)
+        for path in output_artifacts(OUTPUT_FOLDER, job.result):
+            artifact_index.register(path, ttl, kind='output', tool=job.tool)
+
+job_scheduler.completion_hooks.append(register_job_outputs)
+
+# A job's uploads must outlive UPLOAD_TTL while it waits in the queue or runs
+def pin_job_inputs(job):
+    pin_inputs(job_input_paths(job.kwargs))
+
+def release_job_inputs(job):
+    release_inputs(job_input_paths(job.kwargs))
+
+job_scheduler.submit_hooks.append(pin_job_inputs)
+job_scheduler.rejection_hooks.append(release_job_inputs)
+job_scheduler.completion_hooks.append(release_job_inputs)
+
+# Admin features (job profiling) are only available when ADMIN_TOKEN is set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+profiling_switch = ProfilingSwitch()
+
+def register_job_profile(job):
+    """Keep a profiled job's profiles as long as its outputs"""
+    if job.profile:
+        for path in profile_paths(job.id).values():
+            if os.path.exists(path):
+                artifact_index.register(path, TOOL_TTLS.get(job.tool, OUTPUT_TTL), kind='profile', tool=job.tool)
+
+job_scheduler.completion_hooks.append(register_job_profile)
+
+# Content-hash ETags for downloads, computed once per output file
+download_etags = ETagCache()
+
+# Download names of finished jobs' outputs, used to find files to email
+output_index = OutputIndex(OUTPUT_FOLDER)
+
+def index_job_outputs(job):
+    if job.state == 'finished' and job.result:
+        output_index.add_result(job.result)
+        # Hash the outputs now, off the request path, so the first download
+        # of a large file doesn't hash it while the client waits
+        for relative_path in output_paths(job.result):
+            file_path = safe_join(OUTPUT_FOLDER, relative_path)
+            if file_path and os.path.isfile(file_path):
+                download_etags.etag_for(file_path)
+
+job_scheduler.completion_hooks.append(index_job_outputs)
+
+def report_email_status(email, status, message):
+    """Tell the client that asked for an email how delivery went"""
+    if email.sid:
+        socketio.emit('email_status', {'status': status, 'message': message}, to=email.sid)
+    else:
+        socketio.emit('email_status', {'status': status, 'message': message})
+
+# Emails are queued and sent over pooled SMTP connections
+email_delivery = EmailDelivery(
+    SMTPConnectionPool(
+        EMAIL_HOST,
+        EMAIL_PORT,
+        user=EMAIL_USER,
+        password=EMAIL_PASSWORD,
+        starttls=EMAIL_STARTTLS,
+        size=EMAIL_CONNECTIONS
+    ),
+    sender=EMAIL_FROM,
+    notify=report_email_status,
+    workers=EMAIL_CONNECTIONS,
+    max_queue_size=EMAIL_QUEUE_SIZE,
+    max_retries=EMAIL_MAX_RETRIES,
+    retry_delay=EMAIL_RETRY_DELAY
+)
+
+# Chunked uploads that can be resumed after a dropped connection; an
+# unfinished upload is kept for RESUMABLE_UPLOAD_TTL seconds after its last chunk
+RESUMABLE_UPLOAD_TTL = int(os.environ.get('RESUMABLE_UPLOAD_TTL', 24 * 3600))
+resumable_uploads = ResumableUploads(upload_store, ttl=RESUMABLE_UPLOAD_TTL)
 
-# Import modules
-from modules.merge_pdf import register_routes as register_merge_routes
-from modules.split_pdf import register_routes as register_split_routes
-from modules.compress_pdf import register_routes as register_compress_routes
-from modules.convert_pdf import register_routes as register_convert_routes
-from modules.extract_pdf import register_routes as register_extract_routes
-from modules.ocr_pdf import register_routes as register_ocr_routes
-from modules.protect_pdf import register_routes as register_protect_routes
-from modules.organize_pdf import register_routes as register_organize_routes
-from modules.edit_pdf import register_routes as register_edit_routes
-
-# Register module routes
-register_merge_routes(app, socketio)
-register_split_routes(app, socketio)
-register_compress_routes(app, socketio)
-register_convert_routes(app, socketio)
-register_extract_routes(app, socketio)
-register_ocr_routes(app, socketio)
-register_protect_routes(app, socketio)
-register_organize_routes(app, socketio)
-register_edit_routes(app, socketio)
+# Small documents sent with ?sync=1 are processed on the request thread and
+# returned in the response; larger ones are queued as jobs as usual
+SYNC_MAX_BYTES = int(os.environ.get('SYNC_MAX_MB', 5)) * 1024 * 1024
+SYNC_MAX_PAGES = int(os.environ.get('SYNC_MAX_PAGES', 50))
+
+# Batches fan their files out over the scheduler, at most BATCH_PARALLELISM
+# files of one batch queued at a time. A batch's files count towards its
+# client's JOB_QUEUE_PER_CLIENT, so a batch may use at most half of that and
+# the same client can still run single jobs while it is going
+BATCH_PARALLELISM = int(os.environ.get('BATCH_PARALLELISM', JOB_WORKERS))
+if JOB_QUEUE_PER_CLIENT and BATCH_PARALLELISM > JOB_QUEUE_PER_CLIENT // 2:
+    if 'BATCH_PARALLELISM' in os.environ:
+        logger.warning(f"Lowering BATCH_PARALLELISM to {max(1, JOB_QUEUE_PER_CLIENT // 2)}, "
+                       f"half of JOB_QUEUE_PER_CLIENT")
+    BATCH_PARALLELISM = max(1, JOB_QUEUE_PER_CLIENT // 2)
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 500))
+BATCH_MAX_EXTRACTED_MB = int(os.environ.get('BATCH_MAX_EXTRACTED_MB', 2048))  # unpacked size of uploaded ZIPs
+batch_runner = BatchRunner(
+    job_scheduler,
+    socketio,
+    OUTPUT_FOLDER,
+    parallelism=BATCH_PARALLELISM,
+    result_cache=result_cache,
+    cacheable_tools=CACHEABLE_TOOLS
+)
+
+# Register tool routes; each tool module (and its heavy dependencies) is
+# imported on its first request, or earlier by the background warm-up
+from modules.tool_registry import ToolRegistry
+from modules.resumable_upload import register_routes as register_resumable_upload_routes
+from modules.batch import register_routes as register_batch_routes
+
+TOOL_WARMUP = os.environ.get('TOOL_WARMUP', '1').lower() in ('1', 'true', 'yes')
+tool_registry = ToolRegistry(app, socketio)
+tool_registry.register_routes()
+register_resumable_upload_routes(app, socketio)
+register_batch_routes(app, socketio)
 
 # Start cleanup thread
 def safe_remove_file(file_path):
@@ -143,8 +407,8 @@ def safe_remove_directory(dir_path):
         logger.error(f"Error removing directory {dir_path}: {str(e)}")
         return False
 
-def cleanup_folder(folder_path):
-    """Clean up a specific folder with improved error handling"""
+def cleanup_folder(folder_path, max_age):
+    """Remove untracked entries older than max_age seconds from a folder"""
     if not os.path.exists(folder_path):
         return
         
@@ -154,6 +418,12 @@ def cleanup_folder(folder_path):
         for filename in os.listdir(folder_path):
             file_path = os.path.join(folder_path, filename)
             
+            # Staging directories (uploads/.incoming, uploads/.resumable) are
+            # swept entry by entry rather than removed as a whole
+            if filename.startswith('.') and os.path.isdir(file_path):
+                cleanup_folder(file_path, max_age)
+                continue
+            
             try:
                 # Skip if we can't access the file
                 if not os.access(file_path, os.R_OK):
@@ -162,8 +432,8 @@ def cleanup_folder(folder_path):
                     
                 file_modified = datetime.fromtimestamp(os.path.getmtime(file_path))
                 
-                # Only clean up files older than 15 minutes
-                if now - file_modified > timedelta(minutes=15):
+                # Registered artifacts are left to the expiry index
+                if now - file_modified > timedelta(seconds=max_age) and not artifact_index.is_registered(file_path):
                     if os.path.isfile(file_path):
                         safe_remove_file(file_path)
                     elif os.path.isdir(file_path):
@@ -173,24 +443,43 @@ def cleanup_folder(folder_path):
     except Exception as e:
         logger.error(f"Error accessing folder {folder_path}: {str(e)}")
 
+# The reaper only reads expired rows from the artifact index; the full folder
+# scan is a rare fallback for files nothing registered (temp files, outputs of
+# failed jobs, leftovers from before a restart)
+ARTIFACT_REAP_INTERVAL = int(os.environ.get('ARTIFACT_REAP_INTERVAL', 60))  # seconds
+ARTIFACT_SWEEP_INTERVAL = int(os.environ.get('ARTIFACT_SWEEP_INTERVAL', 6 * 3600))  # seconds
+SWEEP_MAX_AGE = max([UPLOAD_TTL, OUTPUT_TTL] + list(TOOL_TTLS.values()))
+
 def cleanup_files():
-    """Clean up old files periodically with improved error handling"""
+    """Remove expired artifacts periodically with improved error handling"""
+    last_sweep = None
     while True:
         try:
-            # Clean up each folder
-            cleanup_folder(UPLOAD_FOLDER)
-            cleanup_folder(OUTPUT_FOLDER)
-            cleanup_folder(TEMP_FOLDER)
+            removed = artifact_index.reap()
+            if removed:
+                logger.info(f"Removed {removed} expired artifacts")
             
-            # Sleep for 5 minutes
-            time.sleep(300)
+            if last_sweep is None or time.time() - last_sweep >= ARTIFACT_SWEEP_INTERVAL:
+                last_sweep = time.time()
+                cleanup_folder(UPLOAD_FOLDER, SWEEP_MAX_AGE)
+                cleanup_folder(OUTPUT_FOLDER, SWEEP_MAX_AGE)
+                cleanup_folder(TEMP_FOLDER, SWEEP_MAX_AGE)
+                cleanup_folder(PROFILE_FOLDER, SWEEP_MAX_AGE)
         except Exception as e:
             logger.error(f"Error in cleanup thread: {str(e)}")
-            time.sleep(300)
+        
+        time.sleep(ARTIFACT_REAP_INTERVAL)
 
 # Start cleanup thread
+# Job processes re-import the main module (and with it this file), so only the
+# web process itself runs the cleanup loop and the abandoned job reaper
 cleanup_thread = threading.Thread(target=cleanup_files, daemon=True)
-cleanup_thread.start()
+if multiprocessing.parent_process() is None:
+    cleanup_thread.start()
+    if job_reaper:
+        job_reaper.start()
+    if TOOL_WARMUP:
+        tool_registry.warm_up()
 
 @app.route('/')
 def index():
@@ -200,7 +489,116 @@ def index():
 @app.route('/download/<path:filename>')
 def download_file(filename):
     """Download a file from the output folder"""
-    return send_from_directory(OUTPUT_FOLDER, filename, as_attachment=True)
+    file_path = safe_join(OUTPUT_FOLDER, filename)
+    if file_path is None or not os.path.isfile(file_path):
+        abort(404)
+    
+    # Range requests, If-None-Match/If-Range and 304/206 responses are handled
+    # by send_file's conditional mode; the ETag comes from the file content
+    response = send_from_directory(
+        OUTPUT_FOLDER,
+        filename,
+        as_attachment=True,
+        conditional=True,
+        # Usually computed when the job finished; outputs from before a
+        # restart are hashed here, off the eventlet/gevent hub
+        etag=offloader.call(download_etags.etag_for, file_path)
+    )
+    # Advertise range support on full responses too, so clients know they can resume
+    response.headers.setdefault('Accept-Ranges', 'bytes')
+    return response
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Return the status and results of a job"""
+    job = job_scheduler.get_job(job_id)
+    if job is None:
+        # Queued through another web node
+        job_info = shared_queue.get(job_id) if shared_queue else None
+        if job_info is None:
+            return jsonify({'status': 'error', 'message': 'Job not found.'}), 404
+        return jsonify(job_info)
+    
+    job_info = job.to_dict()
+    job_info['queue_position'] = job_scheduler.queue_position(job)
+    return jsonify(job_info)
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Stop a queued or running job"""
+    job = job_scheduler.get_job(job_id)
+    if job is None and shared_queue:
+        return cancel_shared_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found.'}), 404
+    if job.finished_at is not None and job.state != 'cancelled':
+        return jsonify({'status': 'error', 'message': f'The job has already {job.state}.'}), 409
+    
+    job_scheduler.cancel(job_id, 'Cancelled by the user.')
+    # A running job stops shortly after; its state changes to cancelled when it has
+    job_info = job.to_dict()
+    job_info['queue_position'] = job_scheduler.queue_position(job)
+    return jsonify(job_info), 200 if job.state == 'cancelled' else 202
+
+def cancel_shared_job(job_id):
+    """Cancel a job that was queued through another web node"""
+    state = shared_queue.cancel(job_id)
+    if state is None:
+        return jsonify({'status': 'error', 'message': 'Job not found.'}), 404
+    if state in ('finished', 'failed'):
+        return jsonify({'status': 'error', 'message': f'The job has already {state}.'}), 409
+    return jsonify(shared_queue.get(job_id)), 200 if state == 'cancelled' else 202
+
+@app.route('/metrics')
+def metrics():
+    """Expose metrics in the Prometheus text format"""
+    return tool_metrics.registry.render(), 200, {'Content-Type': METRICS_CONTENT_TYPE}
+
+@app.route('/admin/profiles/<job_id>')
+def job_profile(job_id):
+    """Return a profiled job's profile as pstats, text or collapsed stacks"""
+    if not is_admin(request, ADMIN_TOKEN):
+        abort(404)
+    
+    job = job_scheduler.get_job(job_id)
+    if job is not None and job.profile and job.finished_at is None:
+        return jsonify({'status': 'processing', 'message': 'The job is still running.'}), 409
+    
+    # ?format=pstats (binary, for pstats/snakeviz), text, or collapsed (flamegraphs)
+    profile_format = request.args.get('format', 'text')
+    paths = profile_paths(secure_filename(job_id))
+    path = paths['collapsed'] if profile_format == 'collapsed' else paths['pstats']
+    if not os.path.isfile(path):
+        return jsonify({'status': 'error', 'message': f'No {profile_format} profile for this job.'}), 404
+    
+    if profile_format == 'text':
+        sort = request.args.get('sort', 'cumulative')
+        if sort not in PROFILE_SORT_KEYS:
+            return jsonify({'status': 'error', 'message': f'Expected a sort order ({", ".join(PROFILE_SORT_KEYS)}).'}), 400
+        return pstats_report(path, sort=sort), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    if profile_format == 'collapsed':
+        return send_from_directory(PROFILE_FOLDER, os.path.basename(path), mimetype='text/plain')
+    return send_from_directory(PROFILE_FOLDER, os.path.basename(path), as_attachment=True, mimetype='application/octet-stream')
+
+@app.route('/admin/profiling', methods=['GET', 'POST'])
+def profiling_settings():
+    """Profile the next jobs of a tool, e.g. {"tool": "watermark", "mode": "all", "count": 1}"""
+    if not is_admin(request, ADMIN_TOKEN):
+        abort(404)
+    
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form.to_dict()
+        tool = data.get('tool')
+        mode = data.get('mode', 'all')
+        try:
+            count = int(data.get('count', 1))
+        except (TypeError, ValueError):
+            count = -1
+        if not tool or mode not in PROFILE_MODES or count < 0:
+            return jsonify({'status': 'error', 'message': f'Expected a tool, a mode ({", ".join(PROFILE_MODES)}) and a count.'}), 400
+        profiling_switch.arm(tool, mode, count)
+    
+    return jsonify({'status': 'success', 'armed': profiling_switch.armed()})
 
 @app.route('/send_email', methods=['POST'])
 def send_email():
@@ -224,23 +622,26 @@ def send_email():
             return response
         
         # Find the file in the output folder
-        for file in os.listdir(OUTPUT_FOLDER):
-            if filename in file:
-                file_path = os.path.join(OUTPUT_FOLDER, file)
-                break
-        else:
+        file_path = output_index.find(filename)
+        if file_path is None:
             response = jsonify({'status': 'error', 'message': 'File not found.'})
             response.headers['Content-Type'] = 'application/json'
             return response
         
-        # Start a background thread for sending email
-        thread = socketio.start_background_task(
-            send_email_task, 
-            file_path=file_path,
-            email=email,
-            subject=subject,
-            message=message
-        )
+        # Queue the email for the delivery workers
+        try:
+            email_delivery.submit(OutgoingEmail(
+                recipient=email,
+                subject=subject,
+                message=message,
+                file_path=file_path,
+                sid=data.get('socket_id')
+            ))
+        except EmailQueueFullError as e:
+            logger.warning(f"Rejected email: {str(e)}")
+            response = jsonify({'status': 'error', 'message': 'Too many emails are waiting to be sent. Please try again in a moment.'})
+            response.headers['Retry-After'] = '30'
+            return response, 429
         
         response = jsonify({'status': 'processing', 'message': 'Sending email...'})
         response.headers['Content-Type'] = 'application/json'
@@ -252,44 +653,6 @@ def send_email():
         response.headers['Content-Type'] = 'application/json'
         return response
 
-def send_email_task(file_path, email, subject, message):
-    """Send email with attachment"""
-    try:
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_FROM
-        msg['To'] = email
-        msg['Subject'] = subject
-        
-        # Add message body
-        msg.attach(MIMEText(message, 'plain'))
-        
-        # Add attachment
-        with open(file_path, 'rb') as f:
-            attachment = MIMEApplication(f.read(), _subtype='pdf')
-            attachment.add_header('Content-Disposition', 'attachment', filename=os.path.basename(file_path))
-            msg.attach(attachment)
-        
-        # Send email
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            if EMAIL_USER and EMAIL_PASSWORD:
-                server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.send_message(msg)
-        
-        # Emit success event
-        socketio.emit('email_status', {
-            'status': 'success',
-            'message': 'Email sent successfully!'
-        })
-    
-    except Exception as e:
-        logger.error(f"Error sending email: {str(e)}")
-        socketio.emit('email_status', {
-            'status': 'error',
-            'message': f'Error sending email: {str(e)}'
-        })
-
 @app.errorhandler(413)
 def request_entity_too_large(error):
     """Handle file too large error"""
@@ -321,6 +684,36 @@ def handle_connect():
 def handle_disconnect():
     """Handle client disconnection"""
     logger.info(f"Client disconnected: {request.sid}")
+    if job_reaper:
+        job_reaper.disconnected(request.sid)
+
+@socketio.on('join_job')
+def handle_join_job(data):
+    """Subscribe the client to a job's status updates"""
+    job_id = (data or {}).get('job_id')
+    job = job_scheduler.get_job(job_id) if job_id else None
+    if job is None:
+        # Updates of a job queued through another web node reach this client
+        # through SOCKETIO_MESSAGE_QUEUE, if one is configured
+        if shared_queue and job_id and shared_queue.get(job_id):
+            join_room(job_id)
+        return
+    
+    join_room(job.id)
+    if job_reaper:
+        job_reaper.joined(request.sid, job.id)
+    
+    # Replay the current state so updates sent before joining aren't missed
+    if job.message:
+        snapshot = {
+            'status': job.status,
+            'message': job.message,
+            'progress': job.progress,
+            'tool': job.tool,
+            'job_id': job.id
+        }
+        snapshot.update(job.result or {})
+        socketio.emit('status_update', snapshot, to=request.sid)
 
 if __name__ == '__main__':
     # Run the app locally
@@ -0,0 +1,170 @@
+"""Smoke-test the app under each Socket.IO async mode.
+
+Every mode runs in its own interpreter, because eventlet and gevent have to
+monkey-patch the standard library before app.py is imported. Each run queues
+a mix of thread-backend and process-backend jobs, a batch, an inline ?sync=1
+request and a cancellation, and fails if any of them doesn't finish within
+the timeout (a deadlock between the hub and the job threads shows up as a
+timeout) or a job's events don't reach a Socket.IO client. Modes whose
+library isn't installed are skipped.
+
+    python benchmarks/async_modes.py                        # threading, eventlet, gevent
+    python benchmarks/async_modes.py --modes eventlet --timeout 120
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import importlib.util
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+MODES = ('threading', 'eventlet', 'gevent')
+
+# Jobs queued in each run: (route, form fields, file field, pages)
+JOBS = [
+    ('/rotate', {'angle': '90'}, 'pdf', 4),
+    ('/rotate', {'angle': '180'}, 'pdf', 6),
+    ('/split', {'split_method': 'all'}, 'pdf', 5),
+    ('/compress', {'compression_level': 'medium'}, 'pdf', 8),
+    ('/compress', {'compression_level': 'high'}, 'pdf', 3),
+    ('/watermark', {'watermark_text': 'SMOKE'}, 'pdf', 4),
+    ('/extract_text', {}, 'pdf', 3)
+]
+
+
+def make_pdf(pages, label):
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    document = canvas.Canvas(buffer)
+    for page in range(pages):
+        document.drawString(100, 700, f'{label} page {page + 1}')
+        document.showPage()
+    document.save()
+    return buffer.getvalue()
+
+
+def run_checks(timeout):
+    """Run the jobs in this interpreter and return a list of failures"""
+    import app
+
+    client = app.app.test_client()
+    events = app.socketio.test_client(app.app, flask_test_client=client)
+    failures = []
+    job_ids = {}
+
+    def post(route, fields, files):
+        data = dict(fields)
+        for field, filename, content in files:
+            data.setdefault(field, []).append((io.BytesIO(content), filename))
+        response = client.post(route, data=data, content_type='multipart/form-data')
+        return response.status_code, response.get_json(silent=True) or {}
+
+    for index, (route, fields, field, pages) in enumerate(JOBS):
+        status, body = post(route, fields, [(field, f'job{index}.pdf', make_pdf(pages, f'job{index}'))])
+        if 'job_id' not in body:
+            failures.append(f'{route}: HTTP {status} {body.get("message")}')
+        else:
+            job_ids[f'{route} #{index}'] = body['job_id']
+
+    files = [('files[]', f'batch{index}.pdf', make_pdf(3 + index, f'batch{index}')) for index in range(4)]
+    status, body = post('/batch', {'tool': 'compress', 'compression_level': 'medium'}, files)
+    if 'job_id' not in body:
+        failures.append(f'/batch: HTTP {status} {body.get("message")}')
+    else:
+        job_ids['/batch'] = body['job_id']
+
+    status, body = post('/rotate?sync=1', {'angle': '90'}, [('pdf', 'inline.pdf', make_pdf(2, 'inline'))])
+    if status != 200:
+        failures.append(f'/rotate?sync=1: HTTP {status}')
+
+    status, body = post('/split', {'split_method': 'all'}, [('pdf', 'cancel.pdf', make_pdf(40, 'cancel'))])
+    if 'job_id' in body:
+        client.post(f'/jobs/{body["job_id"]}/cancel')
+        job_ids['cancelled /split'] = body['job_id']
+
+    deadline = time.monotonic() + timeout
+    for name, job_id in job_ids.items():
+        while True:
+            job = client.get(f'/jobs/{job_id}').get_json()
+            if job['state'] not in ('queued', 'running'):
+                break
+            if time.monotonic() > deadline:
+                failures.append(f'{name}: still {job["state"]} after {timeout}s')
+                break
+            time.sleep(0.1)
+        if job['state'] == 'failed':
+            failures.append(f'{name}: {job.get("error") or job.get("message")}')
+
+    # Progress from the offload threads must still reach Socket.IO clients
+    status, body = post('/rotate', {'angle': '90'}, [('pdf', 'events.pdf', make_pdf(3, 'events'))])
+    events.emit('join_job', {'job_id': body.get('job_id')})
+    statuses = []
+    deadline = time.monotonic() + timeout
+    while 'success' not in statuses and time.monotonic() < deadline:
+        statuses += [event['args'][0].get('status') for event in events.get_received()
+                     if event['name'] == 'status_update']
+        time.sleep(0.1)
+    if 'success' not in statuses:
+        failures.append(f'Socket.IO: no success event, got {statuses}')
+    return failures
+
+
+def run_mode(mode, timeout):
+    """Run the checks under one async mode; return (outcome, details)"""
+    if mode != 'threading' and importlib.util.find_spec(mode) is None:
+        return 'skipped', f'{mode} is not installed'
+
+    storage = tempfile.mkdtemp(prefix=f'async-smoke-{mode}-')
+    env = dict(os.environ, SOCKETIO_ASYNC_MODE=mode, STORAGE_DIR=storage, TOOL_WARMUP='0')
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', '--timeout', str(timeout)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=timeout + 60
+        )
+    except subprocess.TimeoutExpired:
+        return 'failed', f'hung for more than {timeout + 60}s'
+    finally:
+        shutil.rmtree(storage, ignore_errors=True)
+
+    lines = completed.stdout.strip().splitlines()
+    try:
+        failures = json.loads(lines[-1])
+    except (IndexError, ValueError):
+        return 'failed', (completed.stderr.strip().splitlines() or ['no output'])[-1]
+    return ('failed', '; '.join(failures)) if failures else ('passed', '')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--modes', default=','.join(MODES), help='comma-separated async modes to test')
+    parser.add_argument('--timeout', type=int, default=60, help='seconds to wait for the jobs of one mode')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.child:
+        # The result goes on the last line; app logging goes to stderr
+        print(json.dumps(run_checks(args.timeout)))
+        sys.stdout.flush()
+        os._exit(0)
+
+    failed = False
+    for mode in [mode.strip() for mode in args.modes.split(',') if mode.strip()]:
+        outcome, details = run_mode(mode, args.timeout)
+        failed = failed or outcome == 'failed'
+        print(f'{mode:<10} {outcome}' + (f': {details}' if details else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
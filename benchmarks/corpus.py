@@ -0,0 +1,272 @@
+"""Generate the synthetic document corpus used by the benchmarks.
+
+The same seed and scale always produce the same documents (reportlab runs
+in invariant mode, so there are no timestamps or random IDs in the files),
+which keeps benchmark runs on different machines comparable.
+
+    python benchmarks/corpus.py                  # writes benchmarks/corpus/
+    python benchmarks/corpus.py --scale 4        # four times as many pages
+"""
+import io
+import os
+import sys
+import json
+import shutil
+import random
+import argparse
+
+from reportlab.lib.pagesizes import A0, A4, A7
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from PIL import Image, ImageDraw, ImageFilter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CORPUS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'corpus')
+
+# Password of encrypted.pdf
+ENCRYPTED_PASSWORD = 'benchmark'
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+    'incididunt ut labore et dolore magna aliqua invoice total amount due account '
+    'reference quarterly report revenue margin forecast summary appendix figure table'
+).split()
+
+
+def _sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _canvas(path, pagesize=A4):
+    return canvas.Canvas(path, pagesize=pagesize, invariant=1)
+
+
+def _noise_image(rng, width, height):
+    """A photo-like RGB image: smooth gradients plus noise, which compresses poorly"""
+    image = Image.new('RGB', (width, height))
+    draw = ImageDraw.Draw(image)
+    base = [rng.randint(0, 255) for _ in range(3)]
+    for y in range(0, height, 4):
+        shade = tuple((c + y * 255 // height) % 256 for c in base)
+        draw.rectangle([0, y, width, y + 4], fill=shade)
+    for _ in range(width * height // 400):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randint(2, 12)
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    return image.filter(ImageFilter.GaussianBlur(1))
+
+
+def text_heavy(path, rng, scale):
+    """Dense body text, no images"""
+    c = _canvas(path)
+    width, height = A4
+    for page in range(int(40 * scale)):
+        c.setFont('Helvetica-Bold', 14)
+        c.drawString(72, height - 72, f'Section {page + 1}: {_sentence(rng, 5)}')
+        c.setFont('Helvetica', 9)
+        y = height - 100
+        while y > 72:
+            c.drawString(72, y, _sentence(rng, 16)[:110])
+            y -= 11
+        c.showPage()
+    c.save()
+
+
+def image_heavy(path, rng, scale):
+    """One large photo-like image per page"""
+    c = _canvas(path)
+    width, height = A4
+    for page in range(int(12 * scale)):
+        image = _noise_image(rng, 1240, 1754)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=92)
+        buffer.seek(0)
+        c.drawImage(ImageReader(buffer), 0, 0, width, height)
+        c.setFont('Helvetica', 10)
+        c.drawString(36, 36, f'Photo {page + 1}')
+        c.showPage()
+    c.save()
+
+
+def many_small_pages(path, rng, scale):
+    """Hundreds of tiny pages with a line of text each"""
+    c = _canvas(path, pagesize=A7)
+    for page in range(int(600 * scale)):
+        c.setFont('Helvetica', 8)
+        c.drawString(12, 150, f'Ticket {page + 1}')
+        c.drawString(12, 138, _sentence(rng, 4)[:40])
+        c.showPage()
+    c.save()
+
+
+def few_huge_pages(path, rng, scale):
+    """A handful of A0 pages full of vector drawing, like CAD plots or posters"""
+    c = _canvas(path, pagesize=A0)
+    width, height = A0
+    for page in range(max(1, int(3 * scale))):
+        for _ in range(4000):
+            c.setStrokeColorRGB(rng.random(), rng.random(), rng.random())
+            c.line(rng.uniform(0, width), rng.uniform(0, height), rng.uniform(0, width), rng.uniform(0, height))
+        c.setFont('Helvetica', 6)
+        for row in range(200):
+            c.drawString(40, 40 + row * 15, _sentence(rng, 30))
+        c.showPage()
+    c.save()
+
+
+def encrypted(path, rng, scale):
+    """Text pages protected with ENCRYPTED_PASSWORD"""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    plain = io.BytesIO()
+    c = canvas.Canvas(plain, pagesize=A4, invariant=1)
+    for page in range(int(10 * scale)):
+        c.setFont('Helvetica', 11)
+        y = 770
+        while y > 72:
+            c.drawString(72, y, _sentence(rng, 12)[:90])
+            y -= 14
+        c.showPage()
+    c.save()
+    plain.seek(0)
+
+    writer = PdfWriter()
+    for page in PdfReader(plain).pages:
+        writer.add_page(page)
+    writer.encrypt(ENCRYPTED_PASSWORD)
+    with open(path, 'wb') as f:
+        writer.write(f)
+
+
+def scanned(path, rng, scale):
+    """Pages that are grayscale raster images of text, like a scanner produces"""
+    c = _canvas(path)
+    width, height = A4
+    for page in range(int(8 * scale)):
+        # 200 dpi A4 page
+        image = Image.new('L', (1654, 2339), 245)
+        draw = ImageDraw.Draw(image)
+        y = 150
+        while y < 2200:
+            draw.text((150, y), _sentence(rng, 12)[:80], fill=20)
+            y += 36
+        image = image.rotate(rng.uniform(-1, 1), fillcolor=245).filter(ImageFilter.GaussianBlur(0.6))
+        pixels = image.load()
+        for _ in range(20000):
+            pixels[rng.randrange(1654), rng.randrange(2339)] = rng.randint(150, 255)
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        buffer.seek(0)
+        c.drawImage(ImageReader(buffer), 0, 0, width, height)
+        c.showPage()
+    c.save()
+
+
+def photos(directory, rng, scale):
+    """Loose JPEG and PNG images for the image-to-PDF tool"""
+    os.makedirs(directory, exist_ok=True)
+    for i in range(int(6 * scale)):
+        image = _noise_image(rng, 1600, 1200)
+        if i % 2:
+            image.save(os.path.join(directory, f'photo_{i + 1}.png'))
+        else:
+            image.save(os.path.join(directory, f'photo_{i + 1}.jpg'), quality=90)
+
+
+def word_document(path, rng, scale):
+    from docx import Document
+
+    document = Document()
+    for section in range(int(10 * scale)):
+        document.add_heading(f'Section {section + 1}', level=1)
+        for _ in range(6):
+            document.add_paragraph(' '.join(_sentence(rng) for _ in range(5)))
+    document.save(path)
+
+
+def excel_workbook(path, rng, scale):
+    import pandas as pd
+
+    rows = int(2000 * scale)
+    frame = pd.DataFrame({
+        'date': [f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}' for _ in range(rows)],
+        'account': [rng.choice(WORDS) for _ in range(rows)],
+        'amount': [round(rng.uniform(-5000, 5000), 2) for _ in range(rows)]
+    })
+    frame.to_excel(path, index=False)
+
+
+def powerpoint_deck(path, rng, scale):
+    from pptx import Presentation
+
+    deck = Presentation()
+    for slide_number in range(int(15 * scale)):
+        slide = deck.slides.add_slide(deck.slide_layouts[1])
+        slide.shapes.title.text = f'Slide {slide_number + 1}'
+        slide.placeholders[1].text = '\n'.join(_sentence(rng, 6) for _ in range(4))
+    deck.save(path)
+
+
+# Corpus entries: file name -> generator. Each generator gets its own RNG
+# seeded from the name, so adding an entry doesn't change the others.
+DOCUMENTS = {
+    'text_heavy.pdf': text_heavy,
+    'image_heavy.pdf': image_heavy,
+    'many_small_pages.pdf': many_small_pages,
+    'few_huge_pages.pdf': few_huge_pages,
+    'encrypted.pdf': encrypted,
+    'scanned.pdf': scanned,
+    'photos': photos,
+    'document.docx': word_document,
+    'workbook.xlsx': excel_workbook,
+    'deck.pptx': powerpoint_deck
+}
+
+
+def generate(directory=CORPUS_DIR, scale=1.0, seed=1234, force=False):
+    """Create any corpus files that don't exist yet and return their paths"""
+    os.makedirs(directory, exist_ok=True)
+
+    # A corpus generated with other settings is regenerated as a whole
+    manifest_path = os.path.join(directory, 'manifest.json')
+    settings = {'seed': seed, 'scale': scale}
+    try:
+        with open(manifest_path) as f:
+            force = force or json.load(f) != settings
+    except (OSError, ValueError):
+        force = True
+
+    paths = {}
+    for name, generator in DOCUMENTS.items():
+        path = os.path.join(directory, name)
+        if os.path.exists(path) and not force:
+            paths[name] = path
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        rng = random.Random(f'{seed}:{scale}:{name}')
+        try:
+            generator(path, rng, scale)
+            paths[name] = path
+            print(f'Generated {name}', file=sys.stderr)
+        except Exception as e:
+            # Office formats need optional libraries
+            print(f'Skipped {name}: {e}', file=sys.stderr)
+
+    with open(manifest_path, 'w') as f:
+        json.dump(settings, f)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', default=CORPUS_DIR, help='corpus directory')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply page and row counts')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--force', action='store_true', help='regenerate existing files')
+    args = parser.parse_args()
+    generate(args.output, args.scale, args.seed, args.force)
+
+
+if __name__ == '__main__':
+    main()
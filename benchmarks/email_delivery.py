@@ -0,0 +1,209 @@
+"""Check email delivery against a local aiosmtpd server.
+
+Runs EmailDelivery and SMTPConnectionPool against an in-process aiosmtpd
+server and checks that:
+
+- several emails go out over one pooled connection
+- a pooled connection the server has since closed is replaced, and the
+  email still arrives on its first attempt
+- a 4xx reply is retried with backoff and then delivered, and a 5xx reply
+  fails at once
+- the streamed MIME message arrives intact: the body (including a
+  dot-stuffed line) and the attachment bytes match what was sent
+
+    pip install aiosmtpd
+    python benchmarks/email_delivery.py
+    python benchmarks/email_delivery.py --size-mb 20
+
+The attachment size only changes how much is streamed; the server keeps
+every message in memory.
+"""
+import os
+import sys
+import time
+import email
+import socket
+import argparse
+import tempfile
+import threading
+from email import policy
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from modules.email_delivery import SMTPConnectionPool, EmailDelivery, OutgoingEmail
+
+try:
+    from aiosmtpd.controller import Controller
+    AIOSMTPD_AVAILABLE = True
+except ImportError:
+    AIOSMTPD_AVAILABLE = False
+    Controller = None
+
+SENDER = 'toolkit@example.com'
+RECIPIENT = 'user@example.com'
+
+# Seconds the server keeps an idle connection open; the pool is told to
+# keep them longer, so it reuses one the server has already closed
+SERVER_IDLE_TIMEOUT = 1
+
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps every message and can fail the next ones"""
+
+    def __init__(self):
+        self.messages = []
+        self.replies = []
+        self._lock = threading.Lock()
+
+    def fail_next(self, *replies):
+        """Answer the next DATA commands with these replies instead of 250"""
+        with self._lock:
+            self.replies.extend(replies)
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            if self.replies:
+                return self.replies.pop(0)
+            # session.peer tells the connections apart
+            self.messages.append((session.peer, envelope.content))
+        return '250 Message accepted for delivery'
+
+
+class Results:
+    """Collects EmailDelivery notifications"""
+
+    def __init__(self):
+        self.statuses = {}
+        self._condition = threading.Condition()
+
+    def notify(self, outgoing, status, message):
+        with self._condition:
+            self.statuses[outgoing.id] = (status, message)
+            self._condition.notify_all()
+
+    def wait(self, outgoing, timeout):
+        with self._condition:
+            self._condition.wait_for(lambda: outgoing.id in self.statuses, timeout)
+            return self.statuses.get(outgoing.id, ('timeout', None))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_checks(attachment_path, body, timeout):
+    """Run every check against a fresh server; return a list of (name, failure or None)"""
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port(),
+                            server_kwargs={'timeout': SERVER_IDLE_TIMEOUT})
+    controller.start()
+    pool = SMTPConnectionPool('127.0.0.1', controller.port, starttls=False, size=1,
+                              timeout=10, idle_timeout=SERVER_IDLE_TIMEOUT * 30)
+    results = Results()
+    delivery = EmailDelivery(pool, SENDER, notify=results.notify, workers=1, retry_delay=0.2)
+
+    def send(subject):
+        outgoing = delivery.submit(OutgoingEmail(RECIPIENT, subject, body, attachment_path))
+        return outgoing, results.wait(outgoing, timeout)
+
+    checks = []
+    try:
+        # Reuse: three emails, one connection
+        sent = [send(f'reuse {i}') for i in range(3)]
+        failed = [f'{outgoing.subject}: {status} {message}' for outgoing, (status, message) in sent
+                  if status != 'success']
+        peers = {peer for peer, _ in handler.messages}
+        checks.append(('connection reuse', '; '.join(failed) or (
+            None if len(peers) == 1 else f'{len(peers)} connections for {len(sent)} emails')))
+
+        # Server-side disconnect: the pooled connection is dead by now
+        time.sleep(SERVER_IDLE_TIMEOUT * 2)
+        before = len(handler.messages)
+        outgoing, (status, message) = send('after disconnect')
+        if status != 'success':
+            failure = f'{status} {message}'
+        elif outgoing.attempts != 1:
+            failure = f'delivered on attempt {outgoing.attempts} instead of 1'
+        elif handler.messages[before][0] in peers:
+            failure = 'the closed connection was used again'
+        else:
+            failure = check_message(handler.messages[-1][1], 'after disconnect', body, attachment_path)
+        checks.append(('reconnect after server disconnect', failure))
+
+        # Temporary failure: retried with backoff, then delivered
+        handler.fail_next('451 4.3.0 Try again later', '451 4.3.0 Try again later')
+        started = time.monotonic()
+        outgoing, (status, message) = send('retry')
+        elapsed = time.monotonic() - started
+        # Two retries wait retry_delay and then twice that
+        if status != 'success':
+            failure = f'{status} {message}'
+        elif outgoing.attempts != 3:
+            failure = f'delivered on attempt {outgoing.attempts} instead of 3'
+        elif elapsed < 0.2 * 3:
+            failure = f'retried after {elapsed:.2f}s, without backoff'
+        else:
+            failure = check_message(handler.messages[-1][1], 'retry', body, attachment_path)
+        checks.append(('retry with backoff on 4xx', failure))
+
+        # Permanent failure: no retry
+        handler.fail_next('554 5.7.1 Message rejected')
+        outgoing, (status, message) = send('rejected')
+        checks.append(('no retry on 5xx', None if status == 'error' and outgoing.attempts == 1
+                       else f'{status} after {outgoing.attempts} attempts'))
+    finally:
+        pool.close()
+        controller.stop()
+    return checks
+
+
+def check_message(content, subject, body, attachment_path):
+    """Return why a received message doesn't match what was sent, or None"""
+    message = email.message_from_bytes(content, policy=policy.default)
+    if message['Subject'] != subject:
+        return f"subject is {message['Subject']!r}"
+    text = message.get_body(('plain',))
+    if text is None or text.get_content().replace('\r\n', '\n').rstrip('\n') != body.rstrip('\n'):
+        return 'the body was changed in transit'
+    attachments = list(message.iter_attachments())
+    if len(attachments) != 1:
+        return f'{len(attachments)} attachments instead of 1'
+    if attachments[0].get_filename() != os.path.basename(attachment_path):
+        return f'attachment is named {attachments[0].get_filename()!r}'
+    with open(attachment_path, 'rb') as f:
+        if attachments[0].get_content() != f.read():
+            return 'the attachment was changed in transit'
+    return None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--size-mb', type=float, default=2, help='size of the attachment sent with every email')
+    parser.add_argument('--timeout', type=int, default=30, help='seconds to wait for one email')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not AIOSMTPD_AVAILABLE:
+        print('skipped: aiosmtpd is not installed (pip install aiosmtpd)')
+        return 0
+
+    # A line starting with a dot has to survive dot-stuffing
+    body = 'Your file is attached.\n.hidden line\n..two dots\nEnd.\n'
+    with tempfile.TemporaryDirectory(prefix='email-check-') as directory:
+        attachment_path = os.path.join(directory, 'result.pdf')
+        with open(attachment_path, 'wb') as f:
+            f.write(b'%PDF-1.4\n' + os.urandom(int(args.size_mb * 1024 * 1024)))
+        checks = run_checks(attachment_path, body, args.timeout)
+
+    for name, failure in checks:
+        print(f'{name:<36} ' + (f'failed: {failure}' if failure else 'passed'))
+    return 1 if any(failure for _, failure in checks) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
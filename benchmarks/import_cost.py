@@ -0,0 +1,91 @@
+"""Measure how long the app and each tool module take to import.
+
+Every measurement runs in a fresh interpreter so earlier imports don't hide
+the cost of later ones. Tool modules are timed after Flask has been
+imported, so the numbers show what each module adds on top of the web app.
+
+    python benchmarks/import_cost.py
+    python benchmarks/import_cost.py --repeat 5 --json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from modules.tool_registry import TOOL_ROUTES
+
+TIMER = """
+import sys, time
+sys.path.insert(0, {root!r})
+{setup}
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+
+def time_import(module, setup='', env=None):
+    """Import a module in a new interpreter and return the seconds it took"""
+    code = TIMER.format(root=REPO_ROOT, setup=setup, module=module)
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=REPO_ROOT,
+        env=dict(os.environ, **(env or {})),
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'
+        raise RuntimeError(f"import {module} failed: {error}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure(module, repeat, setup='', env=None):
+    samples = [time_import(module, setup, env) for _ in range(repeat)]
+    return {'median': statistics.median(samples), 'min': min(samples), 'max': max(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=3, help='imports per measurement (default 3)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = {'app': {}, 'modules': {}}
+
+    # The app as it starts in production (tool modules load lazily) and with
+    # the warm-up disabled, so the measurement isn't racing a background import
+    results['app']['app'] = measure('app', args.repeat, env={'TOOL_WARMUP': '0'})
+    results['app']['flask'] = measure('flask', args.repeat)
+
+    for module_name in TOOL_ROUTES:
+        try:
+            results['modules'][module_name] = measure(module_name, args.repeat, setup='import flask')
+        except RuntimeError as e:
+            results['modules'][module_name] = {'error': str(e)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'import':<28}{'median':>10}{'min':>10}{'max':>10}")
+    for section in ('app', 'modules'):
+        rows = sorted(results[section].items(), key=lambda item: -item[1].get('median', 0))
+        for name, timing in rows:
+            if 'error' in timing:
+                print(f"{name:<28}  {timing['error']}")
+                continue
+            print(f"{name:<28}{timing['median'] * 1000:>8.0f}ms{timing['min'] * 1000:>8.0f}ms{timing['max'] * 1000:>8.0f}ms")
+        print()
+
+    total = sum(timing.get('median', 0) for timing in results['modules'].values())
+    print(f"Tool modules together (imported separately): {total * 1000:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
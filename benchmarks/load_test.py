@@ -0,0 +1,371 @@
+"""Drive the tool routes with concurrent clients and report end-to-end latency.
+
+Each virtual user uploads a corpus document to a tool route, waits for the
+job's completion event on Socket.IO (or polls /jobs/<id> when no Socket.IO
+client is available), and starts the next request. Latency is measured
+from sending the upload to receiving the result.
+
+    python benchmarks/load_test.py                                   # in-process test client
+    python benchmarks/load_test.py --concurrency 16 --duration 120
+    python benchmarks/load_test.py --mix merge=3,ocr=1 --url http://127.0.0.1:5000
+
+Every upload gets a unique trailer, so the result cache doesn't answer
+repeated requests; pass --allow-cache to measure with the cache instead.
+"""
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import urllib.error
+import urllib.request
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from corpus import CORPUS_DIR, generate
+
+# Optional Socket.IO client for --url mode
+try:
+    import socketio as socketio_client
+    SOCKETIO_CLIENT_AVAILABLE = True
+except ImportError:
+    SOCKETIO_CLIENT_AVAILABLE = False
+    socketio_client = None
+
+# Tool requests: name -> (route, form fields, files as (field, corpus file))
+TOOLS = {
+    'merge': ('/merge', {}, [('files[]', 'text_heavy.pdf'), ('files[]', 'many_small_pages.pdf')]),
+    'split': ('/split', {'split_method': 'all'}, [('pdf', 'text_heavy.pdf')]),
+    'compress': ('/compress', {'compression_level': 'medium'}, [('pdf', 'image_heavy.pdf')]),
+    'watermark': ('/watermark', {'watermark_text': 'CONFIDENTIAL'}, [('pdf', 'text_heavy.pdf')]),
+    'rotate': ('/rotate', {'angle': '90'}, [('pdf', 'many_small_pages.pdf')]),
+    'protect': ('/protect', {'password': 'secret', 'confirm_password': 'secret'}, [('pdf', 'text_heavy.pdf')]),
+    'extract-text': ('/extract_text', {}, [('pdf', 'text_heavy.pdf')]),
+    'ocr': ('/ocr', {}, [('file', 'scanned.pdf')]),
+    'pdf-to-img': ('/pdf_to_img', {'format': 'jpg', 'dpi': '100'}, [('pdf', 'text_heavy.pdf')]),
+    'pdf-to-word': ('/pdf_to_word', {}, [('pdf', 'text_heavy.pdf')])
+}
+
+DEFAULT_MIX = 'merge=2,split=2,compress=2,watermark=1,rotate=1,extract-text=1,ocr=1,pdf-to-img=1'
+
+
+class TestClientTransport:
+    """Talk to the app in this process through the Flask and Socket.IO test clients"""
+
+    def __init__(self):
+        import app
+        self.app = app
+
+    def session(self):
+        return _TestClientSession(self.app)
+
+
+class _TestClientSession:
+    def __init__(self, app):
+        self.client = app.app.test_client()
+        self.events = None
+        if app.SOCKETIO_AVAILABLE:
+            self.events = app.socketio.test_client(app.app, flask_test_client=self.client)
+
+    def post(self, path, fields, files):
+        data = dict(fields)
+        for field, filename, content in files:
+            data.setdefault(field, []).append((io.BytesIO(content), filename))
+        response = self.client.post(path, data=data, content_type='multipart/form-data')
+        return response.status_code, response.get_json(silent=True) or {}
+
+    def wait(self, job_id, timeout):
+        if self.events is None:
+            return _poll(lambda: self.client.get(f'/jobs/{job_id}').get_json(), timeout)
+
+        self.events.emit('join_job', {'job_id': job_id})
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for event in self.events.get_received():
+                if event['name'] != 'status_update':
+                    continue
+                data = event['args'][0]
+                if data.get('job_id') == job_id and data.get('status') in ('success', 'error') and 'message' in data:
+                    return data['status']
+            time.sleep(0.02)
+        return 'timeout'
+
+    def close(self):
+        if self.events is not None:
+            self.events.disconnect()
+
+
+class HTTPTransport:
+    """Talk to a running server over HTTP (and Socket.IO when python-socketio is installed)"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def session(self):
+        return _HTTPSession(self.base_url)
+
+
+class _HTTPSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.events = None
+        self._finished = {}
+        self._lock = threading.Lock()
+        if SOCKETIO_CLIENT_AVAILABLE:
+            self.events = socketio_client.Client()
+            self.events.on('status_update', self._on_status)
+            self.events.connect(base_url)
+
+    def _on_status(self, data):
+        if data.get('job_id') and data.get('status') in ('success', 'error') and 'message' in data:
+            with self._lock:
+                event = self._finished.setdefault(data['job_id'], [threading.Event(), None])
+                event[1] = data['status']
+                event[0].set()
+
+    def post(self, path, fields, files):
+        boundary = uuid.uuid4().hex
+        body = io.BytesIO()
+        for name, value in fields.items():
+            body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+        for field, filename, content in files:
+            body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+                       f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8'))
+            body.write(content)
+            body.write(b'\r\n')
+        body.write(f'--{boundary}--\r\n'.encode('ascii'))
+
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=body.getvalue(),
+            headers={'Content-Type': f'multipart/form-data; boundary={boundary}'}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read() or b'{}')
+        except urllib.error.HTTPError as e:
+            try:
+                return e.code, json.loads(e.read() or b'{}')
+            except ValueError:
+                return e.code, {}
+
+    def wait(self, job_id, timeout):
+        if self.events is None:
+            return _poll(lambda: self._get_json(f'/jobs/{job_id}'), timeout)
+
+        with self._lock:
+            event = self._finished.setdefault(job_id, [threading.Event(), None])
+        self.events.emit('join_job', {'job_id': job_id})
+        if not event[0].wait(timeout):
+            return 'timeout'
+        with self._lock:
+            self._finished.pop(job_id, None)
+        return event[1]
+
+    def _get_json(self, path):
+        with urllib.request.urlopen(self.base_url + path) as response:
+            return json.loads(response.read())
+
+    def close(self):
+        if self.events is not None:
+            self.events.disconnect()
+
+
+def _poll(get_status, timeout, interval=0.25):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get_status() or {}
+        if job.get('state') == 'finished':
+            return 'success'
+        if job.get('state') == 'failed':
+            return 'error'
+        time.sleep(interval)
+    return 'timeout'
+
+
+class LoadTest:
+    """Run virtual users against a transport and collect per-tool results"""
+
+    def __init__(self, transport, mix, corpus, concurrency, duration=None, requests=None,
+                 timeout=600, allow_cache=False, seed=1):
+        self.transport = transport
+        self.mix = mix
+        self.corpus = corpus
+        self.concurrency = concurrency
+        self.duration = duration
+        self.requests = requests
+        self.timeout = timeout
+        self.allow_cache = allow_cache
+        self.seed = seed
+
+        self.samples = []
+        self._issued = 0
+        self._lock = threading.Lock()
+
+    def run(self):
+        self.started = time.monotonic()
+        self.deadline = self.started + self.duration if self.duration else None
+        users = [threading.Thread(target=self._user, args=(i,), daemon=True) for i in range(self.concurrency)]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        self.elapsed = time.monotonic() - self.started
+        return self.report()
+
+    def _next_request(self):
+        with self._lock:
+            if self.requests is not None and self._issued >= self.requests:
+                return False
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                return False
+            self._issued += 1
+            return True
+
+    def _user(self, index):
+        rng = random.Random(f'{self.seed}:{index}')
+        tools, weights = zip(*self.mix.items())
+        session = self.transport.session()
+        try:
+            while self._next_request():
+                tool = rng.choices(tools, weights)[0]
+                sample = self._request(session, tool)
+                with self._lock:
+                    self.samples.append(sample)
+        finally:
+            session.close()
+
+    def _request(self, session, tool):
+        path, fields, files = TOOLS[tool]
+        uploads = []
+        for field, name in files:
+            content = self.corpus[name]
+            if not self.allow_cache and name.endswith('.pdf'):
+                # A PDF comment after %%EOF keeps the file valid but changes its hash
+                content = content + f'\n%{uuid.uuid4().hex}\n'.encode('ascii')
+            uploads.append((field, name, content))
+
+        start = time.monotonic()
+        try:
+            status_code, body = session.post(path, fields, uploads)
+            if status_code == 429:
+                outcome = 'rejected'
+            elif body.get('status') == 'success':
+                outcome = 'success'
+            elif body.get('status') == 'processing' and body.get('job_id'):
+                outcome = session.wait(body['job_id'], self.timeout)
+            else:
+                outcome = 'error'
+        except Exception as e:
+            print(f'{tool}: {e}', file=sys.stderr)
+            outcome = 'error'
+        return {'tool': tool, 'outcome': outcome, 'latency': time.monotonic() - start, 'finished': time.monotonic()}
+
+    def report(self):
+        tools = {}
+        for tool in sorted({sample['tool'] for sample in self.samples}):
+            samples = [sample for sample in self.samples if sample['tool'] == tool]
+            latencies = sorted(sample['latency'] for sample in samples if sample['outcome'] == 'success')
+            outcomes = {}
+            for sample in samples:
+                outcomes[sample['outcome']] = outcomes.get(sample['outcome'], 0) + 1
+            tools[tool] = {
+                'requests': len(samples),
+                'outcomes': outcomes,
+                'throughput_per_second': len(latencies) / self.elapsed if self.elapsed else 0,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else None
+            }
+        completed = sum(1 for sample in self.samples if sample['outcome'] == 'success')
+        return {
+            'concurrency': self.concurrency,
+            'elapsed_seconds': self.elapsed,
+            'requests': len(self.samples),
+            'completed': completed,
+            'throughput_per_second': completed / self.elapsed if self.elapsed else 0,
+            'tools': tools
+        }
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    rank = max(1, int(round(p / 100 * len(values) + 0.5)))
+    return values[min(rank, len(values)) - 1]
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        if not item.strip():
+            continue
+        tool, _, weight = item.partition('=')
+        tool = tool.strip()
+        if tool not in TOOLS:
+            raise SystemExit(f"Unknown tool '{tool}'; choose from {', '.join(TOOLS)}")
+        mix[tool] = float(weight or 1)
+    return mix
+
+
+def print_report(report):
+    print(f"\n{report['requests']} requests from {report['concurrency']} clients in {report['elapsed_seconds']:.1f}s, "
+          f"{report['completed']} completed ({report['throughput_per_second']:.2f}/s)\n")
+    print(f"{'tool':<14}{'reqs':>6}{'ok':>6}{'err':>6}{'429':>6}{'t/o':>6}{'per s':>8}{'p50':>8}{'p95':>8}{'p99':>8}")
+
+    def seconds(value):
+        return f'{value:.2f}' if value is not None else '-'
+
+    for tool, stats in report['tools'].items():
+        outcomes = stats['outcomes']
+        print(f"{tool:<14}{stats['requests']:>6}{outcomes.get('success', 0):>6}{outcomes.get('error', 0):>6}"
+              f"{outcomes.get('rejected', 0):>6}{outcomes.get('timeout', 0):>6}{stats['throughput_per_second']:>8.2f}"
+              f"{seconds(stats['p50']):>8}{seconds(stats['p95']):>8}{seconds(stats['p99']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', help='base URL of a running server (default: in-process test client)')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients (default 8)')
+    parser.add_argument('--duration', type=float, help='seconds to keep sending requests')
+    parser.add_argument('--requests', type=int, help='total requests to send (default 50 without --duration)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'tool weights (default {DEFAULT_MIX})')
+    parser.add_argument('--timeout', type=float, default=600, help='seconds to wait for one job')
+    parser.add_argument('--allow-cache', action='store_true', help='send identical uploads so the result cache can answer')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='corpus directory')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    if args.duration is None and args.requests is None:
+        args.requests = 50
+
+    mix = parse_mix(args.mix)
+    paths = generate(args.corpus)
+    corpus = {}
+    for tool in mix:
+        for _, name in TOOLS[tool][2]:
+            with open(paths[name], 'rb') as f:
+                corpus[name] = f.read()
+
+    transport = HTTPTransport(args.url) if args.url else TestClientTransport()
+    load_test = LoadTest(transport, mix, corpus, args.concurrency, args.duration, args.requests,
+                         args.timeout, args.allow_cache)
+    report = load_test.run()
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+"""Benchmark every tool's worker function against the synthetic corpus.
+
+Each case runs in a fresh interpreter, so peak RSS belongs to that case
+alone and no case benefits from another's warm caches. Results are written
+as JSON and can be compared against a stored baseline:
+
+    python benchmarks/run_benchmarks.py                        # all cases
+    python benchmarks/run_benchmarks.py --cases merge,split    # name prefixes
+    python benchmarks/run_benchmarks.py --save-baseline        # store as the baseline
+    python benchmarks/run_benchmarks.py --compare              # fail on regressions
+"""
+import os
+import sys
+import json
+import time
+import glob
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARK_DIR = os.path.join(REPO_ROOT, 'benchmarks')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, 'baseline.json')
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from corpus import CORPUS_DIR, ENCRYPTED_PASSWORD, generate
+
+# Benchmark cases: name -> (module, function, keyword arguments). Corpus
+# files are written as '@name' and resolved to paths in the corpus directory.
+CASES = {
+    'merge/mixed': ('modules.merge_pdf', 'merge_pdfs', {
+        'file_paths': ['@text_heavy.pdf', '@many_small_pages.pdf', '@image_heavy.pdf']}),
+    'split/many_small_pages': ('modules.split_pdf', 'split_pdf', {'file_path': '@many_small_pages.pdf'}),
+    'split/text_heavy_odd': ('modules.split_pdf', 'split_pdf', {
+        'file_path': '@text_heavy.pdf', 'split_method': 'odd_even', 'odd_even': 'odd'}),
+    'compress/image_heavy_low': ('modules.compress_pdf', 'compress_pdf', {
+        'file_path': '@image_heavy.pdf', 'compression_level': 'low'}),
+    'compress/image_heavy_high': ('modules.compress_pdf', 'compress_pdf', {
+        'file_path': '@image_heavy.pdf', 'compression_level': 'high'}),
+    'compress/scanned': ('modules.compress_pdf', 'compress_pdf', {'file_path': '@scanned.pdf'}),
+    'watermark/text_heavy': ('modules.organize_pdf', 'add_watermark', {'file_path': '@text_heavy.pdf'}),
+    'watermark/few_huge_pages': ('modules.organize_pdf', 'add_watermark', {'file_path': '@few_huge_pages.pdf'}),
+    'rotate/many_small_pages': ('modules.organize_pdf', 'rotate_pdf', {'file_path': '@many_small_pages.pdf'}),
+    'protect/text_heavy': ('modules.protect_pdf', 'protect_pdf', {
+        'file_path': '@text_heavy.pdf', 'password': 'secret'}),
+    'unlock/encrypted': ('modules.protect_pdf', 'unlock_pdf', {
+        'file_path': '@encrypted.pdf', 'password': ENCRYPTED_PASSWORD}),
+    'extract-text/text_heavy': ('modules.extract_pdf', 'extract_text_from_pdf', {'file_path': '@text_heavy.pdf'}),
+    'ocr/scanned': ('modules.ocr_pdf', 'perform_ocr', {'file_path': '@scanned.pdf'}),
+    'pdf-to-img/text_heavy': ('modules.convert_pdf', 'convert_pdf_to_images', {
+        'file_path': '@text_heavy.pdf', 'dpi': 100}),
+    'pdf-to-img/few_huge_pages': ('modules.convert_pdf', 'convert_pdf_to_images', {
+        'file_path': '@few_huge_pages.pdf', 'dpi': 72}),
+    'img-to-pdf/photos': ('modules.convert_pdf', 'convert_images_to_pdf', {'image_paths': '@photos/*'}),
+    'pdf-to-word/text_heavy': ('modules.convert_pdf', 'convert_pdf_to_word', {'file_path': '@text_heavy.pdf'}),
+    'pdf-to-excel/text_heavy': ('modules.convert_pdf', 'convert_pdf_to_excel', {'file_path': '@text_heavy.pdf'}),
+    'pdf-to-ppt/text_heavy': ('modules.convert_pdf', 'convert_pdf_to_ppt', {'file_path': '@text_heavy.pdf'}),
+    'word-to-pdf/document': ('modules.convert_pdf', 'convert_word_to_pdf', {'file_path': '@document.docx'}),
+    'excel-to-pdf/workbook': ('modules.convert_pdf', 'convert_excel_to_pdf', {'file_path': '@workbook.xlsx'}),
+    'ppt-to-pdf/deck': ('modules.convert_pdf', 'convert_ppt_to_pdf', {'file_path': '@deck.pptx'})
+}
+
+
+class RecordingEmitter:
+    """Collects the status updates a worker function emits"""
+
+    def __init__(self):
+        self.final = None
+
+    def emit(self, event, data=None, **kwargs):
+        if event == 'status_update' and data and data.get('status') in ('success', 'error') and 'message' in data:
+            self.final = data
+
+
+def resolve(value, corpus_dir):
+    """Replace '@name' corpus references with paths"""
+    if isinstance(value, list):
+        return [resolve(item, corpus_dir) for item in value]
+    if isinstance(value, str) and value.startswith('@'):
+        path = os.path.join(corpus_dir, value[1:])
+        if '*' in path:
+            return sorted(glob.glob(path))
+        return path
+    return value
+
+
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_case(name, corpus_dir):
+    """Run one case in this process and return its measurements"""
+    import importlib
+    import modules.config as config
+    from modules.result_cache import output_paths
+
+    module_name, function_name, kwargs = CASES[name]
+    kwargs = {key: resolve(value, corpus_dir) for key, value in kwargs.items()}
+
+    # Keep outputs out of the app's folders
+    work_dir = tempfile.mkdtemp(prefix='pdf-bench-')
+    config.OUTPUT_FOLDER = os.path.join(work_dir, 'output')
+    config.TEMP_FOLDER = os.path.join(work_dir, 'temp')
+    os.makedirs(config.OUTPUT_FOLDER)
+    os.makedirs(config.TEMP_FOLDER)
+
+    # Copy inputs like an upload would, since some tools remove their input
+    inputs_dir = os.path.join(work_dir, 'inputs')
+    os.makedirs(inputs_dir)
+    for key, value in kwargs.items():
+        if key in ('file_path', 'file_paths', 'image_paths'):
+            paths = value if isinstance(value, list) else [value]
+            copies = []
+            for i, path in enumerate(paths):
+                copy = os.path.join(inputs_dir, f'{i}_{os.path.basename(path)}')
+                shutil.copyfile(path, copy)
+                copies.append(copy)
+            kwargs[key] = copies if isinstance(value, list) else copies[0]
+
+    try:
+        func = getattr(importlib.import_module(module_name), function_name)
+        emitter = RecordingEmitter()
+        rss_before = peak_rss_bytes()
+
+        start = time.perf_counter()
+        func(socketio=emitter, **kwargs)
+        wall = time.perf_counter() - start
+
+        final = emitter.final or {}
+        result = {
+            'status': final.get('status', 'unknown'),
+            'wall_seconds': wall,
+            'peak_rss_bytes': peak_rss_bytes(),
+            'baseline_rss_bytes': rss_before,
+            'output_bytes': sum(
+                os.path.getsize(os.path.join(config.OUTPUT_FOLDER, path))
+                for path in output_paths(final)
+                if os.path.isfile(os.path.join(config.OUTPUT_FOLDER, path))
+            )
+        }
+        if result['status'] != 'success':
+            result['error'] = final.get('message', 'no result reported')
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_case_subprocess(name, corpus_dir):
+    process = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', name, '--corpus', corpus_dir],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True
+    )
+    try:
+        return json.loads(process.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'no output'
+        return {'status': 'crashed', 'error': error}
+
+
+def summarize(samples):
+    """Combine repeated runs of a case into one result"""
+    successful = [sample for sample in samples if sample.get('status') == 'success']
+    if not successful:
+        return samples[-1]
+    walls = [sample['wall_seconds'] for sample in successful]
+    rss = [sample['peak_rss_bytes'] for sample in successful if sample.get('peak_rss_bytes')]
+    return {
+        'status': 'success',
+        'runs': len(successful),
+        'wall_seconds': statistics.median(walls),
+        'wall_seconds_min': min(walls),
+        'wall_seconds_max': max(walls),
+        'peak_rss_bytes': max(rss) if rss else None,
+        'output_bytes': successful[-1]['output_bytes']
+    }
+
+
+def compare(results, baseline, threshold):
+    """Print a comparison with the baseline and return the regressed cases"""
+    regressions = []
+    print(f"\n{'case':<30}{'wall':>10}{'baseline':>10}{'change':>9}{'rss MB':>9}{'change':>9}")
+    for name, result in results['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if result.get('status') != 'success' or not base or base.get('status') != 'success':
+            continue
+        wall_change = result['wall_seconds'] / base['wall_seconds'] - 1 if base['wall_seconds'] else 0
+        rss_change = 0
+        if result.get('peak_rss_bytes') and base.get('peak_rss_bytes'):
+            rss_change = result['peak_rss_bytes'] / base['peak_rss_bytes'] - 1
+        flag = ''
+        if wall_change > threshold or rss_change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        rss_mb = (result.get('peak_rss_bytes') or 0) / 1024 / 1024
+        print(f"{name:<30}{result['wall_seconds']:>9.2f}s{base['wall_seconds']:>9.2f}s"
+              f"{wall_change:>+9.0%}{rss_mb:>9.0f}{rss_change:>+9.0%}{flag}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--cases', default='', help='comma-separated case name prefixes (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case (default 3)')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='corpus directory')
+    parser.add_argument('--scale', type=float, default=1.0, help='corpus scale (see corpus.py)')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline results to compare against')
+    parser.add_argument('--compare', action='store_true', help='compare with the baseline and exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown/growth (default 0.15)')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child, args.corpus)))
+        return 0
+
+    generate(args.corpus, args.scale)
+    prefixes = [prefix.strip() for prefix in args.cases.split(',') if prefix.strip()]
+    names = [name for name in CASES if not prefixes or any(name.startswith(prefix) for prefix in prefixes)]
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'corpus_scale': args.scale,
+            'repeat': args.repeat
+        },
+        'cases': {}
+    }
+
+    for name in names:
+        samples = [run_case_subprocess(name, args.corpus) for _ in range(args.repeat)]
+        result = summarize(samples)
+        results['cases'][name] = result
+        if result.get('status') == 'success':
+            rss_mb = (result.get('peak_rss_bytes') or 0) / 1024 / 1024
+            print(f"{name:<30}{result['wall_seconds']:>8.2f}s{rss_mb:>8.0f} MB{result['output_bytes'] / 1024:>10.0f} KB")
+        else:
+            print(f"{name:<30}  {result.get('status')}: {result.get('error')}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['meta']['timestamp'].replace(':', '')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.compare:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except OSError:
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            return 1
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import os
+import math
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Tools that rasterize every page with pdf2image before doing anything else,
+# and the DPI each renders at unless told otherwise
+RENDERING_TOOLS = {
+    'pdf-to-img': 200,
+    'pdf-to-ppt': 300,
+    'ocr': 200
+}
+
+# pdf2image returns RGB PIL images, and every page is held in memory at once
+BYTES_PER_PIXEL = 3
+
+# Peak memory of a job besides rendered pages: interpreter, libraries and the
+# parsed input, which PyPDF2 and pdfminer keep at a few times the file size
+BASE_JOB_MEMORY = 64 * 1024 * 1024
+INPUT_MEMORY_FACTOR = 4
+
+# Arguments of the worker functions that hold input files
+INPUT_ARGUMENTS = ('file_path', 'file_paths', 'image_paths')
+
+
+class JobTooLargeError(Exception):
+    """Raised when a job would need more memory than the job memory budget"""
+
+
+class JobCost:
+    """A job's estimated peak memory, and the page geometry it was derived from"""
+
+    def __init__(self, memory, pages=0, pixels=0, dpi=None, requested_dpi=None):
+        self.memory = memory
+        self.pages = pages
+        self.pixels = pixels
+        self.dpi = dpi
+        self.requested_dpi = requested_dpi
+
+    @property
+    def degraded(self):
+        return self.dpi is not None and self.requested_dpi is not None and self.dpi < self.requested_dpi
+
+    def to_dict(self):
+        info = {'estimated_memory_mb': round(self.memory / (1024 * 1024), 1), 'pages': self.pages}
+        if self.dpi is not None:
+            info['dpi'] = self.dpi
+        if self.degraded:
+            info['requested_dpi'] = self.requested_dpi
+        return info
+
+
+class AdmissionControl:
+    """Estimate what a job will cost before it is queued.
+
+    The estimate comes from the input: file sizes, and for the rendering
+    tools the page count and crop box of every page, which give the pixels
+    pdf2image will allocate at the job's DPI. A job that can't fit in the
+    memory budget even on an idle server is rendered at a lower DPI if its
+    tool has one (down to min_dpi), and rejected otherwise. Jobs that fit
+    wait in the scheduler until enough of the budget is free.
+    """
+
+    def __init__(self, memory_budget, min_dpi=100):
+        self.memory_budget = memory_budget
+        self.min_dpi = min_dpi
+
+    def admit(self, tool, kwargs):
+        """Return the job's JobCost, lowering kwargs['dpi'] if needed, or raise JobTooLargeError"""
+        cost = self.estimate(tool, kwargs)
+        if cost.memory <= self.memory_budget:
+            return cost
+
+        if cost.dpi is not None and cost.pixels:
+            # Rendered memory grows with the square of the DPI
+            render_budget = self.memory_budget - (cost.memory - cost.pixels * BYTES_PER_PIXEL)
+            if render_budget > 0:
+                dpi = int(cost.dpi * math.sqrt(render_budget / (cost.pixels * BYTES_PER_PIXEL)))
+                if dpi >= self.min_dpi:
+                    kwargs['dpi'] = dpi
+                    degraded = self.estimate(tool, kwargs)
+                    degraded.requested_dpi = cost.dpi
+                    logger.info(f"Rendering {tool} job at {dpi} DPI instead of {cost.dpi} to fit the memory budget")
+                    return degraded
+
+        limit = _format_bytes(self.memory_budget)
+        if cost.dpi is not None:
+            raise JobTooLargeError(
+                f'This document is too large to process: {cost.pages} pages would need about '
+                f'{_format_bytes(cost.memory)} of memory at {cost.dpi} DPI, and even at {self.min_dpi} DPI '
+                f'it would not fit in the {limit} limit. Please split it into smaller parts first.'
+            )
+        raise JobTooLargeError(
+            f'These files are too large to process: they would need about {_format_bytes(cost.memory)} '
+            f'of memory, over the {limit} limit.'
+        )
+
+    def estimate(self, tool, kwargs):
+        """Return the JobCost of running a tool with these worker function arguments"""
+        paths = []
+        for name in INPUT_ARGUMENTS:
+            value = kwargs.get(name)
+            if value:
+                paths.extend(value if isinstance(value, list) else [value])
+        memory = BASE_JOB_MEMORY + INPUT_MEMORY_FACTOR * sum(_size(path) for path in paths)
+
+        if tool not in RENDERING_TOOLS:
+            return JobCost(memory)
+
+        dpi = kwargs.get('dpi') or RENDERING_TOOLS[tool]
+        pages, area = 0, 0.0
+        for path in paths:
+            if path.lower().endswith('.pdf'):
+                page_count, page_area = page_geometry(path)
+                pages += page_count
+                area += page_area
+            else:
+                # OCR of a single image doesn't render anything
+                memory += _image_pixels(path) * BYTES_PER_PIXEL
+
+        # Crop boxes are in points, 72 to the inch
+        pixels = int(area * (dpi / 72) ** 2)
+        return JobCost(memory + pixels * BYTES_PER_PIXEL, pages=pages, pixels=pixels, dpi=dpi)
+
+
+def page_geometry(path):
+    """Return (page count, total crop box area in square points) of a PDF, or (0, 0) if it can't be read"""
+    from PyPDF2 import PdfReader
+
+    try:
+        reader = PdfReader(path)
+        if reader.is_encrypted:
+            return 0, 0.0
+        area = 0.0
+        for page in reader.pages:
+            box = page.cropbox
+            area += abs(float(box.width) * float(box.height))
+        return len(reader.pages), area
+    except Exception as e:
+        logger.warning(f"Could not read page sizes of {path}: {str(e)}")
+        return 0, 0.0
+
+
+def default_memory_budget():
+    """Return half the machine's physical memory, or 4 GB if it can't be found"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // 2
+    except (AttributeError, ValueError, OSError):
+        return 4 * 1024 * 1024 * 1024
+
+
+def _image_pixels(path):
+    try:
+        from PIL import Image
+        with Image.open(path) as image:
+            return image.width * image.height
+    except Exception:
+        return 0
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _format_bytes(size):
+    if size >= 1024 ** 3:
+        return f'{size / 1024 ** 3:.1f} GB'
+    return f'{size / 1024 ** 2:.0f} MB'
@@ -0,0 +1,231 @@
+import os
+import time
+import shutil
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Rows removed per query while reaping, so one pass never holds the index long
+REAP_BATCH_SIZE = 500
+
+# Pinned artifacts are skipped by the reaper, but only for this long after
+# they were last pinned, so a pin left behind by a crashed process doesn't
+# keep an upload forever
+PIN_LEASE = 24 * 3600
+
+
+class ArtifactIndex:
+    """Expiry index for uploads and job outputs.
+
+    Artifacts are registered when they are created, together with the time
+    they expire, so the reaper only has to look at entries that are due
+    instead of listing and stat-ing every file in the upload and output
+    folders. A job's outputs are registered as their top-level entries (a
+    split job's page directory is one row, not one row per page). The index
+    also tracks sizes so the total can be kept under a quota by removing the
+    oldest artifacts first. Inputs of queued and running jobs are pinned, so
+    they outlive their TTL for as long as the job needs them.
+    """
+
+    def __init__(self, index_path, max_bytes=0):
+        self.index_path = index_path
+        self.max_bytes = max_bytes
+        # Completion hooks register outputs from OS threads, even under eventlet/gevent
+        self._lock = original_threading().Lock()
+
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    path TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    tool TEXT,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS artifacts_expires_at ON artifacts (expires_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS artifacts_created_at ON artifacts (created_at)")
+            # Added after the table was first released; older indexes lack them
+            columns = {row[1] for row in db.execute("PRAGMA table_info(artifacts)")}
+            if 'pins' not in columns:
+                db.execute("ALTER TABLE artifacts ADD COLUMN pins INTEGER NOT NULL DEFAULT 0")
+            if 'pinned_at' not in columns:
+                db.execute("ALTER TABLE artifacts ADD COLUMN pinned_at REAL")
+
+    def register(self, path, ttl, kind='output', tool=None):
+        """Record an artifact that should be removed ttl seconds from now.
+
+        Registering a path again (e.g. a reused upload) keeps its creation
+        time and pushes the expiry back.
+        """
+        now = time.time()
+        size = _disk_usage(path)
+        with self._lock:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT INTO artifacts (path, kind, tool, size, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (path) DO UPDATE SET size = excluded.size, "
+                    "expires_at = MAX(artifacts.expires_at, excluded.expires_at)",
+                    (os.path.abspath(path), kind, tool, size, now, now + ttl)
+                )
+
+    def pin(self, path, kind='upload'):
+        """Keep an artifact past its expiry until release() is called as often as pin()"""
+        now = time.time()
+        with self._lock:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT INTO artifacts (path, kind, tool, size, created_at, expires_at, pins, pinned_at) "
+                    "VALUES (?, ?, NULL, ?, ?, ?, 1, ?) "
+                    "ON CONFLICT (path) DO UPDATE SET pins = artifacts.pins + 1, pinned_at = excluded.pinned_at",
+                    (os.path.abspath(path), kind, _disk_usage(path), now, now, now)
+                )
+
+    def release(self, path, ttl):
+        """Drop a pin, keeping the artifact for at least ttl more seconds"""
+        now = time.time()
+        with self._lock:
+            with self._connect() as db:
+                db.execute(
+                    "UPDATE artifacts SET pins = MAX(pins - 1, 0), expires_at = MAX(expires_at, ?) WHERE path = ?",
+                    (now + ttl, os.path.abspath(path))
+                )
+
+    def is_registered(self, path):
+        with self._connect() as db:
+            row = db.execute("SELECT 1 FROM artifacts WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return row is not None
+
+    def reap(self, now=None):
+        """Remove expired artifacts and enforce the size quota; return the number removed"""
+        now = time.time() if now is None else now
+        removed = 0
+        while True:
+            with self._connect() as db:
+                rows = db.execute(
+                    "SELECT path FROM artifacts WHERE expires_at <= ? AND (pins = 0 OR pinned_at < ?) "
+                    "ORDER BY expires_at LIMIT ?",
+                    (now, now - PIN_LEASE, REAP_BATCH_SIZE)
+                ).fetchall()
+            if not rows:
+                break
+            removed += self._remove([row[0] for row in rows])
+            if len(rows) < REAP_BATCH_SIZE:
+                break
+
+        if self.max_bytes:
+            removed += self._enforce_quota()
+        return removed
+
+    def stats(self):
+        """Return the number of tracked artifacts and their total size"""
+        with self._connect() as db:
+            count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+        return {'artifacts': count, 'bytes': total, 'max_bytes': self.max_bytes}
+
+    def _enforce_quota(self):
+        """Remove the oldest artifacts until the total size fits the quota"""
+        with self._connect() as db:
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            if total <= self.max_bytes:
+                return 0
+            paths = []
+            pin_cutoff = time.time() - PIN_LEASE
+            for path, size in db.execute(
+                    "SELECT path, size FROM artifacts WHERE pins = 0 OR pinned_at < ? ORDER BY created_at", (pin_cutoff,)):
+                paths.append(path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        logger.info(f"Artifact quota exceeded, removing {len(paths)} oldest artifacts")
+        return self._remove(paths)
+
+    def _remove(self, paths):
+        """Delete artifacts from disk and from the index"""
+        removed = []
+        for path in paths:
+            if _remove_path(path):
+                removed.append((path,))
+        with self._lock:
+            with self._connect() as db:
+                db.executemany("DELETE FROM artifacts WHERE path = ?", removed)
+        return len(removed)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.index_path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+
+def output_artifacts(output_folder, result):
+    """Return the top-level output-folder entries behind a job result's downloads"""
+    from modules.result_cache import output_paths
+
+    artifacts = []
+    for relative_path in output_paths(result):
+        top_level = relative_path.replace('\\', '/').split('/', 1)[0]
+        path = os.path.join(output_folder, top_level)
+        if path not in artifacts:
+            artifacts.append(path)
+    return artifacts
+
+
+def parse_tool_ttls(value):
+    """Parse a 'tool=seconds,tool=seconds' string into a dict"""
+    ttls = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        tool, ttl = item.split('=', 1)
+        try:
+            ttls[tool.strip()] = int(ttl)
+        except ValueError:
+            logger.warning(f"Ignoring invalid artifact TTL: {item}")
+    return ttls
+
+
+def _disk_usage(path):
+    if os.path.isdir(path):
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+        return total
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _remove_path(path):
+    """Remove a file or directory; missing paths count as removed"""
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+    except PermissionError:
+        # Still open (e.g. being downloaded on Windows); retry on the next pass
+        logger.warning(f"Could not remove locked artifact: {path}")
+        return False
+    except OSError as e:
+        logger.error(f"Error removing artifact {path}: {str(e)}")
+        return False
+    return True
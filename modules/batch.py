@@ -0,0 +1,574 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import zipfile
+import importlib
+import logging
+from flask import Blueprint, request, jsonify
+from werkzeug.datastructures import FileStorage
+
+from modules.scheduler import JobEmitter, QueueFullError, JobTooLargeError, client_id
+from modules.upload_store import save_upload, get_uploads, safe_upload_name, pin_inputs, release_inputs
+from modules.result_cache import output_paths
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+batch_bp = Blueprint('batch', __name__)
+
+# Seconds before trying again to queue a file when the job queue is full
+REFILL_RETRY_DELAY = 5
+
+
+class BatchError(ValueError):
+    """Raised for a batch request that can't be run"""
+
+
+def _compress_options(form):
+    return {'compression_level': form.get('compression_level', 'medium')}
+
+
+def _protect_options(form):
+    password = form.get('password', '')
+    if not password:
+        raise BatchError('Password is required.')
+    if password != form.get('confirm_password', ''):
+        raise BatchError('Passwords do not match.')
+    return {
+        'password': password,
+        'allow_print': 'allow_print' in form,
+        'allow_copy': 'allow_copy' in form,
+        'allow_modify': 'allow_modify' in form
+    }
+
+
+def _unlock_options(form):
+    password = form.get('password', '')
+    if not password:
+        raise BatchError('Password is required.')
+    return {'password': password}
+
+
+def _rotate_options(form):
+    return {
+        'angle': int(form.get('angle', '90')),
+        'pages_option': form.get('pages', 'all'),
+        'page_range': form.get('rotate_range', '')
+    }
+
+
+def _watermark_options(form):
+    # Image watermarks need a second upload; batches take text watermarks only
+    return {
+        'watermark_type': 'text',
+        'watermark_text': form.get('watermark_text', ''),
+        'opacity': int(form.get('opacity', '30')),
+        'position': form.get('position', 'middle-center')
+    }
+
+
+def _output_format_options(form):
+    return {'output_format': form.get('output_format', 'txt')}
+
+
+def _ocr_options(form):
+    return {'language': form.get('language', 'eng'), 'output_format': form.get('output_format', 'txt')}
+
+
+def _pdf_to_img_options(form):
+    return {'image_format': form.get('format', 'jpg'), 'dpi': int(form.get('dpi', '200'))}
+
+
+def _no_options(form):
+    return {}
+
+
+# Tools that take one PDF and can run over a batch: tool -> (module, worker
+# function, options parser). Options use the same form fields as the tool's route.
+BATCH_TOOLS = {
+    'compress': ('modules.compress_pdf', 'compress_pdf', _compress_options),
+    'protect': ('modules.protect_pdf', 'protect_pdf', _protect_options),
+    'unlock': ('modules.protect_pdf', 'unlock_pdf', _unlock_options),
+    'rotate': ('modules.organize_pdf', 'rotate_pdf', _rotate_options),
+    'watermark': ('modules.organize_pdf', 'add_watermark', _watermark_options),
+    'extract-text': ('modules.extract_pdf', 'extract_text_from_pdf', _output_format_options),
+    'ocr': ('modules.ocr_pdf', 'perform_ocr', _ocr_options),
+    'pdf-to-img': ('modules.convert_pdf', 'convert_pdf_to_images', _pdf_to_img_options),
+    'pdf-to-word': ('modules.convert_pdf', 'convert_pdf_to_word', _no_options),
+    'pdf-to-excel': ('modules.convert_pdf', 'convert_pdf_to_excel', _no_options),
+    'pdf-to-ppt': ('modules.convert_pdf', 'convert_pdf_to_ppt', _no_options)
+}
+
+
+class BatchItem:
+    """One input file of a batch"""
+
+    def __init__(self, index, filename, path):
+        self.index = index
+        self.filename = filename
+        self.path = path
+        self.job = None
+        self.entry = None
+
+
+class Batch:
+    """A set of files run through one tool, collected into a single ZIP"""
+
+    def __init__(self, job, tool, func, options, items, zip_path, emitter, client=None):
+        self.job = job
+        self.client = client
+        self.tool = tool
+        self.func = func
+        self.options = options
+        self.items = items
+        self.zip_path = zip_path
+        self.emitter = emitter
+        self.next_item = 0
+        # Files taken from the batch that the full job queue turned away
+        self.requeue = []
+        self.in_flight = 0
+        self.done = 0
+        self.cancelled = False
+        self.lock = original_threading().Lock()
+        self._folders = set()
+
+    def folder_for(self, item):
+        """Return a unique folder name in the ZIP for an item's outputs"""
+        folder = os.path.splitext(item.filename)[0] or f'file_{item.index + 1}'
+        if folder in self._folders:
+            folder = f'{folder}_{item.index + 1}'
+        self._folders.add(folder)
+        return folder
+
+
+class BatchRunner:
+    """Fan the files of a batch out over the job scheduler.
+
+    Each file becomes an ordinary job of the batch's tool, so per-tool
+    concurrency limits, backends, the result cache and metrics all apply.
+    At most `parallelism` files of one batch are queued at a time, which
+    keeps a large batch from filling the queue ahead of interactive users;
+    the next file is queued as each one finishes. Results are written into
+    the batch ZIP as they arrive, and a manifest.json with per-file status,
+    timings and sizes is added once the last file is done.
+    """
+
+    def __init__(self, scheduler, socketio, output_folder, parallelism=4, result_cache=None, cacheable_tools=()):
+        self.scheduler = scheduler
+        self.socketio = socketio
+        self.output_folder = output_folder
+        self.parallelism = max(1, parallelism)
+        self.result_cache = result_cache
+        self.cacheable_tools = set(cacheable_tools)
+        self._children = {}
+        self._batches = {}
+        # Batches advance from completion hooks, which run on OS threads under eventlet/gevent
+        self._lock = original_threading().RLock()
+        scheduler.completion_hooks.append(self._on_job_finished)
+        scheduler.cancel_hooks.append(self._on_job_cancelled)
+
+    def start(self, tool, options, files, client=None):
+        """Start a batch over (filename, path) pairs for a client and return its job"""
+        module_name, func_name, _ = BATCH_TOOLS[tool]
+        func = getattr(importlib.import_module(module_name), func_name)
+
+        job = self.scheduler.open_job('batch', f'Processing {len(files)} files...')
+        socketio = self.socketio
+        if self.scheduler.offloader:
+            # Batch progress is reported from completion hooks, off the hub
+            socketio = self.scheduler.offloader.emitter(socketio)
+        emitter = JobEmitter(socketio, job)
+        items = [BatchItem(index, filename, path) for index, (filename, path) in enumerate(files)]
+        zip_path = os.path.join(self.output_folder, f'batch_{tool}_{job.id[:8]}.zip')
+        batch = Batch(job, tool, func, options, items, zip_path, emitter, client=client)
+        logger.info(f"Starting {tool} batch {job.id} with {len(items)} files")
+        # Files still waiting their turn must outlive UPLOAD_TTL, however long the batch takes
+        pin_inputs([item.path for item in items])
+        with self._lock:
+            self._batches[job.id] = batch
+
+        self._fill(batch)
+        return job
+
+    def _fill(self, batch):
+        """Queue files until the batch has `parallelism` of them in flight"""
+        while True:
+            # Only reserving the next file needs the lock; the cache lookup and
+            # submit (hashing, SQLite, probing the PDF) run outside it
+            with self._lock:
+                if batch.cancelled or batch.in_flight >= self.parallelism:
+                    return
+                if batch.requeue:
+                    item = batch.requeue.pop(0)
+                elif batch.next_item < len(batch.items):
+                    item = batch.items[batch.next_item]
+                    batch.next_item += 1
+                else:
+                    return
+                batch.in_flight += 1
+                # Known before submitting, so a job that finishes straight
+                # away still finds its batch in the completion hook
+                job_id = uuid.uuid4().hex
+                self._children[job_id] = (batch, item)
+            kwargs = dict(batch.options, file_path=item.path)
+
+            cached = self._cached_result(batch.tool, kwargs)
+            rejected = None
+            if cached is None:
+                try:
+                    job = self.scheduler.submit(
+                        batch.tool, batch.func, cache_key=self._cache_key(batch.tool, kwargs),
+                        client=batch.client, lane='bulk', job_id=job_id, socketio=self.socketio, **kwargs
+                    )
+                except QueueFullError:
+                    logger.warning(f"Job queue is full; retrying batch {batch.job.id} in {REFILL_RETRY_DELAY}s")
+                    with self._lock:
+                        self._children.pop(job_id, None)
+                        batch.requeue.append(item)
+                        batch.in_flight -= 1
+                    timer = original_threading().Timer(REFILL_RETRY_DELAY, self._fill, args=(batch,))
+                    timer.daemon = True
+                    timer.start()
+                    return
+                except JobTooLargeError as e:
+                    rejected = str(e)
+                else:
+                    with self._lock:
+                        item.job = job
+                        cancelled = batch.cancelled
+                    if cancelled:
+                        # The cancel hook ran while this file was being queued
+                        self.scheduler.cancel(job.id, batch.job.cancel_reason)
+                    continue
+
+            with self._lock:
+                self._children.pop(job_id, None)
+            # Cached and rejected files are collected here rather than from the
+            # completion hook, so a batch of them doesn't recurse once per file
+            if rejected is not None:
+                item.job = self.scheduler.add_failed_job(batch.tool, rejected)
+            else:
+                message, result = cached
+                item.job = self.scheduler.add_finished_job(batch.tool, message, result)
+            if self._collect(batch, item):
+                self._finish(batch)
+                return
+
+    def _cache_key(self, tool, kwargs):
+        if self.result_cache is None or tool not in self.cacheable_tools:
+            return None
+        return self.result_cache.key_for(tool, kwargs)
+
+    def _cached_result(self, tool, kwargs):
+        key = self._cache_key(tool, kwargs)
+        return self.result_cache.get(key) if key else None
+
+    def _on_job_finished(self, job):
+        with self._lock:
+            child = self._children.pop(job.id, None)
+        if child is None:
+            return
+        batch, item = child
+        with self._lock:
+            item.job = job
+        if self._collect(batch, item):
+            self._finish(batch)
+        else:
+            self._fill(batch)
+
+    def _on_job_cancelled(self, job):
+        """Scheduler cancel hook: skip a batch's remaining files and cancel the ones in flight"""
+        with self._lock:
+            batch = self._batches.get(job.id)
+            if batch is None or batch.cancelled:
+                return
+            batch.cancelled = True
+            skipped = batch.requeue + batch.items[batch.next_item:]
+            batch.requeue = []
+            batch.next_item = len(batch.items)
+            in_flight = [item.job.id for item in batch.items[:batch.next_item]
+                         if item.job is not None and item.entry is None]
+
+        for item in skipped:
+            item.entry = {
+                'file': item.filename,
+                'status': 'cancelled',
+                'message': 'Not processed: the batch was cancelled.',
+                'queued_seconds': 0,
+                'processing_seconds': 0,
+                'input_size': _size(item.path),
+                'output_size': 0,
+                'outputs': []
+            }
+        with batch.lock:
+            batch.done += len(skipped)
+            finished = batch.done == len(batch.items)
+        if finished:
+            self._finish(batch)
+            return
+
+        # Each cancelled file is collected by the completion hook, and the
+        # last one finishes the batch
+        for job_id in in_flight:
+            self.scheduler.cancel(job_id, job.cancel_reason)
+
+    def _collect(self, batch, item):
+        """Add a finished file's outputs to the ZIP; return True if it was the batch's last file"""
+        job = item.job
+        if job.state == 'finished':
+            status = 'success'
+        else:
+            status = 'cancelled' if job.state == 'cancelled' else 'error'
+        entry = {
+            'file': item.filename,
+            'status': status,
+            'message': job.message if job.state == 'finished' else job.error,
+            'queued_seconds': round((job.started_at or job.submitted_at) - job.submitted_at, 3),
+            'processing_seconds': round((job.finished_at or time.time()) - (job.started_at or job.submitted_at), 3),
+            'input_size': _size(item.path),
+            'output_size': 0,
+            'outputs': []
+        }
+
+        with batch.lock:
+            if entry['status'] == 'success':
+                try:
+                    self._add_outputs(batch, item, job.result or {}, entry)
+                except Exception as e:
+                    logger.error(f"Error adding {item.filename} to batch {batch.job.id}: {str(e)}")
+                    entry['status'] = 'error'
+                    entry['message'] = f'Could not add the result to the ZIP: {str(e)}'
+            if entry['input_size'] and entry['output_size']:
+                entry['size_reduction_percent'] = round((1 - entry['output_size'] / entry['input_size']) * 100, 1)
+            item.entry = entry
+            batch.done += 1
+            finished = batch.done == len(batch.items)
+
+        with self._lock:
+            batch.in_flight -= 1
+
+        icon = {'success': '✅', 'cancelled': '⏹'}.get(entry['status'], '❌')
+        batch.emitter.emit('status_update', {
+            'status': 'processing',
+            'message': f'Processed {batch.done} of {len(batch.items)} files',
+            'progress': int(batch.done / len(batch.items) * 100),
+            'tool': 'batch',
+            'log_entry': f"{icon} {item.filename}: {entry['message']}"
+        })
+        return finished
+
+    def _add_outputs(self, batch, item, result, entry):
+        folder = batch.folder_for(item)
+        with zipfile.ZipFile(batch.zip_path, 'a', zipfile.ZIP_DEFLATED) as archive:
+            for relative_path in output_paths(result):
+                path = os.path.join(self.output_folder, relative_path)
+                if not os.path.isfile(path):
+                    continue
+                arcname = f'{folder}/{os.path.basename(path)}'
+                archive.write(path, arcname)
+                entry['outputs'].append(arcname)
+                entry['output_size'] += os.path.getsize(path)
+
+    def _finish(self, batch):
+        with self._lock:
+            self._batches.pop(batch.job.id, None)
+        release_inputs([item.path for item in batch.items])
+        manifest = [item.entry for item in batch.items]
+        succeeded = sum(1 for entry in manifest if entry['status'] == 'success')
+        cancelled = sum(1 for entry in manifest if entry['status'] == 'cancelled')
+        failed = len(manifest) - succeeded - cancelled
+
+        try:
+            with zipfile.ZipFile(batch.zip_path, 'a', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr('manifest.json', json.dumps({
+                    'tool': batch.tool,
+                    'files': len(manifest),
+                    'succeeded': succeeded,
+                    'failed': failed,
+                    'cancelled': cancelled,
+                    'elapsed_seconds': round(time.time() - batch.job.submitted_at, 3),
+                    'results': manifest
+                }, indent=2))
+        except Exception as e:
+            logger.error(f"Error writing batch {batch.job.id}: {str(e)}")
+            batch.emitter.emit('status_update', {
+                'status': 'error',
+                'message': f'❌ Error creating the batch ZIP: {str(e)}',
+                'tool': 'batch',
+                'log_entry': f'Error writing batch ZIP: {str(e)}'
+            })
+            self.scheduler.finish_job(batch.job)
+            return
+
+        zip_filename = os.path.basename(batch.zip_path)
+        if batch.cancelled:
+            status, message = 'cancelled', f'⏹ Batch cancelled after processing {succeeded} of {len(manifest)} files'
+        elif succeeded:
+            status, message = 'success', f'✅ Processed {succeeded} of {len(manifest)} files'
+        else:
+            status, message = 'error', '❌ None of the files could be processed.'
+        logger.info(f"Finished {batch.tool} batch {batch.job.id}: {succeeded} succeeded, {failed} failed, {cancelled} cancelled")
+        batch.emitter.emit('status_update', {
+            'status': status,
+            'message': message,
+            'downloads': [{
+                'name': zip_filename,
+                'url': f'/download/{zip_filename}',
+                'type': 'Batch results (ZIP)',
+                'filename': zip_filename
+            }],
+            'filename': zip_filename,
+            'succeeded': succeeded,
+            'failed': failed,
+            'cancelled': cancelled,
+            'manifest': manifest,
+            'tool': 'batch',
+            'log_entry': f'Batch finished: {succeeded} succeeded, {failed} failed'
+        })
+        self.scheduler.finish_job(batch.job)
+
+
+def collect_batch_files(uploads, max_files, max_extracted_bytes):
+    """Store the PDFs of a batch request and return (filename, path) pairs.
+
+    Uploaded ZIP archives are unpacked and every PDF inside is stored like
+    an individual upload. The number of files and the unpacked size of all
+    archives are checked before anything is stored.
+    """
+    # (upload, archive, PDF members) for every upload; archive is None for a plain PDF
+    plan = []
+    try:
+        count = 0
+        extracted = 0
+        for upload in uploads:
+            if not upload.filename:
+                continue
+            if not upload.filename.lower().endswith('.zip'):
+                plan.append((upload, None, None))
+                count += 1
+            else:
+                archive = _open_archive(upload)
+                members = _pdf_members(archive)
+                plan.append((upload, archive, members))
+                count += len(members)
+                # Sizes come from the archive's directory; an entry holding more is rejected when unpacked
+                extracted += sum(member.file_size for member in members)
+            if count > max_files:
+                raise BatchError(f'A batch can contain at most {max_files} files.')
+            if extracted > max_extracted_bytes:
+                raise BatchError('The uploaded ZIP files are too large when unpacked.')
+
+        files = []
+        for upload, archive, members in plan:
+            if archive is None:
+                files.append((safe_upload_name(upload.filename), save_upload(upload)))
+            else:
+                files.extend(_extract_archive(upload, archive, members))
+        return files
+    finally:
+        for _, archive, _ in plan:
+            if archive is not None:
+                archive.close()
+
+
+def _open_archive(upload):
+    source = upload.path if hasattr(upload, 'path') else upload.stream
+    try:
+        return zipfile.ZipFile(source)
+    except zipfile.BadZipFile:
+        raise BatchError(f'{upload.filename} is not a valid ZIP file.')
+
+
+def _pdf_members(archive):
+    return [member for member in archive.infolist()
+            if not member.is_dir()
+            and member.filename.lower().endswith('.pdf')
+            and not member.filename.startswith('__MACOSX/')]
+
+
+def _extract_archive(upload, archive, members):
+    files = []
+    for member in members:
+        filename = safe_upload_name(os.path.basename(member.filename))
+        try:
+            with archive.open(member) as stream:
+                reader = _SizeCheckedReader(stream, member.file_size, member.filename)
+                path = save_upload(FileStorage(stream=reader, filename=filename))
+        except (zipfile.BadZipFile, zlib.error, EOFError):
+            raise BatchError(f'{member.filename} in {upload.filename} is damaged.')
+        files.append((filename, path))
+    return files
+
+
+class _SizeCheckedReader:
+    """Read a ZIP member, failing if it holds more data than its entry says"""
+
+    def __init__(self, stream, size, name):
+        self.stream = stream
+        self.remaining = size
+        self.name = name
+
+    def read(self, size=-1):
+        # One byte more than is left is enough to tell that the entry lied
+        if size < 0 or size > self.remaining + 1:
+            size = self.remaining + 1
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        if self.remaining < 0:
+            raise BatchError(f'{self.name} is larger than its ZIP entry says.')
+        return data
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def register_routes(app, socketio):
+    """Register routes with the Flask app"""
+    app.register_blueprint(batch_bp)
+
+    @app.route('/batch', methods=['POST'])
+    def batch_route():
+        from app import batch_runner, job_scheduler, BATCH_MAX_FILES, BATCH_MAX_EXTRACTED_MB
+
+        tool = request.form.get('tool', '')
+        if tool not in BATCH_TOOLS:
+            return jsonify({
+                'status': 'error',
+                'message': f"Unknown tool. Batches support: {', '.join(BATCH_TOOLS)}."
+            }), 400
+
+        uploads = get_uploads('files[]')
+        if not uploads:
+            return jsonify({'status': 'error', 'message': 'No files were uploaded.'}), 400
+
+        stats = job_scheduler.stats()
+        if stats['queued'] >= stats['max_queue_size']:
+            response = jsonify({'status': 'error', 'message': 'The server is busy. Please try again in a moment.'})
+            response.headers['Retry-After'] = '30'
+            return response, 429
+
+        try:
+            options = BATCH_TOOLS[tool][2](request.form)
+            files = collect_batch_files(uploads, BATCH_MAX_FILES, BATCH_MAX_EXTRACTED_MB * 1024 * 1024)
+        except (BatchError, ValueError) as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        if not files:
+            return jsonify({'status': 'error', 'message': 'No PDF files were found in the upload.'}), 400
+
+        job = batch_runner.start(tool, options, files, client=client_id(request))
+        return jsonify({
+            'status': 'processing',
+            'message': f'Processing {len(files)} files...',
+            'job_id': job.id,
+            'status_url': f'/jobs/{job.id}',
+            'files': len(files)
+        })
@@ -0,0 +1,112 @@
+import time
+import threading
+import logging
+
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(BaseException):
+    """Raised inside a cancelled job's worker function at its next status update.
+
+    It derives from BaseException so the worker functions' `except Exception`
+    blocks don't report it as an error and carry on.
+    """
+
+
+class AbandonedJobReaper:
+    """Cancel jobs whose Socket.IO room has had no listeners for a while.
+
+    Only jobs that somebody joined are watched; clients that poll
+    /jobs/<job_id> instead never join a room, and their jobs are left alone.
+    The page keeps its unfinished job IDs in sessionStorage and joins them
+    again whenever its socket connects, so a reload or a brief reconnect
+    re-joins within the grace period and only a closed tab or a connection
+    lost for longer than the grace period cancels the job.
+    """
+
+    def __init__(self, scheduler, grace=60, interval=5):
+        self.scheduler = scheduler
+        self.grace = grace
+        self.interval = interval
+        self._listeners = {}
+        self._jobs_by_sid = {}
+        self._empty_since = {}
+        # A real OS lock even under eventlet/gevent, like the scheduler's own
+        self._lock = original_threading().Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the background reaper thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='job-reaper', daemon=True)
+            self._thread.start()
+
+    def joined(self, sid, job_id):
+        """Record that a client joined a job's room"""
+        with self._lock:
+            self._listeners.setdefault(job_id, set()).add(sid)
+            self._jobs_by_sid.setdefault(sid, set()).add(job_id)
+            self._empty_since.pop(job_id, None)
+
+    def disconnected(self, sid):
+        """Record that a client went away, leaving every room it was in"""
+        now = time.monotonic()
+        with self._lock:
+            for job_id in self._jobs_by_sid.pop(sid, ()):
+                listeners = self._listeners.get(job_id)
+                if listeners is None:
+                    continue
+                listeners.discard(sid)
+                if not listeners:
+                    self._empty_since[job_id] = now
+
+    def reap(self, now=None):
+        """Cancel jobs that have been without listeners for the grace period; return their IDs"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [job_id for job_id, since in self._empty_since.items() if now - since >= self.grace]
+            for job_id in expired:
+                del self._empty_since[job_id]
+                self._listeners.pop(job_id, None)
+
+        cancelled = []
+        for job_id in expired:
+            job = self.scheduler.get_job(job_id)
+            if job is None or job.finished_at is not None:
+                continue
+            logger.info(f"Cancelling {job.tool} job {job_id}: nobody has been listening for {self.grace}s")
+            self.scheduler.cancel(job_id, 'Cancelled because the page was closed.')
+            cancelled.append(job_id)
+
+        self._forget_finished()
+        return cancelled
+
+    def _forget_finished(self):
+        """Stop tracking rooms of jobs that are done"""
+        with self._lock:
+            job_ids = list(self._listeners)
+        for job_id in job_ids:
+            job = self.scheduler.get_job(job_id)
+            if job is not None and job.finished_at is None:
+                continue
+            with self._lock:
+                for sid in self._listeners.pop(job_id, ()):
+                    jobs = self._jobs_by_sid.get(sid)
+                    if jobs is not None:
+                        jobs.discard(job_id)
+                        if not jobs:
+                            del self._jobs_by_sid[sid]
+                self._empty_since.pop(job_id, None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reap()
+            except Exception as e:
+                logger.error(f"Error cancelling abandoned jobs: {str(e)}")
@@ -0,0 +1,376 @@
+"""Run the PDF tools over files and directories from the command line.
+
+    python -m modules.cli compress scans/ -o compressed/ --level high --jobs 8
+    python -m modules.cli extract-text archive/ -o text/ --format txt
+    python -m modules.cli merge a.pdf b.pdf c.pdf -o merged/
+
+Each file is processed with modules.library, which runs the same worker
+functions the web app queues, in a pool of worker processes. Outputs
+mirror the input directory layout under the output directory. A manifest in the output directory records
+every file that was processed, so running the same command again only
+picks up new or changed files.
+"""
+import os
+import sys
+import json
+import time
+import fnmatch
+import hashlib
+import argparse
+import logging
+import multiprocessing
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = '.pdf-toolkit-manifest.jsonl'
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5
+
+
+def _compress_options(args):
+    return {'compression_level': args.level}
+
+
+def _split_options(args):
+    return {'split_method': args.method, 'page_range': args.range, 'odd_even': args.odd_even}
+
+
+def _rotate_options(args):
+    return {'angle': args.angle, 'pages_option': 'custom' if args.pages else 'all', 'page_range': args.pages or ''}
+
+
+def _watermark_options(args):
+    return {'watermark_type': 'text', 'watermark_text': args.text, 'opacity': args.opacity, 'position': args.position}
+
+
+def _password_options(args):
+    return {'password': args.password}
+
+
+def _format_options(args):
+    return {'output_format': args.format}
+
+
+def _ocr_options(args):
+    return {'language': args.language, 'output_format': args.format}
+
+
+def _pdf_to_img_options(args):
+    return {'image_format': args.format, 'dpi': args.dpi}
+
+
+def _no_options(args):
+    return {}
+
+
+# tool -> worker function options from the parsed arguments
+CLI_TOOLS = {
+    'compress': _compress_options,
+    'split': _split_options,
+    'merge': _no_options,
+    'rotate': _rotate_options,
+    'watermark': _watermark_options,
+    'protect': _password_options,
+    'unlock': _password_options,
+    'extract-text': _format_options,
+    'ocr': _ocr_options,
+    'pdf-to-img': _pdf_to_img_options,
+    'pdf-to-word': _no_options,
+    'pdf-to-excel': _no_options,
+    'pdf-to-ppt': _no_options
+}
+
+# Temp directory of the worker processes, set by _init_worker
+_temp_dir = None
+
+
+def _process_file(task):
+    """Pool worker: process one input file and describe the outcome"""
+    from modules.library import run_tool
+
+    tool, options, path, output_dir = task
+    start = time.perf_counter()
+    try:
+        result = run_tool(tool, output_dir=output_dir, temp_dir=_temp_dir, file_path=path, **options)
+        status, message, outputs, output_size = result.status, result.message, result.outputs, result.output_bytes
+    except Exception as e:
+        status, message, outputs, output_size = 'error', str(e), [], 0
+
+    return {
+        'input': path,
+        'status': status,
+        'message': message,
+        'seconds': round(time.perf_counter() - start, 3),
+        'input_size': _size(path),
+        'output_size': output_size,
+        'outputs': outputs
+    }
+
+
+def _init_worker(temp_dir, verbose):
+    global _temp_dir
+    _temp_dir = temp_dir
+    logging.basicConfig(level=logging.INFO if verbose else logging.CRITICAL)
+
+
+def find_inputs(paths, pattern):
+    """Expand files and directories into (input path, path relative to its root) pairs"""
+    inputs = []
+    for path in paths:
+        if os.path.isfile(path):
+            inputs.append((os.path.abspath(path), os.path.basename(path)))
+            continue
+        if not os.path.isdir(path):
+            logger.warning(f"Skipping {path}: not a file or directory")
+            continue
+        root = os.path.abspath(path)
+        for directory, subdirectories, filenames in os.walk(root):
+            subdirectories[:] = sorted(name for name in subdirectories if not name.startswith('.'))
+            for filename in sorted(filenames):
+                if fnmatch.fnmatch(filename.lower(), pattern):
+                    full_path = os.path.join(directory, filename)
+                    inputs.append((full_path, os.path.relpath(full_path, root)))
+    return inputs
+
+
+class Manifest:
+    """Append-only record of processed files in the output directory.
+
+    Each line is one processed file. A file is skipped on the next run if
+    it was processed successfully with the same tool and options and its
+    size and modification time haven't changed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by an interrupted run
+                        continue
+                    if entry.get('status') == 'success':
+                        self.done[entry['input']] = entry
+        except FileNotFoundError:
+            pass
+        self._file = None
+
+    def is_done(self, path, options_key):
+        entry = self.done.get(path)
+        if entry is None or entry.get('options') != options_key:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns
+
+    def record(self, result, options_key):
+        try:
+            stat = os.stat(result['input'])
+            result = dict(result, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        except OSError:
+            pass
+        if self._file is None:
+            self._file = open(self.path, 'a')
+        self._file.write(json.dumps(dict(result, options=options_key)) + '\n')
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class Progress:
+    """Count finished files and print throughput while a run is going"""
+
+    def __init__(self, total, stream=sys.stderr):
+        self.total = total
+        self.stream = stream
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.succeeded = 0
+        self.failed = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.durations = []
+
+    def add(self, result):
+        if result['status'] == 'success':
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.input_bytes += result['input_size']
+        self.output_bytes += result['output_size']
+        self.durations.append(result['seconds'])
+
+        now = time.monotonic()
+        if now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            done = self.succeeded + self.failed
+            rate = done / (now - self.start)
+            eta = (self.total - done) / rate if rate else 0
+            print(f'{done}/{self.total} files, {rate:.1f} files/s, '
+                  f'{self.input_bytes / (now - self.start) / 1e6:.1f} MB/s, ETA {eta:.0f}s', file=self.stream)
+
+    def summary(self, skipped):
+        elapsed = time.monotonic() - self.start
+        done = self.succeeded + self.failed
+        durations = sorted(self.durations)
+        lines = [
+            f'Processed {done} files in {elapsed:.1f}s ({self.succeeded} succeeded, {self.failed} failed, {skipped} skipped)',
+            f'Throughput: {done / elapsed if elapsed else 0:.2f} files/s, {self.input_bytes / elapsed / 1e6 if elapsed else 0:.2f} MB/s in',
+            f'Input {self.input_bytes / 1e6:.1f} MB, output {self.output_bytes / 1e6:.1f} MB'
+        ]
+        if durations:
+            p50 = durations[len(durations) // 2]
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            lines.append(f'Per file: p50 {p50:.2f}s, p95 {p95:.2f}s, max {durations[-1]:.2f}s')
+        return '\n'.join(lines)
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def options_key(tool, options):
+    """Identify a tool and its options without storing them (they may hold passwords)"""
+    return hashlib.sha256(json.dumps([tool, options], sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def run_merge(args, options, inputs):
+    """Merge every input into one PDF in this process"""
+    paths = [path for path, _ in inputs]
+    if len(paths) < 2:
+        print('merge needs at least two PDF files', file=sys.stderr)
+        return 1
+
+    from modules.library import run_tool
+
+    result = run_tool('merge', output_dir=args.output, temp_dir=args.temp_dir, file_paths=paths, **options)
+    print(f'{result.message} ({len(paths)} files in {result.seconds:.1f}s)')
+    return 0 if result.ok else 1
+
+
+def run(args):
+    options = CLI_TOOLS[args.tool](args)
+    args.output = os.path.abspath(args.output)
+    args.temp_dir = os.path.join(args.output, '.tmp')
+    os.makedirs(args.temp_dir, exist_ok=True)
+
+    try:
+        inputs = find_inputs(args.inputs, args.pattern)
+        if args.tool == 'merge':
+            return run_merge(args, options, inputs)
+        return run_files(args, options, inputs)
+    finally:
+        # Leave the temp directory only if a tool left files behind in it
+        try:
+            os.rmdir(args.temp_dir)
+        except OSError:
+            pass
+
+
+def run_files(args, options, inputs):
+    """Process each input on its own in a pool of worker processes"""
+    key = options_key(args.tool, options)
+    manifest = Manifest(os.path.join(args.output, MANIFEST_NAME))
+    tasks = []
+    skipped = 0
+    for path, relative_path in inputs:
+        if not args.force and manifest.is_done(path, key):
+            skipped += 1
+            continue
+        output_dir = os.path.join(args.output, os.path.dirname(relative_path))
+        tasks.append((args.tool, options, path, output_dir))
+
+    print(f'{len(tasks)} files to process with {args.jobs} workers ({skipped} already done)', file=sys.stderr)
+    progress = Progress(len(tasks))
+    try:
+        if tasks:
+            with multiprocessing.Pool(args.jobs, initializer=_init_worker, initargs=(args.temp_dir, args.verbose),
+                                      maxtasksperchild=args.max_tasks_per_worker or None) as pool:
+                for result in pool.imap_unordered(_process_file, tasks):
+                    manifest.record(result, key)
+                    progress.add(result)
+                    if result['status'] != 'success':
+                        print(f"Failed: {result['input']}: {result['message']}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print('Interrupted; finished files are recorded in the manifest', file=sys.stderr)
+        return 130
+    finally:
+        manifest.close()
+
+    print(progress.summary(skipped))
+    return 1 if progress.failed else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m modules.cli', description=__doc__.split('\n')[0])
+    tools = parser.add_subparsers(dest='tool', required=True, metavar='tool')
+
+    def add_tool(name, help_text):
+        tool = tools.add_parser(name, help=help_text)
+        tool.add_argument('inputs', nargs='+', help='PDF files or directories to walk')
+        tool.add_argument('-o', '--output', required=True, help='output directory')
+        tool.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='worker processes (default: CPU count)')
+        tool.add_argument('--pattern', default='*.pdf', help='file name pattern in directories (default *.pdf)')
+        tool.add_argument('--force', action='store_true', help='process files the manifest lists as done')
+        tool.add_argument('--max-tasks-per-worker', type=int, default=200,
+                          help='restart a worker process after this many files, returning its memory (0: never)')
+        tool.add_argument('-v', '--verbose', action='store_true', help='show the tools\' log messages')
+        return tool
+
+    add_tool('compress', 'compress PDFs').add_argument('--level', choices=('low', 'medium', 'high'), default='medium')
+
+    split = add_tool('split', 'split PDFs into pages or ranges')
+    split.add_argument('--method', choices=('all', 'range', 'odd_even'), default='all')
+    split.add_argument('--range', default='', help='page ranges for --method range, e.g. 1-3,5')
+    split.add_argument('--odd-even', choices=('all', 'odd', 'even'), default='all')
+
+    add_tool('merge', 'merge all inputs into one PDF')
+
+    rotate = add_tool('rotate', 'rotate pages')
+    rotate.add_argument('--angle', type=int, choices=(90, 180, 270), default=90)
+    rotate.add_argument('--pages', help='page ranges to rotate, e.g. 1-3,5 (default: all)')
+
+    watermark = add_tool('watermark', 'add a text watermark')
+    watermark.add_argument('--text', required=True)
+    watermark.add_argument('--opacity', type=int, default=30)
+    watermark.add_argument('--position', default='middle-center')
+
+    add_tool('protect', 'password-protect PDFs').add_argument('--password', required=True)
+    add_tool('unlock', 'remove password protection').add_argument('--password', required=True)
+    add_tool('extract-text', 'extract text').add_argument('--format', choices=('txt', 'docx'), default='txt')
+
+    ocr = add_tool('ocr', 'recognize text in scanned PDFs')
+    ocr.add_argument('--language', default='eng')
+    ocr.add_argument('--format', choices=('txt', 'docx', 'pdf'), default='txt')
+
+    pdf_to_img = add_tool('pdf-to-img', 'render pages as images')
+    pdf_to_img.add_argument('--format', choices=('jpg', 'png'), default='jpg')
+    pdf_to_img.add_argument('--dpi', type=int, default=200)
+
+    add_tool('pdf-to-word', 'convert PDFs to Word documents')
+    add_tool('pdf-to-excel', 'convert PDF tables to Excel workbooks')
+    add_tool('pdf-to-ppt', 'convert PDFs to PowerPoint decks')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,6 +5,9 @@ from PyPDF2 import PdfReader, PdfWriter
 import uuid
 import time
 import logging
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_upload
+from modules.fast_path import run_inline
 from PIL import Image
 import io
 import math
@@ -12,6 +15,9 @@ import math
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Compression levels accepted by the compress tool
+COMPRESSION_LEVELS = ('low', 'medium', 'high')
+
 # Create blueprint
 compress_bp = Blueprint('compress', __name__)
 
@@ -21,7 +27,7 @@ def register_routes(app, socketio):
     
     @app.route('/compress', methods=['POST'])
     def compress_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -29,7 +35,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -41,22 +47,26 @@ def register_routes(app, socketio):
         # Get compression level
         compression_level = request.form.get('compression_level', 'medium')
         
+        # Small documents can be compressed inline and returned directly (?sync=1);
+        # unknown levels fall back to medium, as they do in compress_pdf()
+        inline_level = compression_level if compression_level in COMPRESSION_LEVELS else 'medium'
+        response = run_inline('compress', pdf_file, [{'op': 'compress', 'compression_level': inline_level}],
+                              'compressed')
+        if response is not None:
+            return response
+        
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            compress_pdf, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'compress',
+            compress_pdf,
+            'Compressing PDF...',
             file_path=file_path,
             compression_level=compression_level,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Compressing PDF...'})
 
 def compress_pdf(file_path, compression_level='medium', socketio=None):
     """Compress PDF file"""
@@ -70,7 +80,8 @@ def compress_pdf(file_path, compression_level='medium', socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -160,6 +171,7 @@ def compress_pdf(file_path, compression_level='medium', socketio=None):
         
         for i, page in enumerate(reader.pages):
             # Add page to writer
+            compress_page(page)
             writer.add_page(page)
             
             # Update progress
@@ -243,6 +255,24 @@ def compress_pdf(file_path, compression_level='medium', socketio=None):
                 'log_entry': error_msg
             })
 
+def compress_page(page):
+    """Flate-encode a page's content streams if they are stored uncompressed.
+
+    Streams that already have a filter are left alone: decoding and
+    re-encoding them with PyPDF2 usually makes them larger, not smaller.
+    Call this before the page is added to a PdfWriter, or the writer keeps
+    the old stream as well.
+    """
+    contents = page.get('/Contents')
+    if contents is None:
+        return False
+    contents = contents.get_object()
+    streams = [item.get_object() for item in contents] if isinstance(contents, list) else [contents]
+    if all('/Filter' in stream for stream in streams):
+        return False
+    page.compress_content_streams()
+    return True
+
 def format_file_size(size_in_bytes):
     """Format file size in human-readable format"""
     if size_in_bytes < 1024:
@@ -0,0 +1,85 @@
+import os
+import contextvars
+from contextlib import contextmanager
+
+# Configure upload and output folders
+# These live outside app.py so worker functions running in a child process
+# can find them without importing (and re-initialising) the Flask app
+# With several nodes, STORAGE_DIR (or the individual folders) points at a
+# volume every node mounts at the same path, so a worker on one node can read
+# uploads received by another and any node can serve the outputs
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORAGE_DIR = os.path.abspath(os.environ.get('STORAGE_DIR', BASE_DIR))
+UPLOAD_FOLDER = os.path.abspath(os.environ.get('UPLOAD_FOLDER', os.path.join(STORAGE_DIR, 'uploads')))
+OUTPUT_FOLDER = os.path.abspath(os.environ.get('OUTPUT_FOLDER', os.path.join(STORAGE_DIR, 'output')))
+TEMP_FOLDER = os.path.abspath(os.environ.get('TEMP_FOLDER', os.path.join(STORAGE_DIR, 'temp')))
+CACHE_FOLDER = os.path.abspath(os.environ.get('CACHE_FOLDER', os.path.join(STORAGE_DIR, 'cache')))
+ARTIFACT_INDEX_PATH = os.path.join(CACHE_FOLDER, 'artifacts.sqlite3')
+PROFILE_FOLDER = os.path.abspath(os.environ.get('PROFILE_FOLDER', os.path.join(STORAGE_DIR, 'profiles')))
+
+# Queue shared by the web nodes and the `python -m modules.worker` processes
+# when NODE_ROLE=web; see modules.shared_queue
+SHARED_QUEUE_PATH = os.path.abspath(os.environ.get('SHARED_QUEUE_PATH', os.path.join(CACHE_FOLDER, 'jobs.sqlite3')))
+
+# Per-tool concurrency limits and execution backends, overridden by the
+# TOOL_CONCURRENCY and TOOL_BACKENDS environment variables. The web app and
+# the queue workers both start from these
+DEFAULT_TOOL_CONCURRENCY = {
+    'ocr': 2,
+    'pdf-to-img': 2,
+    'pdf-to-ppt': 2,
+    'pdf-to-excel': 2,
+    'compress': 4,
+    'watermark': 4,
+    'pipeline': 4,
+    'merge': 8,
+    'split': 8,
+    'rotate': 8,
+    'protect': 8,
+    'unlock': 8
+}
+
+# CPU-bound tools run in worker processes so they don't serialize on the GIL
+DEFAULT_TOOL_BACKENDS = {
+    'compress': 'process',
+    'ocr': 'process',
+    'pdf-to-img': 'process',
+    'watermark': 'process',
+    'pipeline': 'process',
+    # Runs pdftoppm; in a process it can be stopped when the job is cancelled
+    'pdf-to-ppt': 'process'
+}
+
+# Tools whose small jobs go in the scheduler's interactive lane (INTERACTIVE_TOOLS)
+DEFAULT_INTERACTIVE_TOOLS = 'rotate,protect,unlock,merge,split,compress,watermark,pipeline,extract-text'
+
+# Maximum number of progress updates emitted per second for a single job
+# (success and error updates are always sent immediately)
+PROGRESS_MAX_RATE = float(os.environ.get('PROGRESS_MAX_RATE', 5))
+
+# Folders for the worker function running in the current thread (or task),
+# set by library callers that want outputs somewhere other than OUTPUT_FOLDER
+_output_folder = contextvars.ContextVar('output_folder', default=None)
+_temp_folder = contextvars.ContextVar('temp_folder', default=None)
+
+
+def output_folder():
+    """Return the folder worker functions write their outputs to"""
+    return _output_folder.get() or OUTPUT_FOLDER
+
+
+def temp_folder():
+    """Return the folder worker functions keep intermediate files in"""
+    return _temp_folder.get() or TEMP_FOLDER
+
+
+@contextmanager
+def use_folders(output=None, temp=None):
+    """Direct the worker functions called in this context to other folders"""
+    output_token = _output_folder.set(output)
+    temp_token = _temp_folder.set(temp)
+    try:
+        yield
+    finally:
+        _output_folder.reset(output_token)
+        _temp_folder.reset(temp_token)
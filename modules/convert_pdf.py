@@ -4,6 +4,8 @@ from werkzeug.utils import secure_filename
 import uuid
 import time
 import logging
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_upload, get_uploads
 import zipfile
 from PyPDF2 import PdfReader, PdfWriter
 from PIL import Image
@@ -41,7 +43,7 @@ def register_routes(app, socketio):
     
     @app.route('/pdf_to_img', methods=['POST'])
     def pdf_to_img_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -49,7 +51,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -63,26 +65,22 @@ def register_routes(app, socketio):
         dpi = int(request.form.get('dpi', '200'))
         
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            convert_pdf_to_images, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'pdf-to-img',
+            convert_pdf_to_images,
+            'Converting PDF to images...',
             file_path=file_path,
             image_format=image_format,
             dpi=dpi,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Converting PDF to images...'})
     
     @app.route('/img_to_pdf', methods=['POST'])
     def img_to_pdf_route():
-        if 'images[]' not in request.files:
+        if not has_upload('images[]'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No image files were uploaded.',
@@ -90,7 +88,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No image files were uploaded.'})
         
-        images = request.files.getlist('images[]')
+        images = get_uploads('images[]')
         if len(images) == 0:
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -108,10 +106,7 @@ def register_routes(app, socketio):
             if image.filename == '':
                 continue
             
-            filename = secure_filename(image.filename)
-            from app import UPLOAD_FOLDER
-            file_path = os.path.join(UPLOAD_FOLDER, filename)
-            image.save(file_path)
+            file_path = save_upload(image)
             image_paths.append(file_path)
         
         if len(image_paths) == 0:
@@ -122,20 +117,19 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No valid image files were uploaded.'})
         
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            convert_images_to_pdf, 
+        # Queue the job on the scheduler
+        return start_job(
+            'img-to-pdf',
+            convert_images_to_pdf,
+            'Converting images to PDF...',
             image_paths=image_paths,
             image_order=image_order,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Converting images to PDF...'})
     
     @app.route('/pdf_to_word', methods=['POST'])
     def pdf_to_word_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -143,7 +137,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -153,24 +147,20 @@ def register_routes(app, socketio):
             return jsonify({'status': 'error', 'message': 'No PDF file was selected.'})
         
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            convert_pdf_to_word, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'pdf-to-word',
+            convert_pdf_to_word,
+            'Converting PDF to Word...',
             file_path=file_path,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Converting PDF to Word...'})
     
     @app.route('/pdf_to_excel', methods=['POST'])
     def pdf_to_excel_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -178,7 +168,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -188,24 +178,20 @@ def register_routes(app, socketio):
             return jsonify({'status': 'error', 'message': 'No PDF file was selected.'})
         
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            convert_pdf_to_excel, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'pdf-to-excel',
+            convert_pdf_to_excel,
+            'Converting PDF to Excel...',
             file_path=file_path,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Converting PDF to Excel...'})
     
     @app.route('/pdf_to_ppt', methods=['POST'])
     def pdf_to_ppt_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -213,7 +199,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -223,24 +209,20 @@ def register_routes(app, socketio):
             return jsonify({'status': 'error', 'message': 'No PDF file was selected.'})
         
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            convert_pdf_to_ppt, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'pdf-to-ppt',
+            convert_pdf_to_ppt,
+            'Converting PDF to PowerPoint...',
             file_path=file_path,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Converting PDF to PowerPoint...'})
     
     @app.route('/word_to_pdf', methods=['POST'])
     def word_to_pdf_route():
-        if 'word' not in request.files:
+        if not has_upload('word'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No Word file was uploaded.',
@@ -248,7 +230,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No Word file was uploaded.'})
         
-        word_file = request.files['word']
+        word_file = get_upload('word')
         if word_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -258,24 +240,20 @@ def register_routes(app, socketio):
             return jsonify({'status': 'error', 'message': 'No Word file was selected.'})
         
         # Save the uploaded file
-        filename = secure_filename(word_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        word_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            convert_word_to_pdf, 
+        file_path = save_upload(word_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'word-to-pdf',
+            convert_word_to_pdf,
+            'Converting Word to PDF...',
             file_path=file_path,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Converting Word to PDF...'})
     
     @app.route('/excel_to_pdf', methods=['POST'])
     def excel_to_pdf_route():
-        if 'excel' not in request.files:
+        if not has_upload('excel'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No Excel file was uploaded.',
@@ -283,7 +261,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No Excel file was uploaded.'})
         
-        excel_file = request.files['excel']
+        excel_file = get_upload('excel')
         if excel_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -293,24 +271,20 @@ def register_routes(app, socketio):
             return jsonify({'status': 'error', 'message': 'No Excel file was selected.'})
         
         # Save the uploaded file
-        filename = secure_filename(excel_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        excel_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            convert_excel_to_pdf, 
+        file_path = save_upload(excel_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'excel-to-pdf',
+            convert_excel_to_pdf,
+            'Converting Excel to PDF...',
             file_path=file_path,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Converting Excel to PDF...'})
     
     @app.route('/ppt_to_pdf', methods=['POST'])
     def ppt_to_pdf_route():
-        if 'ppt' not in request.files:
+        if not has_upload('ppt'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PowerPoint file was uploaded.',
@@ -318,7 +292,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PowerPoint file was uploaded.'})
         
-        ppt_file = request.files['ppt']
+        ppt_file = get_upload('ppt')
         if ppt_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -328,20 +302,16 @@ def register_routes(app, socketio):
             return jsonify({'status': 'error', 'message': 'No PowerPoint file was selected.'})
         
         # Save the uploaded file
-        filename = secure_filename(ppt_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        ppt_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            convert_ppt_to_pdf, 
+        file_path = save_upload(ppt_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'ppt-to-pdf',
+            convert_ppt_to_pdf,
+            'Converting PowerPoint to PDF...',
             file_path=file_path,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Converting PowerPoint to PDF...'})
 
 def convert_pdf_to_images(file_path, image_format='jpg', dpi=200, socketio=None):
     """Convert PDF to images"""
@@ -354,7 +324,8 @@ def convert_pdf_to_images(file_path, image_format='jpg', dpi=200, socketio=None)
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -468,7 +439,8 @@ def convert_images_to_pdf(image_paths, image_order='', socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -584,7 +556,8 @@ def convert_pdf_to_word(file_path, socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -678,7 +651,8 @@ def convert_pdf_to_excel(file_path, socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -756,7 +730,7 @@ def convert_pdf_to_excel(file_path, socketio=None):
                 'tool': 'pdf-to-excel'
             })
 
-def convert_pdf_to_ppt(file_path, socketio=None):
+def convert_pdf_to_ppt(file_path, dpi=300, socketio=None):
     """Convert PDF to PowerPoint presentation"""
     if socketio:
         socketio.emit('status_update', {
@@ -767,7 +741,8 @@ def convert_pdf_to_ppt(file_path, socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -788,7 +763,7 @@ def convert_pdf_to_ppt(file_path, socketio=None):
             })
         
         # Convert PDF to images
-        images = convert_from_path(file_path, dpi=300)
+        images = convert_from_path(file_path, dpi=dpi)
         
         if not images:
             if socketio:
@@ -885,7 +860,8 @@ def convert_word_to_pdf(file_path, socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -947,7 +923,8 @@ def convert_excel_to_pdf(file_path, socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -1055,7 +1032,8 @@ def convert_ppt_to_pdf(file_path, socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
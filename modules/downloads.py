@@ -0,0 +1,104 @@
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+from werkzeug.utils import safe_join
+
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+
+class ETagCache:
+    """Strong ETags for output files, computed from their content.
+
+    Hashing a large output is done once, when the job that wrote it finishes
+    (or on its first download after a restart); later requests reuse the digest for as long as the file's inode, size and
+    modification time are unchanged (outputs are never rewritten in place,
+    so in practice that is until the file is removed).
+    """
+
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = original_threading().Lock()
+
+    def etag_for(self, path):
+        """Return the ETag value for a file"""
+        st = os.stat(path)
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == signature:
+                self._entries.move_to_end(path)
+                return entry[1]
+
+        etag = _hash_file(path)
+        with self._lock:
+            self._entries[path] = (signature, etag)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+
+def _hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()[:32]
+
+
+class OutputIndex:
+    """Map download filenames to their path in the output folder.
+
+    Finished jobs add their downloads here, so a file can be found by the
+    name the client was shown without listing the output folder.
+    """
+
+    def __init__(self, output_folder, max_entries=100000):
+        self.output_folder = output_folder
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Filled by a completion hook, on an OS thread under eventlet/gevent
+        self._lock = original_threading().Lock()
+
+    def add_result(self, result):
+        """Index every download in a job result"""
+        for value in result.values():
+            if not isinstance(value, list):
+                continue
+            for item in value:
+                if isinstance(item, dict) and str(item.get('url', '')).startswith('/download/'):
+                    relative_path = item['url'][len('/download/'):]
+                    self.add(item.get('filename') or os.path.basename(relative_path), relative_path)
+
+    def add(self, filename, relative_path):
+        with self._lock:
+            self._entries[filename] = relative_path
+            self._entries.move_to_end(filename)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def find(self, filename):
+        """Return the absolute path of an output by download name, or None"""
+        with self._lock:
+            relative_path = self._entries.get(filename)
+
+        # Names that were never indexed (e.g. from before a restart) can
+        # still be given as a path relative to the output folder
+        path = safe_join(self.output_folder, relative_path or filename)
+        if path is None or not os.path.isfile(path):
+            if relative_path:
+                with self._lock:
+                    self._entries.pop(filename, None)
+            return None
+        return path
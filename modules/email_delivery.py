@@ -0,0 +1,315 @@
+import os
+import time
+import uuid
+import queue
+import base64
+import socket
+import smtplib
+import threading
+import mimetypes
+import logging
+from contextlib import contextmanager
+from email import policy
+from email.message import EmailMessage
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Attachment bytes read per base64 block; a multiple of 57 so every block
+# encodes to whole 76-character lines
+ATTACHMENT_BLOCK_SIZE = 57 * 1024
+
+# Bytes collected before each write to the SMTP socket
+SEND_BUFFER_SIZE = 64 * 1024
+
+
+class EmailQueueFullError(Exception):
+    """Raised when the send queue is at capacity"""
+
+
+class SMTPConnectionPool:
+    """Keep SMTP connections open between emails.
+
+    Connecting, STARTTLS and AUTH cost several round trips, so sessions are
+    reused for later messages. A connection that has been idle longer than
+    idle_timeout is assumed to have been dropped by the server and is
+    replaced instead of being reused.
+    """
+
+    def __init__(self, host, port, user='', password='', starttls=True, size=1, timeout=30, idle_timeout=60):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; it goes back to the pool unless the block fails"""
+        with self._slots:
+            server = self._take_idle() or self._connect()
+            try:
+                yield server
+            except Exception:
+                _close(server)
+                raise
+            with self._lock:
+                self._idle.append((server, time.monotonic()))
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            _close(server)
+
+    def _take_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                server, last_used = self._idle.pop()
+                if now - last_used < self.idle_timeout:
+                    return server
+                _close(server)
+        return None
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.starttls:
+                server.starttls()
+                server.ehlo()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            _close(server)
+            raise
+        return server
+
+
+class OutgoingEmail:
+    """An email with one file attachment waiting in the send queue"""
+
+    def __init__(self, recipient, subject, message, file_path, sid=None):
+        self.id = uuid.uuid4().hex
+        self.recipient = recipient
+        self.subject = subject or ''
+        self.message = message or ''
+        self.file_path = file_path
+        self.sid = sid
+        self.attempts = 0
+
+
+class EmailDelivery:
+    """Bounded send queue in front of an SMTP connection pool.
+
+    Emails are sent by a small set of worker threads, one per pooled
+    connection. Temporary failures (dropped connections, 4xx replies) are
+    retried with exponential backoff; permanent 5xx replies fail at once.
+    The attachment is base64-encoded and written to the SMTP socket block
+    by block, so a large output is never held in memory.
+    """
+
+    def __init__(self, pool, sender, notify=None, workers=1, max_queue_size=100,
+                 max_retries=3, retry_delay=5):
+        self.pool = pool
+        self.sender = sender
+        self.notify = notify
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'email-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, email):
+        """Queue an email, or raise EmailQueueFullError"""
+        self.start()
+        try:
+            self._queue.put_nowait(email)
+        except queue.Full:
+            raise EmailQueueFullError(f"Email queue is full ({self._queue.maxsize} waiting)")
+        return email
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _worker_loop(self):
+        while True:
+            email = self._queue.get()
+            try:
+                self._deliver(email)
+            finally:
+                self._queue.task_done()
+
+    def _deliver(self, email):
+        email.attempts += 1
+        try:
+            self._send(email)
+        except Exception as e:
+            if _is_temporary(e) and email.attempts <= self.max_retries:
+                delay = self.retry_delay * 2 ** (email.attempts - 1)
+                logger.warning(f"Email {email.id} failed ({str(e)}), retrying in {delay} seconds")
+                timer = threading.Timer(delay, self._requeue, args=(email,))
+                timer.daemon = True
+                timer.start()
+                return
+            logger.error(f"Error sending email: {str(e)}")
+            self._notify(email, 'error', f'Error sending email: {_describe(e)}')
+            return
+
+        logger.info(f"Sent email {email.id} to {email.recipient}")
+        self._notify(email, 'success', 'Email sent successfully!')
+
+    def _requeue(self, email):
+        try:
+            self._queue.put_nowait(email)
+        except queue.Full:
+            self._notify(email, 'error', 'Error sending email: the email queue is full.')
+
+    def _send(self, email):
+        try:
+            with self.pool.connection() as server:
+                self._transmit(server, email)
+        except smtplib.SMTPServerDisconnected:
+            # A pooled connection the server had already closed; try a fresh
+            # one straight away before counting this as a failed attempt
+            with self.pool.connection() as server:
+                self._transmit(server, email)
+
+    def _transmit(self, server, email):
+        """Run one SMTP transaction, streaming the message into DATA"""
+        code, reply = server.mail(self.sender)
+        if code != 250:
+            raise smtplib.SMTPSenderRefused(code, reply, self.sender)
+        code, reply = server.rcpt(email.recipient)
+        if code not in (250, 251):
+            raise smtplib.SMTPRecipientsRefused({email.recipient: (code, reply)})
+
+        server.putcmd('data')
+        code, reply = server.getreply()
+        if code != 354:
+            raise smtplib.SMTPDataError(code, reply)
+
+        buffer = bytearray()
+        for line in iter_message_lines(self.sender, email):
+            # Dot-stuffing (RFC 5321 section 4.5.2)
+            if line.startswith(b'.'):
+                buffer += b'.'
+            buffer += line
+            if len(buffer) >= SEND_BUFFER_SIZE:
+                server.send(bytes(buffer))
+                buffer.clear()
+        buffer += b'.\r\n'
+        server.send(bytes(buffer))
+
+        code, reply = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, reply)
+
+    def _notify(self, email, status, message):
+        if self.notify:
+            try:
+                self.notify(email, status, message)
+            except Exception as e:
+                logger.error(f"Error reporting email status: {str(e)}")
+
+
+def iter_message_lines(sender, email):
+    """Yield the MIME message for an email as CRLF-terminated lines"""
+    boundary = f'=_{uuid.uuid4().hex}'
+    filename = os.path.basename(email.file_path)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    headers = EmailMessage(policy=policy.SMTP)
+    headers['From'] = sender
+    headers['To'] = email.recipient
+    headers['Subject'] = email.subject
+    headers['Date'] = formatdate(localtime=True)
+    headers['Message-ID'] = make_msgid()
+    headers['MIME-Version'] = '1.0'
+    headers['Content-Type'] = f'multipart/mixed; boundary="{boundary}"'
+    for name, value in headers.items():
+        yield from _split_lines(headers.policy.fold_binary(name, value))
+    yield b'\r\n'
+
+    # Message body
+    yield f'--{boundary}\r\n'.encode('ascii')
+    body = MIMEText(email.message, 'plain', 'utf-8')
+    yield from _split_lines(body.as_bytes(policy=policy.SMTP))
+    yield b'\r\n'
+
+    # Attachment, encoded block by block
+    attachment = EmailMessage(policy=policy.SMTP)
+    attachment['Content-Type'] = content_type
+    attachment['Content-Transfer-Encoding'] = 'base64'
+    attachment.add_header('Content-Disposition', 'attachment', filename=filename)
+    yield f'--{boundary}\r\n'.encode('ascii')
+    for name, value in attachment.items():
+        yield from _split_lines(attachment.policy.fold_binary(name, value))
+    yield b'\r\n'
+
+    with open(email.file_path, 'rb') as f:
+        while True:
+            block = f.read(ATTACHMENT_BLOCK_SIZE)
+            if not block:
+                break
+            encoded = base64.b64encode(block)
+            for i in range(0, len(encoded), 76):
+                yield encoded[i:i + 76] + b'\r\n'
+
+    yield f'--{boundary}--\r\n'.encode('ascii')
+
+
+def _split_lines(data):
+    for line in data.splitlines():
+        yield line + b'\r\n'
+
+
+def _is_temporary(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    # Refused connects, resets, timeouts and DNS failures
+    return isinstance(error, (ConnectionError, TimeoutError, socket.gaierror))
+
+
+def _describe(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return 'the recipient address was refused.'
+    return str(error)
+
+
+def _close(server):
+    try:
+        server.quit()
+    except Exception:
+        try:
+            server.close()
+        except Exception:
+            pass
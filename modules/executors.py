@@ -0,0 +1,242 @@
+import os
+import queue
+import signal
+import threading
+import logging
+import multiprocessing
+
+from modules.progress import run_with_reporter
+from modules.profiling import run_profiled
+from modules.cancellation import JobCancelled
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Libraries imported once by the forkserver so every job process starts warm
+FORKSERVER_PRELOAD = [
+    'PyPDF2',
+    'PIL.Image',
+    'pdfminer.high_level',
+    'modules.merge_pdf',
+    'modules.split_pdf',
+    'modules.compress_pdf',
+    'modules.convert_pdf',
+    'modules.extract_pdf',
+    'modules.ocr_pdf',
+    'modules.protect_pdf',
+    'modules.organize_pdf',
+    'modules.edit_pdf',
+    'modules.pipeline'
+]
+
+
+class ThreadBackend:
+    """Run a job's worker function on the calling scheduler thread"""
+
+    name = 'thread'
+
+    def start(self):
+        pass
+
+    def run(self, job):
+        run_job_function(job.func, job.kwargs, job.profile, job.id, job.cancel_event)
+
+    def cancel(self, job):
+        # The worker function stops at its next status update
+        pass
+
+
+class QueueEmitter:
+    """Stand-in for socketio inside a job process.
+
+    Events are put on a multiprocessing queue and re-emitted by the parent,
+    so worker functions can keep calling socketio.emit() unchanged.
+    """
+
+    def __init__(self, events):
+        self.events = events
+
+    def emit(self, event, data=None, **kwargs):
+        self.events.put(('emit', event, data, kwargs))
+
+
+def run_job_function(func, kwargs, profile=None, job_id=None, cancel_event=None):
+    """Run a worker function with coalesced progress, under a profiler if requested"""
+    if profile:
+        return run_profiled(lambda: run_with_reporter(func, kwargs, cancel_event), profile, job_id)
+    return run_with_reporter(func, kwargs, cancel_event)
+
+
+def _process_entry(func, kwargs, events, with_emitter, profile, job_id):
+    """Entry point of a job process"""
+    # Lead a process group of our own, so cancelling the job also stops
+    # the pdftoppm, tesseract and LibreOffice processes the tools start
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    if with_emitter:
+        kwargs['socketio'] = QueueEmitter(events)
+    try:
+        # Coalesce progress here so the queue to the parent stays quiet too
+        run_job_function(func, kwargs, profile, job_id)
+        events.put(('done', None))
+    except Exception as e:
+        events.put(('failed', str(e)))
+
+
+def _noop():
+    pass
+
+
+def _use_native_multiprocessing_locks():
+    """Swap multiprocessing's module-level locks for real ones under eventlet/gevent.
+
+    They were created green when app.py monkey-patched threading, but jobs
+    start processes from the scheduler's OS threads, where two of them
+    waiting for the forkserver or the resource tracker would deadlock.
+    """
+    native = original_threading()
+    if native is threading:
+        return
+    from multiprocessing import forkserver, resource_tracker
+    forkserver._forkserver._lock = native.Lock()
+    resource_tracker._resource_tracker._lock = native.RLock()
+
+
+class ProcessBackend:
+    """Run CPU-bound worker functions in separate processes.
+
+    Each job gets its own process forked from a forkserver that has already
+    imported PyPDF2, Pillow, pdfminer and the tool modules, so start-up is
+    cheap and the job is not serialized on the web process's GIL. The memory
+    a large job used is returned to the OS when its process exits.
+    """
+
+    name = 'process'
+
+    # Seconds a cancelled job's processes get to exit before they are killed
+    KILL_GRACE = 5
+
+    def __init__(self, max_processes=None, preload=None):
+        self.max_processes = max_processes or os.cpu_count() or 1
+        # Waited on from scheduler workers, which are OS threads under eventlet/gevent too
+        self._slots = original_threading().BoundedSemaphore(self.max_processes)
+        _use_native_multiprocessing_locks()
+        self._processes = {}
+
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self.context = multiprocessing.get_context('forkserver')
+            self.context.set_forkserver_preload(preload or FORKSERVER_PRELOAD)
+        else:
+            # Windows has no forkserver; spawn works everywhere, just slower
+            self.context = multiprocessing.get_context('spawn')
+
+    def start(self):
+        """Boot the forkserver in the background so the first job doesn't pay for it"""
+        def warm_up():
+            try:
+                process = self.context.Process(target=_noop, daemon=True)
+                process.start()
+                process.join()
+            except Exception as e:
+                logger.warning(f"Could not warm up process backend: {str(e)}")
+
+        original_threading().Thread(target=warm_up, name='process-backend-warmup', daemon=True).start()
+
+    def run(self, job):
+        kwargs = dict(job.kwargs)
+        socketio = kwargs.pop('socketio', None)
+        events = self.context.Queue()
+
+        with self._slots:
+            process = self.context.Process(
+                target=_process_entry,
+                args=(job.func, kwargs, events, socketio is not None, job.profile, job.id),
+                name=f'job-{job.tool}-{job.id[:8]}',
+                daemon=True
+            )
+            process.start()
+            self._processes[job.id] = process
+            try:
+                if job.cancel_event.is_set():
+                    # Cancelled between being picked and the process starting
+                    self.cancel(job)
+                self._relay_events(job, process, events, socketio)
+            finally:
+                self._processes.pop(job.id, None)
+                process.join()
+                events.close()
+
+    def cancel(self, job):
+        """Terminate a job's process group, and kill it if it doesn't exit in time"""
+        process = self._processes.get(job.id)
+        if process is None or process.pid is None:
+            # Not started yet; run() checks the cancel event after starting
+            return
+        _signal_job_process(process, signal.SIGTERM)
+        if hasattr(signal, 'SIGKILL'):
+            timer = original_threading().Timer(self.KILL_GRACE, self._kill, args=(process,))
+            timer.daemon = True
+            timer.start()
+
+    def _kill(self, process):
+        if process.exitcode is None:
+            _signal_job_process(process, signal.SIGKILL)
+
+    def _relay_events(self, job, process, events, socketio):
+        """Forward events from the job process until it finishes"""
+        while True:
+            try:
+                message = events.get(timeout=1)
+            except queue.Empty:
+                if process.is_alive():
+                    continue
+                if job.cancel_event.is_set():
+                    raise JobCancelled()
+                # The process died without reporting back (e.g. OOM-killed)
+                error_msg = f"Worker process for {job.tool} exited with code {process.exitcode}"
+                logger.error(error_msg)
+                if socketio:
+                    socketio.emit('status_update', {
+                        'status': 'error',
+                        'message': '❌ Error processing file: worker process stopped unexpectedly.',
+                        'tool': job.tool,
+                        'log_entry': error_msg
+                    })
+                raise RuntimeError(error_msg)
+
+            kind = message[0]
+            if kind == 'emit':
+                _, event, data, kwargs = message
+                if socketio:
+                    socketio.emit(event, data, **kwargs)
+            elif kind == 'done':
+                return
+            elif kind == 'failed':
+                raise RuntimeError(message[1])
+
+
+def _signal_job_process(process, signum):
+    """Signal a job process and everything it started"""
+    try:
+        if hasattr(os, 'killpg'):
+            os.killpg(process.pid, signum)
+        else:
+            process.terminate()
+    except (ProcessLookupError, PermissionError):
+        # Already gone, or not yet leading its own group
+        try:
+            process.terminate()
+        except Exception:
+            pass
+
+
+def parse_tool_backends(value):
+    """Parse a 'tool=backend,tool=backend' string into a dict"""
+    backends = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        tool, backend = item.split('=', 1)
+        backends[tool.strip()] = backend.strip()
+    return backends
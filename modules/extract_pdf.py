@@ -6,6 +6,8 @@ from pdfminer.high_level import extract_text
 import uuid
 import time
 import logging
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_upload
 from docx import Document
 
 # Configure logging
@@ -20,7 +22,7 @@ def register_routes(app, socketio):
     
     @app.route('/extract_text', methods=['POST'])
     def extract_text_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -28,7 +30,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -41,21 +43,17 @@ def register_routes(app, socketio):
         output_format = request.form.get('output_format', 'txt')
         
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            extract_text_from_pdf, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'extract-text',
+            extract_text_from_pdf,
+            'Extracting text...',
             file_path=file_path,
             output_format=output_format,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Extracting text...'})
 
 def extract_text_from_pdf(file_path, output_format='txt', socketio=None):
     """Extract text from PDF"""
@@ -68,7 +66,8 @@ def extract_text_from_pdf(file_path, output_format='txt', socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -0,0 +1,65 @@
+from bisect import insort
+
+# Lanes in the order they are served
+LANES = ('interactive', 'bulk')
+
+
+class FairQueue:
+    """Pending jobs, in the order they should start.
+
+    Interactive jobs come before bulk ones. Within a lane, clients take
+    turns in proportion to their weight: every job gets a virtual finish
+    tag of max(lane clock, the client's previous tag) + 1 / weight, and jobs
+    start in tag order. A client that queues 200 merges gets tags 1..200,
+    and a client arriving later gets a tag next to the lane clock, so it is
+    served within a job or two instead of after all 200.
+    """
+
+    def __init__(self, client_weights=None):
+        self.client_weights = dict(client_weights or {})
+        self._entries = []
+        self._sequence = 0
+        self._virtual_time = {lane: 0.0 for lane in LANES}
+        self._last_tags = {}
+
+    def weight_for(self, client):
+        return self.client_weights.get(client, 1)
+
+    def append(self, job):
+        """Tag a job and add it to the queue"""
+        key = (job.lane, job.client)
+        start = max(self._virtual_time[job.lane], self._last_tags.get(key, 0.0))
+        job.fair_tag = start + 1.0 / self.weight_for(job.client)
+        self._last_tags[key] = job.fair_tag
+        self._sequence += 1
+        insort(self._entries, ((LANES.index(job.lane), job.fair_tag, self._sequence), job))
+
+    def remove(self, job):
+        for index, (_, queued_job) in enumerate(self._entries):
+            if queued_job is job:
+                del self._entries[index]
+                return
+        raise ValueError('job is not queued')
+
+    def started(self, job):
+        """Advance the lane's clock to the start tag of a job that was taken from the queue"""
+        start = job.fair_tag - 1.0 / self.weight_for(job.client)
+        self._virtual_time[job.lane] = max(self._virtual_time[job.lane], start)
+
+        # Tags at or behind the clock mean the same as no tag
+        if len(self._last_tags) > 1024:
+            self._last_tags = {key: tag for key, tag in self._last_tags.items()
+                               if tag > self._virtual_time[key[0]]}
+
+    def count_for(self, client):
+        """Return how many jobs a client has waiting"""
+        return sum(1 for _, job in self._entries if job.client == client)
+
+    def __iter__(self):
+        return iter([job for _, job in self._entries])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, job):
+        return any(queued_job is job for _, queued_job in self._entries)
@@ -0,0 +1,120 @@
+import io
+import os
+import time
+import logging
+from flask import request, jsonify, send_file
+from PyPDF2 import PdfReader
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+def sync_requested():
+    """Return True if the client asked for the result in the response (?sync=1)"""
+    value = request.args.get('sync') or request.form.get('sync') or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def run_inline(tool, upload, operations, suffix, expect_encrypted=False):
+    """Process a small PDF on the request thread and return the file as the response.
+
+    `operations` are pipeline steps (see modules.pipeline). The document is
+    read from the upload's stream and written to a BytesIO, so nothing
+    touches uploads/ or output/ and no Socket.IO events are needed, which
+    also makes the tools usable where Socket.IO isn't available.
+
+    Returns None when the client didn't ask for ?sync=1 or the document is
+    over SYNC_MAX_BYTES or SYNC_MAX_PAGES; the route then queues a job as usual.
+    """
+    from app import tool_metrics, offloader, SYNC_MAX_BYTES
+    from modules.pipeline import PipelineError
+
+    if not sync_requested():
+        return None
+
+    stream, size = _open_upload(upload)
+    if stream is None or size > SYNC_MAX_BYTES:
+        return _fall_back(upload, stream)
+    # Completed resumable uploads are opened here; request uploads belong to werkzeug
+    owns_stream = getattr(upload, 'path', None) is not None
+
+    start = time.perf_counter()
+    try:
+        # Under eventlet/gevent the PDF work runs on an OS thread, off the hub
+        processed = offloader.call(_process, stream, operations, expect_encrypted)
+        if processed is None:
+            return _fall_back(upload, stream)
+        page_count, output = processed
+    except PipelineError as e:
+        tool_metrics.record_request(tool, 'inline')
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error processing {tool} inline: {str(e)}")
+        tool_metrics.record_request(tool, 'inline')
+        return jsonify({'status': 'error', 'message': f'Error processing PDF: {str(e)}'}), 500
+    finally:
+        if owns_stream:
+            stream.close()
+
+    elapsed = time.perf_counter() - start
+    tool_metrics.record_request(tool, 'inline')
+    tool_metrics.observe_inline(tool, elapsed, page_count, size, output.tell())
+
+    name_without_ext = os.path.splitext(os.path.basename(upload.filename or 'document.pdf'))[0] or 'document'
+    output.seek(0)
+    response = send_file(
+        output,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=f'{name_without_ext}_{suffix}.pdf'
+    )
+    response.headers['Server-Timing'] = f'process;dur={elapsed * 1000:.1f}'
+    return response
+
+
+def _process(stream, operations, expect_encrypted):
+    """Run the operations on a PDF stream and return (page count, BytesIO), or None if it has too many pages"""
+    from app import SYNC_MAX_PAGES
+    from modules.pipeline import PipelineError, load_pages, apply_operations, write_pages
+
+    reader = PdfReader(stream)
+    if expect_encrypted and not reader.is_encrypted:
+        raise PipelineError('The PDF is not password-protected.')
+    pages = load_pages(reader, operations)
+    if len(pages) > SYNC_MAX_PAGES:
+        return None
+
+    protect = apply_operations(pages, operations)
+    output = io.BytesIO()
+    write_pages(pages, protect, output)
+    return len(pages), output
+
+
+def _open_upload(upload):
+    """Return (binary stream, size) for a werkzeug upload or a completed resumable upload"""
+    path = getattr(upload, 'path', None)
+    if path is not None:
+        try:
+            return open(path, 'rb'), os.path.getsize(path)
+        except OSError:
+            return None, 0
+
+    stream = upload.stream
+    try:
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(0)
+    except (AttributeError, OSError):
+        return None, 0
+    return stream, size
+
+
+def _fall_back(upload, stream):
+    """Leave the upload as the route expects it so it can queue a job instead"""
+    if stream is None:
+        return None
+    if getattr(upload, 'path', None) is not None:
+        stream.close()
+    else:
+        stream.seek(0)
+    return None
@@ -0,0 +1,328 @@
+"""Call the PDF tools from Python, without Flask or Socket.IO.
+
+    from modules import library
+
+    result = library.compress('scan.pdf', level='high', output_dir='/data/out')
+    result.raise_for_status()
+    print(result.outputs, result.input_pages, result.seconds)
+
+Inputs can be paths, bytes, file objects or (filename, bytes) pairs. Every
+call returns a ToolResult with the output paths, page and byte counts,
+timings and the messages the tool reported. Calls are independent, so they
+can be made from several threads at once with different output folders.
+"""
+import os
+import time
+import shutil
+import tempfile
+import importlib
+import logging
+
+from modules.config import output_folder, temp_folder, use_folders
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# tool -> (module, worker function)
+TOOLS = {
+    'merge': ('modules.merge_pdf', 'merge_pdfs'),
+    'split': ('modules.split_pdf', 'split_pdf'),
+    'compress': ('modules.compress_pdf', 'compress_pdf'),
+    'rotate': ('modules.organize_pdf', 'rotate_pdf'),
+    'watermark': ('modules.organize_pdf', 'add_watermark'),
+    'protect': ('modules.protect_pdf', 'protect_pdf'),
+    'unlock': ('modules.protect_pdf', 'unlock_pdf'),
+    'extract-text': ('modules.extract_pdf', 'extract_text_from_pdf'),
+    'ocr': ('modules.ocr_pdf', 'perform_ocr'),
+    'pdf-to-img': ('modules.convert_pdf', 'convert_pdf_to_images'),
+    'img-to-pdf': ('modules.convert_pdf', 'convert_images_to_pdf'),
+    'pdf-to-word': ('modules.convert_pdf', 'convert_pdf_to_word'),
+    'pdf-to-excel': ('modules.convert_pdf', 'convert_pdf_to_excel'),
+    'pdf-to-ppt': ('modules.convert_pdf', 'convert_pdf_to_ppt'),
+    'word-to-pdf': ('modules.convert_pdf', 'convert_word_to_pdf'),
+    'excel-to-pdf': ('modules.convert_pdf', 'convert_excel_to_pdf'),
+    'ppt-to-pdf': ('modules.convert_pdf', 'convert_ppt_to_pdf'),
+    'pipeline': ('modules.pipeline', 'run_pipeline')
+}
+
+# Worker function arguments that hold input files
+FILE_ARGUMENTS = ('file_path', 'file_paths', 'image_paths', 'watermark_image_path')
+
+
+class ToolError(Exception):
+    """Raised by ToolResult.raise_for_status() for a failed tool run"""
+
+    def __init__(self, result):
+        super().__init__(f'{result.tool} failed: {result.message}')
+        self.result = result
+
+
+class ToolResult:
+    """The outcome of one tool run"""
+
+    def __init__(self, tool, status, message, outputs, details, log, input_pages, input_bytes, output_bytes, seconds):
+        self.tool = tool
+        self.status = status
+        self.message = message
+        self.outputs = outputs
+        self.details = details
+        self.log = log
+        self.input_pages = input_pages
+        self.input_bytes = input_bytes
+        self.output_bytes = output_bytes
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.status == 'success'
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise ToolError(self)
+        return self
+
+    def to_dict(self):
+        return {
+            'tool': self.tool,
+            'status': self.status,
+            'message': self.message,
+            'outputs': self.outputs,
+            'details': self.details,
+            'log': self.log,
+            'input_pages': self.input_pages,
+            'input_bytes': self.input_bytes,
+            'output_bytes': self.output_bytes,
+            'seconds': self.seconds
+        }
+
+    def __repr__(self):
+        return f'<ToolResult {self.tool} {self.status}: {len(self.outputs)} outputs in {self.seconds:.2f}s>'
+
+
+class _Collector:
+    """Stand-in for socketio that records what a worker function reports"""
+
+    def __init__(self, on_progress=None):
+        self.on_progress = on_progress
+        self.final = None
+        self.log = []
+
+    def emit(self, event, data=None, **kwargs):
+        if event != 'status_update' or not data:
+            return
+        if data.get('log_entry'):
+            self.log.append(data['log_entry'])
+        self.log.extend(data.get('log_entries', []))
+        if data.get('status') in ('success', 'error') and 'message' in data:
+            self.final = data
+        if self.on_progress:
+            try:
+                self.on_progress(data)
+            except Exception as e:
+                logger.error(f"Error in progress callback: {str(e)}")
+
+
+def run_tool(tool, output_dir=None, temp_dir=None, on_progress=None, **kwargs):
+    """Run a tool's worker function and return a ToolResult.
+
+    kwargs are the worker function's own arguments (file_path, file_paths,
+    compression_level...). Outputs go to output_dir, by default the app's
+    output folder. on_progress, if given, is called with every status update.
+    """
+    from modules.metrics import count_pages
+    from modules.result_cache import output_paths
+
+    module_name, function_name = TOOLS[tool]
+    func = getattr(importlib.import_module(module_name), function_name)
+
+    output_dir = os.path.abspath(output_dir or output_folder())
+    temp_dir = os.path.abspath(temp_dir or temp_folder())
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(temp_dir, exist_ok=True)
+
+    # Worker functions read files from disk, so buffers are staged first
+    staging_dir = None
+    for name in FILE_ARGUMENTS:
+        value = kwargs.get(name)
+        if value is None or _is_path(value) or (isinstance(value, list) and all(_is_path(item) for item in value)):
+            continue
+        if staging_dir is None:
+            staging_dir = tempfile.mkdtemp(prefix='library-', dir=temp_dir)
+        if isinstance(value, list):
+            kwargs[name] = [_stage(item, staging_dir, i) for i, item in enumerate(value)]
+        else:
+            kwargs[name] = _stage(value, staging_dir, 0)
+
+    inputs = []
+    for name in FILE_ARGUMENTS:
+        value = kwargs.get(name)
+        if value:
+            inputs.extend(os.fspath(item) for item in (value if isinstance(value, list) else [value]))
+    input_pages = sum(count_pages(path) for path in inputs if path.lower().endswith('.pdf'))
+    input_bytes = sum(_size(path) for path in inputs)
+
+    collector = _Collector(on_progress)
+    start = time.perf_counter()
+    try:
+        with use_folders(output_dir, temp_dir):
+            func(socketio=collector, **kwargs)
+    finally:
+        seconds = time.perf_counter() - start
+        if staging_dir:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    final = collector.final or {'status': 'error', 'message': 'The tool reported no result.'}
+    outputs = [os.path.join(output_dir, path) for path in output_paths(final)]
+    details = {key: value for key, value in final.items()
+               if key not in ('status', 'message', 'progress', 'log_entry', 'log_entries', 'tool', 'downloads')}
+    return ToolResult(
+        tool=tool,
+        status=final['status'],
+        message=final.get('message'),
+        outputs=outputs,
+        details=details,
+        log=collector.log,
+        input_pages=input_pages,
+        input_bytes=input_bytes,
+        output_bytes=sum(_size(path) for path in outputs),
+        seconds=seconds
+    )
+
+
+def merge(files, order='', **kwargs):
+    """Merge PDFs into one, in the given order ('2,0,1') or as listed"""
+    return run_tool('merge', file_paths=list(files), file_order=order, **kwargs)
+
+
+def split(file, method='all', page_range='', odd_even='all', **kwargs):
+    """Split a PDF into single pages ('all'), ranges ('range') or odd/even pages ('odd_even')"""
+    return run_tool('split', file_path=file, split_method=method, page_range=page_range, odd_even=odd_even, **kwargs)
+
+
+def compress(file, level='medium', **kwargs):
+    """Compress a PDF at the given level ('low', 'medium' or 'high')"""
+    return run_tool('compress', file_path=file, compression_level=level, **kwargs)
+
+
+def rotate(file, angle=90, page_range='', **kwargs):
+    """Rotate every page, or only the pages in page_range ('1-3,5')"""
+    pages_option = 'custom' if page_range else 'all'
+    return run_tool('rotate', file_path=file, angle=angle, pages_option=pages_option, page_range=page_range, **kwargs)
+
+
+def watermark(file, text='CONFIDENTIAL', image=None, opacity=30, position='middle-center', **kwargs):
+    """Add a text watermark, or an image watermark if image is given"""
+    return run_tool(
+        'watermark',
+        file_path=file,
+        watermark_type='image' if image is not None else 'text',
+        watermark_text=text,
+        watermark_image_path=image,
+        opacity=opacity,
+        position=position,
+        **kwargs
+    )
+
+
+def protect(file, password, allow_print=True, allow_copy=True, allow_modify=True, **kwargs):
+    """Encrypt a PDF with password, allowing printing, copying and modifying as given"""
+    return run_tool('protect', file_path=file, password=password, allow_print=allow_print,
+                    allow_copy=allow_copy, allow_modify=allow_modify, **kwargs)
+
+
+def unlock(file, password, **kwargs):
+    """Remove the password protection of a PDF, given its password"""
+    return run_tool('unlock', file_path=file, password=password, **kwargs)
+
+
+def extract_text(file, output_format='txt', **kwargs):
+    """Extract the text of a PDF as a 'txt' or 'docx' file (output_format)"""
+    return run_tool('extract-text', file_path=file, output_format=output_format, **kwargs)
+
+
+def ocr(file, language='eng', output_format='txt', dpi=200, **kwargs):
+    """OCR a scanned PDF or image in a Tesseract language, at dpi, to 'txt', 'docx' or searchable 'pdf'"""
+    return run_tool('ocr', file_path=file, language=language, output_format=output_format, dpi=dpi, **kwargs)
+
+
+def pdf_to_images(file, image_format='jpg', dpi=200, **kwargs):
+    """Render every page of a PDF to an image ('jpg' or 'png') at dpi"""
+    return run_tool('pdf-to-img', file_path=file, image_format=image_format, dpi=dpi, **kwargs)
+
+
+def images_to_pdf(images, order='', **kwargs):
+    """Combine images into one PDF, in the given order ('2,0,1') or as listed"""
+    return run_tool('img-to-pdf', image_paths=list(images), image_order=order, **kwargs)
+
+
+def pdf_to_word(file, **kwargs):
+    """Convert a PDF to a Word document"""
+    return run_tool('pdf-to-word', file_path=file, **kwargs)
+
+
+def pdf_to_excel(file, **kwargs):
+    """Convert the tables of a PDF to an Excel workbook"""
+    return run_tool('pdf-to-excel', file_path=file, **kwargs)
+
+
+def pdf_to_ppt(file, dpi=300, **kwargs):
+    """Convert a PDF to a PowerPoint presentation, one slide per page rendered at dpi"""
+    return run_tool('pdf-to-ppt', file_path=file, dpi=dpi, **kwargs)
+
+
+def word_to_pdf(file, **kwargs):
+    """Convert a Word document to PDF"""
+    return run_tool('word-to-pdf', file_path=file, **kwargs)
+
+
+def excel_to_pdf(file, **kwargs):
+    """Convert an Excel workbook to PDF"""
+    return run_tool('excel-to-pdf', file_path=file, **kwargs)
+
+
+def ppt_to_pdf(file, **kwargs):
+    """Convert a PowerPoint presentation to PDF"""
+    return run_tool('ppt-to-pdf', file_path=file, **kwargs)
+
+
+def pipeline(file, operations, watermark_image=None, **kwargs):
+    """Run a list of pipeline operations (see modules.pipeline.parse_operations) on one PDF"""
+    from modules.pipeline import parse_operations
+
+    return run_tool('pipeline', file_path=file, operations=parse_operations(operations),
+                    watermark_image_path=watermark_image, **kwargs)
+
+
+def _is_path(value):
+    return isinstance(value, (str, os.PathLike))
+
+
+def _stage(value, directory, index):
+    """Write a buffer input to a file and return its path"""
+    if _is_path(value):
+        return os.fspath(value)
+
+    filename = None
+    if isinstance(value, tuple):
+        filename, value = value
+    elif hasattr(value, 'name') and isinstance(value.name, str):
+        filename = os.path.basename(value.name)
+    filename = os.path.basename(filename or 'document.pdf')
+
+    # A subdirectory per input keeps the original names without collisions
+    target_dir = os.path.join(directory, str(index))
+    os.makedirs(target_dir, exist_ok=True)
+    path = os.path.join(target_dir, filename)
+    with open(path, 'wb') as f:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            f.write(value)
+        else:
+            shutil.copyfileobj(value, f)
+    return path
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
@@ -5,6 +5,8 @@ from PyPDF2 import PdfReader, PdfWriter
 import uuid
 import time
 import logging
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_uploads
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -19,7 +21,7 @@ def register_routes(app, socketio):
     @app.route('/merge', methods=['POST'])
     def merge_route():
         try:
-            if 'files[]' not in request.files:
+            if not has_upload('files[]'):
                 socketio.emit('status_update', {
                     'status': 'error', 
                     'message': '⚠️ No PDF files were uploaded.',
@@ -29,7 +31,7 @@ def register_routes(app, socketio):
                 response.headers['Content-Type'] = 'application/json'
                 return response
             
-            files = request.files.getlist('files[]')
+            files = get_uploads('files[]')
             if len(files) < 2:
                 socketio.emit('status_update', {
                     'status': 'error', 
@@ -49,10 +51,7 @@ def register_routes(app, socketio):
                 if file.filename == '':
                     continue
                 
-                filename = secure_filename(file.filename)
-                from app import UPLOAD_FOLDER
-                file_path = os.path.join(UPLOAD_FOLDER, filename)
-                file.save(file_path)
+                file_path = save_upload(file)
                 file_paths.append(file_path)
             
             if len(file_paths) < 2:
@@ -65,19 +64,16 @@ def register_routes(app, socketio):
                 response.headers['Content-Type'] = 'application/json'
                 return response
             
-            # Start a background thread for processing
-            thread = socketio.start_background_task(
-                merge_pdfs, 
+            # Queue the job on the scheduler
+            return start_job(
+                'merge',
+                merge_pdfs,
+                'Merging PDFs...',
                 file_paths=file_paths,
                 file_order=file_order,
                 socketio=socketio
             )
             
-            # Return immediately with a processing message
-            response = jsonify({'status': 'processing', 'message': 'Merging PDFs...'})
-            response.headers['Content-Type'] = 'application/json'
-            return response
-            
         except Exception as e:
             logger.error(f"Error in merge route: {str(e)}")
             socketio.emit('status_update', {
@@ -101,7 +97,8 @@ def merge_pdfs(file_paths, file_order='', socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this merge
         merge_id = uuid.uuid4().hex[:8]
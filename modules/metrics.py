@@ -0,0 +1,265 @@
+import os
+import math
+import logging
+
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+QUEUE_WAIT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+
+class Metric:
+    """A metric family with a fixed set of label names"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        # Observed from scheduler workers, which are OS threads even under eventlet/gevent
+        self._lock = original_threading().Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def samples(self):
+        """Yield (suffix, labels, value) for every series"""
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield '', dict(zip(self.labels, key)), value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A gauge whose values are read from a callback when metrics are scraped"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+
+    def samples(self):
+        if self.callback is None:
+            return
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.error(f"Error collecting {self.name}: {str(e)}")
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            yield '', dict(zip(self.labels, key)), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            labels = dict(zip(self.labels, key))
+            for bound, count in zip(self.buckets, counts):
+                yield '_bucket', dict(labels, le=_format_value(bound)), count
+            yield '_count', labels, counts[-1]
+            yield '_sum', labels, total
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+
+    def __init__(self, prefix='pdf_toolkit'):
+        self.prefix = prefix
+        self._metrics = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(f'{self.prefix}_{name}', help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), callback=None):
+        return self._add(Gauge(f'{self.prefix}_{name}', help_text, labels, callback))
+
+    def histogram(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        return self._add(Histogram(f'{self.prefix}_{name}', help_text, labels, buckets))
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for suffix, labels, value in metric.samples():
+                lines.append(f'{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+class ToolMetrics:
+    """Per-tool request, latency, throughput and error metrics.
+
+    Routes record every request through record_request(); observe_job() is
+    a scheduler completion hook that times each worker function run (queue
+    wait and execution) and counts pages and bytes in and out. Queue depth
+    and running jobs are read from the scheduler when metrics are scraped.
+    """
+
+    def __init__(self, scheduler, registry=None):
+        self.scheduler = scheduler
+        self.registry = registry or MetricsRegistry()
+        registry = self.registry
+
+        self.requests = registry.counter(
+            'requests_total', 'Tool requests by outcome (queued, cached, rejected, too_large, inline)', ('tool', 'outcome'))
+        self.jobs = registry.counter(
+            'jobs_total', 'Jobs that finished running, by final state', ('tool', 'state'))
+        self.errors = registry.counter(
+            'job_errors_total', 'Jobs that ended in an error', ('tool',))
+        self.queue_wait = registry.histogram(
+            'job_queue_wait_seconds', 'Time jobs spent waiting in the queue', ('tool',), QUEUE_WAIT_BUCKETS)
+        self.duration = registry.histogram(
+            'job_duration_seconds', 'Time spent running the worker function', ('tool', 'backend'))
+        self.pages = registry.counter(
+            'pages_processed_total', 'Pages of input PDFs processed by finished jobs', ('tool',))
+        self.bytes_in = registry.counter(
+            'input_bytes_total', 'Bytes of input files processed', ('tool',))
+        self.bytes_out = registry.counter(
+            'output_bytes_total', 'Bytes of output files produced', ('tool',))
+        registry.gauge(
+            'jobs_running', 'Jobs currently running', ('tool',),
+            callback=lambda: dict(self.scheduler.stats()['running']))
+        registry.gauge(
+            'jobs_queued', 'Jobs waiting in the queue', ('tool',),
+            callback=lambda: self.scheduler.stats()['queued_by_tool'])
+        registry.gauge(
+            'jobs_queued_by_lane', 'Jobs waiting in the queue, by scheduling lane', ('lane',),
+            callback=lambda: self.scheduler.stats()['queued_by_lane'])
+        registry.gauge(
+            'job_memory_reserved_bytes', 'Estimated peak memory of the running jobs',
+            callback=lambda: self.scheduler.stats()['memory_in_use'])
+
+    def record_request(self, tool, outcome):
+        self.requests.inc(tool=tool, outcome=outcome)
+
+    def observe_inline(self, tool, seconds, pages, bytes_in, bytes_out):
+        """Record a request that was processed on the request thread (?sync=1)"""
+        self.duration.observe(seconds, tool=tool, backend='inline')
+        self.pages.inc(pages, tool=tool)
+        self.bytes_in.inc(bytes_in, tool=tool)
+        self.bytes_out.inc(bytes_out, tool=tool)
+
+    def observe_job(self, job):
+        """Scheduler completion hook"""
+        # Jobs answered from the result cache never ran
+        if job.func is None:
+            return
+
+        backend = self.scheduler.backend_for(job.tool).name
+        self.jobs.inc(tool=job.tool, state=job.state)
+        if job.state == 'failed':
+            self.errors.inc(tool=job.tool)
+        if job.started_at is not None:
+            self.queue_wait.observe(job.started_at - job.submitted_at, tool=job.tool)
+            self.duration.observe(job.finished_at - job.started_at, tool=job.tool, backend=backend)
+
+        input_paths = job_input_paths(job.kwargs)
+        self.bytes_in.inc(sum(_file_size(path) for path in input_paths), tool=job.tool)
+        if job.state == 'finished':
+            pages = job.pages if job.pages is not None else sum(count_pages(path) for path in input_paths)
+            self.pages.inc(pages, tool=job.tool)
+            if job.result:
+                from modules.config import OUTPUT_FOLDER
+                from modules.result_cache import output_paths
+                self.bytes_out.inc(
+                    sum(_file_size(os.path.join(OUTPUT_FOLDER, path)) for path in output_paths(job.result)),
+                    tool=job.tool)
+
+
+def job_input_paths(kwargs):
+    """Return the input file paths among a job's arguments"""
+    from modules.result_cache import FILE_PARAMS
+
+    paths = []
+    for name in FILE_PARAMS:
+        value = kwargs.get(name)
+        if value:
+            paths.extend(value if isinstance(value, (list, tuple)) else [value])
+    return paths
+
+
+def input_pages(kwargs):
+    """Return the total page count of a job's PDF inputs"""
+    return sum(count_pages(path) for path in job_input_paths(kwargs))
+
+
+def count_pages(path):
+    """Return the number of pages in a PDF, or 0 for other or unreadable files"""
+    if not path.lower().endswith('.pdf'):
+        return 0
+    try:
+        from PyPDF2 import PdfReader
+        reader = PdfReader(path)
+        if reader.is_encrypted:
+            return 0
+        return len(reader.pages)
+    except Exception:
+        return 0
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
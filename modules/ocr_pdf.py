@@ -5,6 +5,8 @@ from werkzeug.utils import secure_filename
 import uuid
 import time
 import logging
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_upload
 from docx import Document
 from PyPDF2 import PdfReader, PdfWriter
 import io
@@ -36,7 +38,7 @@ def register_routes(app, socketio):
     
     @app.route('/ocr', methods=['POST'])
     def ocr_route():
-        if 'file' not in request.files:
+        if not has_upload('file'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No file was uploaded.',
@@ -44,7 +46,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No file was uploaded.'})
         
-        file = request.files['file']
+        file = get_upload('file')
         if file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -58,24 +60,20 @@ def register_routes(app, socketio):
         output_format = request.form.get('output_format', 'txt')
         
         # Save the uploaded file
-        filename = secure_filename(file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
+        file_path = save_upload(file)
         
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            perform_ocr, 
+        # Queue the job on the scheduler
+        return start_job(
+            'ocr',
+            perform_ocr,
+            'Performing OCR...',
             file_path=file_path,
             language=language,
             output_format=output_format,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Performing OCR...'})
 
-def perform_ocr(file_path, language='eng', output_format='txt', socketio=None):
+def perform_ocr(file_path, language='eng', output_format='txt', dpi=200, socketio=None):
     """Perform OCR on PDF or image"""
     if socketio:
         socketio.emit('status_update', {
@@ -86,7 +84,9 @@ def perform_ocr(file_path, language='eng', output_format='txt', socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER, TEMP_FOLDER
+        from modules.config import output_folder, temp_folder
+        OUTPUT_FOLDER = output_folder()
+        TEMP_FOLDER = temp_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -111,7 +111,7 @@ def perform_ocr(file_path, language='eng', output_format='txt', socketio=None):
             os.makedirs(temp_dir, exist_ok=True)
             
             # Convert PDF to images
-            images = convert_from_path(file_path)
+            images = convert_from_path(file_path, dpi=dpi)
             image_paths = []
             
             for i, image in enumerate(images):
@@ -0,0 +1,143 @@
+import sys
+import logging
+import threading
+import importlib.util
+from collections import deque
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds between checks for events emitted from offloaded work
+RELAY_INTERVAL = 0.02
+
+COOPERATIVE_MODES = ('eventlet', 'gevent', 'gevent_uwsgi')
+
+# The unpatched threading module, loaded on first use
+_original_threading = None
+
+
+class Offloader:
+    """Run blocking tool work without stalling the Socket.IO server.
+
+    With async_mode='threading' calls simply run on the calling thread.
+    Under eventlet or gevent every thread is a greenlet on one hub, so a
+    PyPDF2 or tesseract call would freeze every open socket until it
+    returned. There, calls from the hub run on the library's pool of real OS
+    threads (eventlet.tpool, the gevent hub's threadpool) while only the
+    calling greenlet waits; calls from other OS threads, such as the job
+    scheduler's workers, just run. The hub isn't thread-safe, so events
+    those threads emit are queued and sent by a relay greenlet on the hub.
+    """
+
+    def __init__(self, async_mode='threading', threads=None):
+        self.async_mode = async_mode
+        self.cooperative = async_mode in COOPERATIVE_MODES
+        self.threads = threads
+        self._events = deque()
+        self._relay = None
+        # Created with the app, so on the thread that runs the hub
+        self._hub_thread = original_threading().get_ident() if self.cooperative else None
+
+    def start(self):
+        """Size the thread pool and start the relay greenlet (idempotent, call from the hub)"""
+        if not self.cooperative or self._relay is not None:
+            return
+        if self.async_mode == 'eventlet':
+            import eventlet
+            from eventlet import tpool
+            if self.threads:
+                tpool.set_num_threads(self.threads)
+            self._relay = eventlet.spawn(self._relay_loop, eventlet.sleep)
+        else:
+            import gevent
+            if self.threads:
+                gevent.get_hub().threadpool.maxsize = self.threads
+            self._relay = gevent.spawn(self._relay_loop, gevent.sleep)
+        logger.info(f"Offloading blocking tool work to OS threads ({self.async_mode} mode)")
+
+    def call(self, func, *args, **kwargs):
+        """Run func(*args, **kwargs) off the hub and return its result"""
+        if not self.cooperative or original_threading().get_ident() != self._hub_thread:
+            return func(*args, **kwargs)
+        self.start()
+        if self.async_mode == 'eventlet':
+            from eventlet import tpool
+            return tpool.execute(func, *args, **kwargs)
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+
+    def emitter(self, socketio):
+        """Return a socketio stand-in that is safe to emit from offloaded work"""
+        if not self.cooperative:
+            return socketio
+        self.start()
+        return HubEmitter(self._events, socketio)
+
+    def _relay_loop(self, sleep):
+        while True:
+            while self._events:
+                socketio, event, data, kwargs = self._events.popleft()
+                try:
+                    socketio.emit(event, data, **kwargs)
+                except Exception as e:
+                    logger.error(f"Error relaying {event} event: {str(e)}")
+            sleep(RELAY_INTERVAL)
+
+
+class HubEmitter:
+    """Stand-in for socketio that queues events for the hub's relay greenlet"""
+
+    def __init__(self, events, socketio):
+        # deque.append is atomic, so OS threads can add events without a lock
+        self.events = events
+        self.socketio = socketio
+
+    def emit(self, event, data=None, **kwargs):
+        self.events.append((self.socketio, event, data, kwargs))
+
+
+def original_threading():
+    """Return the threading module as it was before eventlet or gevent patched it.
+
+    Its locks, events and threads block the OS thread rather than switching
+    greenlets, so they work between the hub and offloaded threads; a green
+    lock waited on from another OS thread deadlocks or raises "cannot switch
+    to a different thread". Without monkey-patching this is just threading.
+    """
+    global _original_threading
+    if _original_threading is None:
+        _original_threading = _load_original_threading()
+    return _original_threading
+
+
+def _load_original_threading():
+    if 'eventlet' in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched('thread'):
+            return patcher.original('threading')
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched('threading'):
+            return _gevent_original_threading(monkey)
+    return threading
+
+
+def _gevent_original_threading(monkey):
+    """Import a fresh copy of threading on top of gevent's saved _thread functions"""
+    import types
+    import _thread
+
+    original_thread = types.ModuleType('_thread')
+    original_thread.__dict__.update(_thread.__dict__)
+    for name in ('allocate_lock', 'LockType', 'start_new_thread', 'get_ident', 'stack_size', '_local', 'exit'):
+        setattr(original_thread, name, monkey.get_original('_thread', name))
+
+    spec = importlib.util.find_spec('threading')
+    module = importlib.util.module_from_spec(spec)
+    patched_thread = sys.modules['_thread']
+    sys.modules['_thread'] = original_thread
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.modules['_thread'] = patched_thread
+    return module
@@ -4,7 +4,11 @@ from werkzeug.utils import secure_filename
 from PyPDF2 import PdfReader, PdfWriter
 import uuid
 import time
+import io
 import logging
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_upload
+from modules.fast_path import run_inline
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -18,7 +22,7 @@ def register_routes(app, socketio):
     
     @app.route('/rotate', methods=['POST'])
     def rotate_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -26,7 +30,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -40,28 +44,34 @@ def register_routes(app, socketio):
         pages_option = request.form.get('pages', 'all')
         page_range = request.form.get('rotate_range', '')
         
+        # Small documents can be rotated inline and returned directly (?sync=1)
+        response = run_inline('rotate', pdf_file, [{
+            'op': 'rotate',
+            'angle': angle,
+            'pages_option': pages_option,
+            'page_range': page_range
+        }], 'rotated')
+        if response is not None:
+            return response
+        
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            rotate_pdf, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'rotate',
+            rotate_pdf,
+            'Rotating PDF...',
             file_path=file_path,
             angle=angle,
             pages_option=pages_option,
             page_range=page_range,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Rotating PDF...'})
     
     @app.route('/watermark', methods=['POST'])
     def watermark_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -69,7 +79,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -84,25 +94,33 @@ def register_routes(app, socketio):
         opacity = int(request.form.get('opacity', '30'))
         position = request.form.get('position', 'middle-center')
         
+        # Small documents can be watermarked inline and returned directly (?sync=1)
+        if watermark_type == 'text':
+            response = run_inline('watermark', pdf_file, [{
+                'op': 'watermark',
+                'watermark_type': watermark_type,
+                'watermark_text': watermark_text,
+                'opacity': opacity,
+                'position': position
+            }], 'watermarked')
+            if response is not None:
+                return response
+        
         # Check if watermark image was uploaded
         watermark_image_path = None
-        if watermark_type == 'image' and 'watermark_image' in request.files:
-            watermark_image = request.files['watermark_image']
+        if watermark_type == 'image' and has_upload('watermark_image'):
+            watermark_image = get_upload('watermark_image')
             if watermark_image.filename != '':
-                image_filename = secure_filename(watermark_image.filename)
-                from app import UPLOAD_FOLDER
-                watermark_image_path = os.path.join(UPLOAD_FOLDER, image_filename)
-                watermark_image.save(watermark_image_path)
+                watermark_image_path = save_upload(watermark_image)
         
         # Save the uploaded PDF file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            add_watermark, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'watermark',
+            add_watermark,
+            'Adding watermark...',
             file_path=file_path,
             watermark_type=watermark_type,
             watermark_text=watermark_text,
@@ -111,9 +129,6 @@ def register_routes(app, socketio):
             position=position,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Adding watermark...'})
 
 def rotate_pdf(file_path, angle=90, pages_option='all', page_range='', socketio=None):
     """Rotate PDF pages"""
@@ -126,7 +141,8 @@ def rotate_pdf(file_path, angle=90, pages_option='all', page_range='', socketio=
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -157,28 +173,7 @@ def rotate_pdf(file_path, angle=90, pages_option='all', page_range='', socketio=
             return
         
         # Determine which pages to rotate
-        pages_to_rotate = []
-        
-        if pages_option == 'all':
-            pages_to_rotate = list(range(total_pages))
-        elif pages_option == 'custom' and page_range:
-            # Parse page range
-            ranges = page_range.split(',')
-            
-            for r in ranges:
-                if '-' in r:
-                    start, end = map(int, r.split('-'))
-                    # Adjust for 0-based indexing
-                    start = max(1, start) - 1
-                    end = min(total_pages, end) - 1
-                    pages_to_rotate.extend(range(start, end + 1))
-                else:
-                    try:
-                        page = int(r) - 1  # Adjust for 0-based indexing
-                        if 0 <= page < total_pages:
-                            pages_to_rotate.append(page)
-                    except ValueError:
-                        continue
+        pages_to_rotate = select_pages(pages_option, page_range, total_pages)
         
         if not pages_to_rotate:
             if socketio:
@@ -199,12 +194,8 @@ def rotate_pdf(file_path, angle=90, pages_option='all', page_range='', socketio=
             })
         
         # Add all pages to writer, rotating specified pages
-        for i in range(total_pages):
-            page = reader.pages[i]
-            
-            if i in pages_to_rotate:
-                page.rotate(angle)
-            
+        rotate_pages(reader.pages, angle, pages_to_rotate)
+        for page in reader.pages:
             writer.add_page(page)
         
         # Create output file
@@ -261,7 +252,8 @@ def add_watermark(file_path, watermark_type='text', watermark_text='CONFIDENTIAL
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER, TEMP_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -300,85 +292,17 @@ def add_watermark(file_path, watermark_type='text', watermark_text='CONFIDENTIAL
                 'tool': 'watermark'
             })
         
-        # Create watermark PDF
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib.units import inch
-        from reportlab.lib.colors import Color
-        from reportlab.pdfbase import pdfmetrics
-        from reportlab.pdfbase.ttfonts import TTFont
-        import math
-        
-        # Create temp file for watermark
-        watermark_pdf_path = os.path.join(TEMP_FOLDER, f"watermark_{operation_id}.pdf")
-        
-        # Get page size from first page
+        # Build the watermark in memory, sized to the first page
         page = reader.pages[0]
-        page_width = float(page.mediabox.width)
-        page_height = float(page.mediabox.height)
-        
-        # Create canvas with page size
-        c = canvas.Canvas(watermark_pdf_path, pagesize=(page_width, page_height))
-        
-        # Set opacity
-        opacity_float = opacity / 100.0
-        c.setFillAlpha(opacity_float)
-        c.setStrokeAlpha(opacity_float)
-        
-        # Calculate position
-        x, y = 0, 0
-        
-        if position.startswith('top'):
-            y = page_height * 0.8
-        elif position.startswith('middle'):
-            y = page_height * 0.5
-        elif position.startswith('bottom'):
-            y = page_height * 0.2
-        
-        if position.endswith('left'):
-            x = page_width * 0.2
-        elif position.endswith('center'):
-            x = page_width * 0.5
-        elif position.endswith('right'):
-            x = page_width * 0.8
-        
-        # Add watermark
-        if watermark_type == 'text' and watermark_text:
-            # Set font and size
-            font_size = min(page_width, page_height) * 0.1
-            c.setFont("Helvetica", font_size)
-            c.setFillColorRGB(0, 0, 0)  # Black color
-            
-            # Draw text
-            c.saveState()
-            c.translate(x, y)
-            c.rotate(45)  # Rotate text 45 degrees
-            text_width = c.stringWidth(watermark_text, "Helvetica", font_size)
-            c.drawString(-text_width/2, 0, watermark_text)
-            c.restoreState()
-        
-        elif watermark_type == 'image' and watermark_image_path:
-            # Draw image
-            from PIL import Image
-            img = Image.open(watermark_image_path)
-            img_width, img_height = img.size
-            
-            # Scale image to fit page (max 30% of page width)
-            max_width = page_width * 0.3
-            scale = min(1, max_width / img_width)
-            
-            # Calculate dimensions
-            width = img_width * scale
-            height = img_height * scale
-            
-            # Draw image
-            c.drawImage(watermark_image_path, x - width/2, y - height/2, width=width, height=height)
-        
-        c.save()
-        
-        # Create watermark reader
-        watermark_reader = PdfReader(watermark_pdf_path)
-        watermark_page = watermark_reader.pages[0]
+        watermark_page = create_watermark_page(
+            float(page.mediabox.width),
+            float(page.mediabox.height),
+            watermark_type,
+            watermark_text,
+            watermark_image_path,
+            opacity,
+            position
+        )
         
         # Add watermark to each page
         if socketio:
@@ -389,9 +313,8 @@ def add_watermark(file_path, watermark_type='text', watermark_text='CONFIDENTIAL
                 'tool': 'watermark'
             })
         
-        for i in range(total_pages):
-            page = reader.pages[i]
-            page.merge_page(watermark_page)
+        watermark_pages(reader.pages, watermark_page)
+        for page in reader.pages:
             writer.add_page(page)
         
         # Create output file
@@ -434,4 +357,107 @@ def add_watermark(file_path, watermark_type='text', watermark_text='CONFIDENTIAL
                 'status': 'error', 
                 'message': f'❌ Error adding watermark: {str(e)}',
                 'tool': 'watermark'
-            })
\ No newline at end of file
+            })
+
+def select_pages(pages_option, page_range, total_pages):
+    """Return the 0-based page numbers chosen by a rotate pages option and range"""
+    pages = []
+    
+    if pages_option == 'all':
+        pages = list(range(total_pages))
+    elif pages_option == 'custom' and page_range:
+        # Parse page range
+        ranges = page_range.split(',')
+        
+        for r in ranges:
+            if '-' in r:
+                start, end = map(int, r.split('-'))
+                # Adjust for 0-based indexing
+                start = max(1, start) - 1
+                end = min(total_pages, end) - 1
+                pages.extend(range(start, end + 1))
+            else:
+                try:
+                    page = int(r) - 1  # Adjust for 0-based indexing
+                    if 0 <= page < total_pages:
+                        pages.append(page)
+                except ValueError:
+                    continue
+    
+    return pages
+
+def rotate_pages(pages, angle, page_numbers):
+    """Rotate the given pages (0-based) of a page list in place"""
+    for i in sorted(set(page_numbers)):
+        pages[i].rotate(angle)
+
+def create_watermark_page(page_width, page_height, watermark_type='text', watermark_text='CONFIDENTIAL',
+                          watermark_image_path=None, opacity=30, position='middle-center'):
+    """Draw a watermark with reportlab and return it as a PDF page to merge onto others"""
+    from reportlab.pdfgen import canvas
+    
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(page_width, page_height))
+    
+    # Set opacity
+    opacity_float = opacity / 100.0
+    c.setFillAlpha(opacity_float)
+    c.setStrokeAlpha(opacity_float)
+    
+    # Calculate position
+    x, y = 0, 0
+    
+    if position.startswith('top'):
+        y = page_height * 0.8
+    elif position.startswith('middle'):
+        y = page_height * 0.5
+    elif position.startswith('bottom'):
+        y = page_height * 0.2
+    
+    if position.endswith('left'):
+        x = page_width * 0.2
+    elif position.endswith('center'):
+        x = page_width * 0.5
+    elif position.endswith('right'):
+        x = page_width * 0.8
+    
+    # Add watermark
+    if watermark_type == 'text' and watermark_text:
+        # Set font and size
+        font_size = min(page_width, page_height) * 0.1
+        c.setFont("Helvetica", font_size)
+        c.setFillColorRGB(0, 0, 0)  # Black color
+        
+        # Draw text
+        c.saveState()
+        c.translate(x, y)
+        c.rotate(45)  # Rotate text 45 degrees
+        text_width = c.stringWidth(watermark_text, "Helvetica", font_size)
+        c.drawString(-text_width/2, 0, watermark_text)
+        c.restoreState()
+    
+    elif watermark_type == 'image' and watermark_image_path:
+        # Draw image
+        from PIL import Image
+        img = Image.open(watermark_image_path)
+        img_width, img_height = img.size
+        
+        # Scale image to fit page (max 30% of page width)
+        max_width = page_width * 0.3
+        scale = min(1, max_width / img_width)
+        
+        # Calculate dimensions
+        width = img_width * scale
+        height = img_height * scale
+        
+        # Draw image
+        c.drawImage(watermark_image_path, x - width/2, y - height/2, width=width, height=height)
+    
+    c.save()
+    buffer.seek(0)
+    return PdfReader(buffer).pages[0]
+
+def watermark_pages(pages, watermark_page):
+    """Merge a watermark page onto every page of a page list"""
+    for page in pages:
+        page.merge_page(watermark_page)
@@ -0,0 +1,337 @@
+from flask import Blueprint, request, jsonify
+import os
+import json
+import uuid
+import logging
+from PyPDF2 import PdfReader, PdfWriter
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_upload
+from modules.fast_path import run_inline
+from modules.compress_pdf import COMPRESSION_LEVELS, compress_page, format_file_size
+from modules.organize_pdf import select_pages, rotate_pages, create_watermark_page, watermark_pages
+from modules.protect_pdf import encrypt_writer, decrypt_reader
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+pipeline_bp = Blueprint('pipeline', __name__)
+
+PIPELINE_OPERATIONS = ('unlock', 'rotate', 'watermark', 'compress', 'protect')
+MAX_PIPELINE_STEPS = 20
+
+
+class PipelineError(ValueError):
+    """Raised for a list of pipeline operations that can't be run"""
+
+
+def parse_operations(value):
+    """Validate a pipeline's operations and return them with defaults filled in.
+
+    `value` is a JSON list such as
+    [{"op": "unlock", "password": "old"}, {"op": "rotate", "angle": 90},
+     {"op": "watermark", "watermark_text": "DRAFT"}, {"op": "compress", "compression_level": "high"},
+     {"op": "protect", "password": "new"}]
+    Options use the same names as the form fields of the single-tool routes.
+    """
+    try:
+        operations = json.loads(value) if isinstance(value, str) else value
+    except ValueError:
+        raise PipelineError('Operations must be a JSON list.')
+    if not isinstance(operations, list) or not operations:
+        raise PipelineError('Operations must be a non-empty JSON list.')
+    if len(operations) > MAX_PIPELINE_STEPS:
+        raise PipelineError(f'A pipeline can have at most {MAX_PIPELINE_STEPS} operations.')
+
+    steps = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in PIPELINE_OPERATIONS:
+            raise PipelineError(f"Operation {index + 1} must be one of: {', '.join(PIPELINE_OPERATIONS)}.")
+        op = operation['op']
+
+        if op == 'unlock':
+            if index != 0:
+                raise PipelineError('unlock must be the first operation.')
+            if not operation.get('password'):
+                raise PipelineError('unlock needs a password.')
+            steps.append({'op': op, 'password': str(operation['password'])})
+
+        elif op == 'rotate':
+            try:
+                angle = int(operation.get('angle', 90))
+            except (TypeError, ValueError):
+                angle = None
+            if angle is None or angle % 90:
+                raise PipelineError('rotate needs an angle that is a multiple of 90.')
+            pages_option = operation.get('pages', 'all')
+            page_range = str(operation.get('rotate_range', ''))
+            if pages_option == 'custom':
+                _check_page_range(page_range)
+            steps.append({
+                'op': op,
+                'angle': angle,
+                'pages_option': pages_option,
+                'page_range': page_range
+            })
+
+        elif op == 'watermark':
+            watermark_type = operation.get('watermark_type', 'text')
+            if watermark_type == 'text' and not operation.get('watermark_text'):
+                raise PipelineError('watermark needs a watermark_text.')
+            try:
+                opacity = int(operation.get('opacity', 30))
+            except (TypeError, ValueError):
+                raise PipelineError('watermark opacity must be a number.')
+            steps.append({
+                'op': op,
+                'watermark_type': watermark_type,
+                'watermark_text': str(operation.get('watermark_text', '')),
+                'opacity': opacity,
+                'position': operation.get('position', 'middle-center')
+            })
+
+        elif op == 'compress':
+            compression_level = operation.get('compression_level', 'medium')
+            if compression_level not in COMPRESSION_LEVELS:
+                raise PipelineError(f"compress compression_level must be one of: {', '.join(COMPRESSION_LEVELS)}.")
+            steps.append({'op': op, 'compression_level': compression_level})
+
+        elif op == 'protect':
+            if any(step['op'] == 'protect' for step in steps):
+                raise PipelineError('protect can only be used once.')
+            password = operation.get('password')
+            if not password:
+                raise PipelineError('protect needs a password.')
+            if 'confirm_password' in operation and operation['confirm_password'] != password:
+                raise PipelineError('Passwords do not match.')
+            steps.append({
+                'op': op,
+                'password': str(password),
+                'allow_print': _parse_flag(operation, 'allow_print'),
+                'allow_copy': _parse_flag(operation, 'allow_copy'),
+                'allow_modify': _parse_flag(operation, 'allow_modify')
+            })
+
+    return steps
+
+
+def _parse_flag(operation, name):
+    """Read a permission flag given as a JSON boolean or as a string ("false", "0", "on", ...)"""
+    value = operation.get(name, True)
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _check_page_range(page_range):
+    """Reject a rotate_range that select_pages() would fail on, such as "1-x" or "3-" """
+    for part in page_range.split(','):
+        if not part.strip():
+            continue
+        try:
+            bounds = [int(bound) for bound in part.split('-')]
+        except ValueError:
+            bounds = []
+        if not 1 <= len(bounds) <= 2:
+            raise PipelineError(f'rotate_range has an invalid page or range: {part.strip()}')
+
+
+def register_routes(app, socketio):
+    """Register routes with the Flask app"""
+    app.register_blueprint(pipeline_bp)
+
+    @app.route('/pipeline', methods=['POST'])
+    def pipeline_route():
+        if not has_upload('pdf'):
+            return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
+
+        pdf_file = get_upload('pdf')
+        if pdf_file.filename == '':
+            return jsonify({'status': 'error', 'message': 'No PDF file was selected.'})
+
+        try:
+            operations = parse_operations(request.form.get('operations', ''))
+        except PipelineError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        # Small documents can be processed inline and returned directly (?sync=1);
+        # image watermarks need the image on disk, so they always run as a job
+        if not any(step['op'] == 'watermark' and step['watermark_type'] == 'image' for step in operations):
+            response = run_inline('pipeline', pdf_file, operations, 'processed')
+            if response is not None:
+                return response
+
+        # Image watermarks use the image uploaded alongside the PDF
+        watermark_image_path = None
+        if any(step['op'] == 'watermark' and step['watermark_type'] == 'image' for step in operations):
+            if not has_upload('watermark_image'):
+                return jsonify({'status': 'error', 'message': 'No watermark image was uploaded.'}), 400
+            watermark_image_path = save_upload(get_upload('watermark_image'))
+
+        # Save the uploaded file
+        file_path = save_upload(pdf_file)
+
+        # Queue the job on the scheduler
+        return start_job(
+            'pipeline',
+            run_pipeline,
+            'Processing PDF...',
+            file_path=file_path,
+            operations=operations,
+            watermark_image_path=watermark_image_path,
+            socketio=socketio
+        )
+
+def load_pages(reader, operations):
+    """Decrypt the document if the pipeline starts with unlock and return its pages"""
+    if reader.is_encrypted:
+        unlock = operations[0] if operations and operations[0]['op'] == 'unlock' else None
+        if unlock is None:
+            raise PipelineError('The PDF is password-protected; start the pipeline with unlock.')
+        if not decrypt_reader(reader, unlock['password']):
+            raise PipelineError('Incorrect password.')
+
+    pages = list(reader.pages)
+    if not pages:
+        raise PipelineError('The PDF file is empty.')
+    return pages
+
+
+def apply_operations(pages, operations, watermark_image_path=None, report=None):
+    """Apply the operations to in-memory pages and return the protect step, if any.
+
+    report(index, op, log_entry) is called after each step.
+    """
+    protect = None
+    for index, step in enumerate(operations):
+        op = step['op']
+        if op == 'rotate':
+            page_numbers = select_pages(step['pages_option'], step['page_range'], len(pages))
+            rotate_pages(pages, step['angle'], page_numbers)
+            log_entry = f"Rotated {len(page_numbers)} pages by {step['angle']}°"
+        elif op == 'watermark':
+            watermark_page = create_watermark_page(
+                float(pages[0].mediabox.width),
+                float(pages[0].mediabox.height),
+                step['watermark_type'],
+                step['watermark_text'],
+                watermark_image_path,
+                step['opacity'],
+                step['position']
+            )
+            watermark_pages(pages, watermark_page)
+            log_entry = f'Added watermark to {len(pages)} pages'
+        elif op == 'compress':
+            # Like compress_pdf(), every level currently compresses content streams the same way
+            compressed = sum(1 for page in pages if compress_page(page))
+            log_entry = f"Compressed content streams of {compressed} pages ({step['compression_level']} compression)"
+        elif op == 'protect':
+            protect = step
+            log_entry = 'Password protection will be applied when the PDF is written'
+        else:
+            log_entry = 'Removed password protection'
+
+        if report:
+            report(index, op, log_entry)
+    return protect
+
+
+def write_pages(pages, protect, stream):
+    """Serialize pages (encrypted if there is a protect step) to a binary stream"""
+    writer = PdfWriter()
+    for page in pages:
+        writer.add_page(page)
+    if protect:
+        encrypt_writer(writer, protect['password'], protect['allow_print'], protect['allow_copy'], protect['allow_modify'])
+    writer.write(stream)
+
+
+def run_pipeline(file_path, operations, watermark_image_path=None, socketio=None):
+    """Run a list of operations on one PDF, parsing it once and writing it once.
+
+    Every operation works on the same in-memory PyPDF2 pages, using the
+    same helpers as the single-tool functions; encryption from a protect
+    step is applied when the result is written.
+    """
+    if socketio:
+        socketio.emit('status_update', {
+            'status': 'processing',
+            'message': 'Reading PDF...',
+            'progress': 5,
+            'tool': 'pipeline',
+            'log_entry': f"Running {', '.join(step['op'] for step in operations)}"
+        })
+
+    try:
+        # Get paths
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
+
+        # Generate a unique ID for this operation
+        operation_id = uuid.uuid4().hex[:8]
+        base_filename = os.path.basename(file_path)
+        name_without_ext = os.path.splitext(base_filename)[0]
+        original_size = os.path.getsize(file_path)
+
+        try:
+            pages = load_pages(PdfReader(file_path), operations)
+        except PipelineError as e:
+            if socketio:
+                socketio.emit('status_update', {
+                    'status': 'error',
+                    'message': f'❌ {str(e)}',
+                    'tool': 'pipeline'
+                })
+            return
+
+        def report(index, op, log_entry):
+            if socketio:
+                socketio.emit('status_update', {
+                    'status': 'processing',
+                    'message': f"Step {index + 1} of {len(operations)}: {op}",
+                    'progress': 10 + int((index + 1) / len(operations) * 80),
+                    'tool': 'pipeline',
+                    'log_entry': log_entry
+                })
+
+        protect = apply_operations(pages, operations, watermark_image_path, report)
+
+        # Serialize once, at the end
+        output_filename = f"{name_without_ext}_processed_{operation_id}.pdf"
+        output_path = os.path.join(OUTPUT_FOLDER, output_filename)
+
+        with open(output_path, 'wb') as f:
+            write_pages(pages, protect, f)
+
+        output_size = os.path.getsize(output_path)
+
+        # Prepare download links
+        downloads = [
+            {
+                'name': output_filename,
+                'url': f'/download/{output_filename}',
+                'type': 'Processed PDF',
+                'filename': output_filename
+            }
+        ]
+
+        if socketio:
+            socketio.emit('status_update', {
+                'status': 'success',
+                'message': f'✅ Applied {len(operations)} operations successfully!',
+                'downloads': downloads,
+                'filename': output_filename,
+                'original_size': format_file_size(original_size),
+                'output_size': format_file_size(output_size),
+                'tool': 'pipeline',
+                'log_entry': f'Wrote {output_filename} ({format_file_size(output_size)})'
+            })
+
+    except Exception as e:
+        logger.error(f"Error running pipeline: {str(e)}")
+        if socketio:
+            socketio.emit('status_update', {
+                'status': 'error',
+                'message': f'❌ Error processing PDF: {str(e)}',
+                'tool': 'pipeline'
+            })
@@ -0,0 +1,182 @@
+import os
+import sys
+import hmac
+import time
+import pstats
+import cProfile
+import threading
+import logging
+from collections import Counter
+
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# cprofile: deterministic cProfile run, saved as pstats
+# sample:   statistical stack sampler, saved as collapsed stacks for flamegraphs
+# all:      both at once (the sampler then also sees cProfile's overhead)
+PROFILE_MODES = ('cprofile', 'sample', 'all')
+
+# Orders accepted for text reports (?sort=...)
+PROFILE_SORT_KEYS = tuple(key.value for key in pstats.SortKey)
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+
+
+class StackSampler:
+    """Periodically record the stack of one thread.
+
+    Samples are kept as collapsed stacks ("outer;inner;leaf count"), the
+    input format of flamegraph.pl, speedscope and most flamegraph viewers.
+    """
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        # A real OS thread, so it keeps sampling under eventlet/gevent too
+        self._stop = original_threading().Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = original_threading().Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def collapsed(self):
+        """Return the samples in collapsed-stack format"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+
+
+class ProfilingSwitch:
+    """Profile the next few jobs of a tool, armed from the admin API.
+
+    Useful when the slow request comes from a client that can't send the
+    profiling header, e.g. a customer re-submitting their document.
+    """
+
+    def __init__(self):
+        self._armed = {}
+        self._lock = threading.Lock()
+
+    def arm(self, tool, mode, count=1):
+        with self._lock:
+            if count > 0:
+                self._armed[tool] = (mode, count)
+            else:
+                self._armed.pop(tool, None)
+
+    def take(self, tool):
+        """Return the profiling mode for a new job of this tool, if armed"""
+        with self._lock:
+            mode, count = self._armed.get(tool, (None, 0))
+            if mode is None:
+                return None
+            if count <= 1:
+                del self._armed[tool]
+            else:
+                self._armed[tool] = (mode, count - 1)
+            return mode
+
+    def armed(self):
+        with self._lock:
+            return {tool: {'mode': mode, 'remaining': count} for tool, (mode, count) in self._armed.items()}
+
+
+def run_profiled(call, mode, job_id):
+    """Run call() under the requested profiler and save the results for the job"""
+    from modules.config import PROFILE_FOLDER
+
+    profiler = cProfile.Profile() if mode in ('cprofile', 'all') else None
+    sampler = StackSampler(original_threading().get_ident()) if mode in ('sample', 'all') else None
+
+    start = time.perf_counter()
+    if sampler:
+        sampler.start()
+    if profiler:
+        profiler.enable()
+    try:
+        return call()
+    finally:
+        if profiler:
+            profiler.disable()
+        if sampler:
+            sampler.stop()
+        elapsed = time.perf_counter() - start
+
+        try:
+            os.makedirs(PROFILE_FOLDER, exist_ok=True)
+            paths = profile_paths(job_id)
+            if profiler:
+                profiler.dump_stats(paths['pstats'])
+            if sampler:
+                with open(paths['collapsed'], 'w') as f:
+                    f.write(sampler.collapsed())
+            logger.info(f"Saved {mode} profile for job {job_id} ({elapsed:.2f}s)")
+        except Exception as e:
+            logger.error(f"Error saving profile for job {job_id}: {str(e)}")
+
+
+def profile_paths(job_id):
+    """Return where the profiles of a job are stored, by format"""
+    from modules.config import PROFILE_FOLDER
+
+    return {
+        'pstats': os.path.join(PROFILE_FOLDER, f'{job_id}.prof'),
+        'collapsed': os.path.join(PROFILE_FOLDER, f'{job_id}.collapsed')
+    }
+
+
+def pstats_report(path, sort='cumulative', limit=60):
+    """Return a text summary of a saved cProfile run"""
+    import io
+
+    stream = io.StringIO()
+    stats = pstats.Stats(path, stream=stream)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def is_admin(request, admin_token):
+    """Return True if the request carries the admin token"""
+    if not admin_token:
+        return False
+    supplied = request.headers.get('X-Admin-Token', '')
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        supplied = supplied or authorization[len('Bearer '):]
+    return hmac.compare_digest(supplied.encode('utf-8'), admin_token.encode('utf-8'))
+
+
+def requested_profile_mode(request, admin_token):
+    """Return the profiling mode asked for with the X-Profile header, if allowed"""
+    mode = request.headers.get('X-Profile', '').strip().lower()
+    if not mode:
+        return None
+    if mode in ('1', 'true', 'yes'):
+        mode = 'all'
+    if mode not in PROFILE_MODES:
+        logger.warning(f"Ignoring unknown profiling mode: {mode}")
+        return None
+    if not is_admin(request, admin_token):
+        logger.warning("Ignoring X-Profile header without a valid admin token")
+        return None
+    return mode
@@ -0,0 +1,101 @@
+import time
+
+from modules.config import PROGRESS_MAX_RATE
+from modules.cancellation import JobCancelled
+from modules.offload import original_threading
+
+# Statuses that end a job; these are never held back
+TERMINAL_STATUSES = ('success', 'error')
+
+
+class ProgressReporter:
+    """Coalesce a worker function's status updates before they are emitted.
+
+    Worker functions call emit() exactly as they would on socketio. Progress
+    updates are merged and sent at most max_rate times per second, log_entry
+    lines are collected and sent together as a log_entries list, and
+    terminal success/error updates are always sent straight away together
+    with any buffered log lines.
+
+    Every update is also a cancellation point: once cancel_event is set, the
+    next emit() raises JobCancelled. The worker functions report progress
+    in their page loops, so a cancelled job stops within a page.
+    """
+
+    def __init__(self, emitter, max_rate=None, clock=time.monotonic, cancel_event=None):
+        self.emitter = emitter
+        self.cancel_event = cancel_event
+        self.max_rate = PROGRESS_MAX_RATE if max_rate is None else max_rate
+        self.interval = 1.0 / self.max_rate if self.max_rate > 0 else 0
+        self.clock = clock
+
+        # Emitted to from the scheduler's OS threads, even under eventlet/gevent
+        self._lock = original_threading().Lock()
+        self._pending = None
+        self._log_entries = []
+        self._last_emit = None
+
+    def emit(self, event, data=None, **kwargs):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise JobCancelled()
+        if event != 'status_update' or not data:
+            self.flush()
+            self.emitter.emit(event, data, **kwargs)
+            return
+
+        data = dict(data)
+        log_entry = data.pop('log_entry', None)
+
+        with self._lock:
+            if log_entry:
+                self._log_entries.append(log_entry)
+
+            # Log lines without a message (per-file warnings and errors) only
+            # add to the log; they don't replace the current status
+            if 'message' in data:
+                if self._pending is None:
+                    self._pending = data
+                else:
+                    self._pending.update(data)
+            elif self._pending is None:
+                self._pending = {'status': 'processing', 'tool': data.get('tool')}
+
+            terminal = data.get('status') in TERMINAL_STATUSES and 'message' in data
+            now = self.clock()
+            due = self._last_emit is None or now - self._last_emit >= self.interval
+            if not (terminal or due):
+                return
+            payload = self._take_pending(now)
+
+        self.emitter.emit('status_update', payload, **kwargs)
+
+    def flush(self):
+        """Send any update that is still being held back"""
+        with self._lock:
+            if self._pending is None:
+                return
+            payload = self._take_pending(self.clock())
+        self.emitter.emit('status_update', payload)
+
+    def _take_pending(self, now):
+        """Build the coalesced payload and reset the buffers (lock must be held)"""
+        payload = self._pending
+        if self._log_entries:
+            payload['log_entries'] = self._log_entries
+        self._pending = None
+        self._log_entries = []
+        self._last_emit = now
+        return payload
+
+
+def run_with_reporter(func, kwargs, cancel_event=None):
+    """Call a worker function with its socketio wrapped in a ProgressReporter"""
+    emitter = kwargs.get('socketio')
+    if emitter is None:
+        return func(**kwargs)
+
+    reporter = ProgressReporter(emitter, cancel_event=cancel_event)
+    try:
+        return func(**dict(kwargs, socketio=reporter))
+    finally:
+        reporter.flush()
@@ -5,6 +5,9 @@ from PyPDF2 import PdfReader, PdfWriter
 import uuid
 import time
 import logging
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_upload
+from modules.fast_path import run_inline
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -18,7 +21,7 @@ def register_routes(app, socketio):
     
     @app.route('/protect', methods=['POST'])
     def protect_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -26,7 +29,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -60,15 +63,25 @@ def register_routes(app, socketio):
         allow_copy = 'allow_copy' in request.form
         allow_modify = 'allow_modify' in request.form
         
+        # Small documents can be protected inline and returned directly (?sync=1)
+        response = run_inline('protect', pdf_file, [{
+            'op': 'protect',
+            'password': password,
+            'allow_print': allow_print,
+            'allow_copy': allow_copy,
+            'allow_modify': allow_modify
+        }], 'protected')
+        if response is not None:
+            return response
+        
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            protect_pdf, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'protect',
+            protect_pdf,
+            'Protecting PDF...',
             file_path=file_path,
             password=password,
             allow_print=allow_print,
@@ -76,13 +89,10 @@ def register_routes(app, socketio):
             allow_modify=allow_modify,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Protecting PDF...'})
     
     @app.route('/unlock', methods=['POST'])
     def unlock_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -90,7 +100,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -110,22 +120,44 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'Password is required.'})
         
+        # Small documents can be unlocked inline and returned directly (?sync=1)
+        response = run_inline('unlock', pdf_file, [{'op': 'unlock', 'password': password}], 'unlocked',
+                              expect_encrypted=True)
+        if response is not None:
+            return response
+        
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
-        
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            unlock_pdf, 
+        file_path = save_upload(pdf_file)
+        
+        # Queue the job on the scheduler
+        return start_job(
+            'unlock',
+            unlock_pdf,
+            'Unlocking PDF...',
             file_path=file_path,
             password=password,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Unlocking PDF...'})
+
+def encrypt_writer(writer, password, allow_print=True, allow_copy=True, allow_modify=True):
+    """Encrypt a PdfWriter's output with a password and permission flags"""
+    permissions = 0
+    if allow_print:
+        permissions |= 4  # Print document
+    if allow_copy:
+        permissions |= 16  # Extract content
+    if allow_modify:
+        permissions |= 8   # Modify contents
+    
+    writer.encrypt(password, password, use_128bit=True, permissions_flag=permissions)
+
+def decrypt_reader(reader, password):
+    """Decrypt an encrypted PdfReader in place; return False if the password is wrong"""
+    try:
+        # PyPDF2 3 returns PasswordType.NOT_DECRYPTED (0) for a wrong password
+        return bool(reader.decrypt(password))
+    except Exception:
+        return False
 
 def protect_pdf(file_path, password, allow_print=True, allow_copy=True, allow_modify=True, socketio=None):
     """Protect PDF with password"""
@@ -138,7 +170,8 @@ def protect_pdf(file_path, password, allow_print=True, allow_copy=True, allow_mo
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -170,17 +203,8 @@ def protect_pdf(file_path, password, allow_print=True, allow_copy=True, allow_mo
                 'tool': 'protect'
             })
         
-        # Set permissions
-        permissions = 0
-        if allow_print:
-            permissions |= 4  # Print document
-        if allow_copy:
-            permissions |= 16  # Extract content
-        if allow_modify:
-            permissions |= 8   # Modify contents
-        
         # Encrypt the PDF
-        writer.encrypt(password, password, use_128bit=True, permissions_flag=permissions)
+        encrypt_writer(writer, password, allow_print, allow_copy, allow_modify)
         
         # Create output file
         if socketio:
@@ -235,7 +259,8 @@ def unlock_pdf(file_path, password, socketio=None):
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -264,9 +289,7 @@ def unlock_pdf(file_path, password, socketio=None):
             return
         
         # Try to decrypt with password
-        try:
-            reader.decrypt(password)
-        except:
+        if not decrypt_reader(reader, password):
             if socketio:
                 socketio.emit('status_update', {
                     'status': 'error', 
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import shutil
+import sqlite3
+import hashlib
+import logging
+from contextlib import contextmanager
+
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Job arguments that name input files; they are keyed by content, not path
+FILE_PARAMS = ('file_path', 'file_paths', 'image_paths', 'watermark_image_path')
+
+# Bumped when a tool's output changes, so entries made by the old code are no longer served
+TOOL_OUTPUT_VERSIONS = {
+    # compress Flate-encodes uncompressed content streams (compress_page)
+    'compress': 2
+}
+
+
+class ResultCache:
+    """Disk cache of finished job results.
+
+    Entries are keyed on the content hash of the job's inputs, the tool name
+    and the job's other parameters. The output files of a cached job are
+    hard-linked into the cache directory, so a hit can put them back into
+    the output folder (if the cleanup thread has removed them) and return
+    the original download links without running the tool again. The cache
+    is bounded by total size and evicts the least recently used entries.
+    """
+
+    def __init__(self, root, output_folder, max_bytes, upload_store):
+        self.root = root
+        self.output_folder = output_folder
+        self.max_bytes = max_bytes
+        self.upload_store = upload_store
+        self.index_path = os.path.join(root, 'index.sqlite3')
+        # Used from completion hooks, which run on OS threads under eventlet/gevent
+        self._lock = original_threading().Lock()
+
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    message TEXT,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+    def key_for(self, tool, kwargs):
+        """Return the cache key for a job, or None if its inputs can't be keyed"""
+        inputs = {}
+        params = {}
+        for name, value in kwargs.items():
+            if name == 'socketio':
+                continue
+            if name in FILE_PARAMS:
+                if value is None:
+                    inputs[name] = None
+                    continue
+                paths = value if isinstance(value, (list, tuple)) else [value]
+                digests = [self.upload_store.digest_for(path) for path in paths]
+                if None in digests:
+                    return None
+                inputs[name] = digests
+            else:
+                params[name] = value
+
+        material = {'tool': tool, 'inputs': inputs, 'params': params}
+        if tool in TOOL_OUTPUT_VERSIONS:
+            material['version'] = TOOL_OUTPUT_VERSIONS[tool]
+        try:
+            material = json.dumps(material, sort_keys=True)
+        except TypeError:
+            return None
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return (message, result) for a cached job, or None on a miss"""
+        with self._lock:
+            with self._connect() as db:
+                row = db.execute("SELECT message, result FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                message, result = row[0], json.loads(row[1])
+
+                if not self._restore_outputs(key, result):
+                    logger.warning(f"Dropping cache entry {key[:12]} with missing files")
+                    self._delete(db, key)
+                    return None
+
+                db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return message, result
+
+    def put(self, key, tool, message, result):
+        """Store the outputs of a successful job"""
+        entry_dir = os.path.join(self.root, key)
+        size = 0
+        try:
+            for relative_path in output_paths(result):
+                source = os.path.join(self.output_folder, relative_path)
+                target = os.path.join(entry_dir, relative_path)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _link_or_copy(source, target)
+                size += os.path.getsize(target)
+        except OSError as e:
+            logger.warning(f"Could not cache {tool} result: {str(e)}")
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return
+
+        if size > self.max_bytes:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            return
+
+        now = time.time()
+        with self._lock:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO entries (key, tool, message, result, size, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, tool, message, json.dumps(result), size, now, now)
+                )
+                self._evict(db)
+
+    def stats(self):
+        """Return the number of entries and their total size"""
+        with self._connect() as db:
+            count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'entries': count, 'bytes': total, 'max_bytes': self.max_bytes}
+
+    def _evict(self, db):
+        """Remove least recently used entries until the cache fits (lock must be held)"""
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall():
+            self._delete(db, key)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _delete(self, db, key):
+        db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    def _restore_outputs(self, key, result):
+        """Put cached output files back into the output folder if they are gone"""
+        for relative_path in output_paths(result):
+            target = os.path.join(self.output_folder, relative_path)
+            source = os.path.join(self.root, key, relative_path)
+            try:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _link_or_copy(source, target)
+                # Restart the output's lifetime so the cleanup thread keeps it
+                os.utime(target)
+            except OSError:
+                return False
+        return True
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.index_path, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+
+def output_paths(result):
+    """Return the output-folder relative paths of every download in a job result"""
+    paths = []
+    for value in result.values():
+        if not isinstance(value, list):
+            continue
+        for item in value:
+            if isinstance(item, dict) and str(item.get('url', '')).startswith('/download/'):
+                relative_path = item['url'][len('/download/'):]
+                if relative_path not in paths:
+                    paths.append(relative_path)
+    return paths
+
+
+def _link_or_copy(source, target):
+    if os.path.exists(target):
+        return
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
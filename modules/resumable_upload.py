@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import uuid
+import base64
+import hashlib
+import threading
+import logging
+from flask import Blueprint, request, jsonify
+
+from modules.upload_store import CHUNK_SIZE, safe_upload_name
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Create blueprint
+resumable_bp = Blueprint('resumable_upload', __name__)
+
+# Version of the tus resumable upload protocol this endpoint follows
+TUS_VERSION = '1.0.0'
+
+
+class UploadInProgressError(Exception):
+    """Raised when a chunk arrives while another one is still being written"""
+
+
+class OffsetMismatchError(Exception):
+    """Raised when a chunk does not start at the upload's current offset"""
+
+    def __init__(self, offset):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class ResumableUploads:
+    """Chunked, resumable uploads into the upload store.
+
+    A client creates an upload with its total length, then sends the file
+    in PATCH requests that each start at the current offset. Chunks are
+    appended straight to a staging file and hashed as they arrive; if a
+    connection drops, the client asks for the offset and carries on from
+    there. When the last byte is written the file is committed to the
+    upload store under its digest, and tool routes can reference it by
+    upload ID instead of sending the file again.
+
+    Each upload is a directory holding the staged data and a small JSON
+    record, so offsets survive a restart (the running hash is rebuilt from
+    the staged bytes when needed).
+    """
+
+    def __init__(self, upload_store, ttl):
+        self.upload_store = upload_store
+        self.root = os.path.join(upload_store.root, '.resumable')
+        self.ttl = ttl
+        self._hashers = {}
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def create(self, filename, length):
+        """Start a new upload and return its record"""
+        upload_id = uuid.uuid4().hex
+        directory = self._directory(upload_id)
+        os.makedirs(directory)
+        open(os.path.join(directory, 'data'), 'wb').close()
+
+        info = {
+            'upload_id': upload_id,
+            'filename': safe_upload_name(filename),
+            'length': length,
+            'created_at': time.time(),
+            'complete': False
+        }
+        self._write_info(upload_id, info)
+        self._register(upload_id)
+        return info
+
+    def get(self, upload_id):
+        """Return an upload's record with its current offset, or None if it is unknown"""
+        if not _valid_id(upload_id):
+            return None
+        try:
+            with open(os.path.join(self._directory(upload_id), 'info.json')) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if info['complete']:
+            info['offset'] = info['length']
+        else:
+            try:
+                info['offset'] = os.path.getsize(os.path.join(self._directory(upload_id), 'data'))
+            except OSError:
+                return None
+        return info
+
+    def append(self, upload_id, offset, stream):
+        """Append a chunk at the given offset and return the updated record"""
+        with self._lock:
+            if upload_id in self._active:
+                raise UploadInProgressError(upload_id)
+            self._active.add(upload_id)
+
+        try:
+            info = self.get(upload_id)
+            if info is None:
+                return None
+            if info['complete'] or offset != info['offset']:
+                raise OffsetMismatchError(info['offset'])
+
+            data_path = os.path.join(self._directory(upload_id), 'data')
+            hasher = self._hasher_for(upload_id, data_path, offset)
+            remaining = info['length'] - offset
+            try:
+                with open(data_path, 'ab') as f:
+                    while remaining > 0:
+                        chunk = stream.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        hasher.update(chunk)
+                        remaining -= len(chunk)
+            except Exception:
+                # Whatever reached the disk counts; the hash is rebuilt from it
+                self._hashers.pop(upload_id, None)
+                raise
+
+            info['offset'] = info['length'] - remaining
+            self._hashers[upload_id] = (hasher, info['offset'])
+            self._register(upload_id)
+            if remaining == 0:
+                self._complete(upload_id, info, data_path, hasher)
+            return info
+        finally:
+            with self._lock:
+                self._active.discard(upload_id)
+
+    def _complete(self, upload_id, info, data_path, hasher):
+        """Move the finished upload into the content-addressed store"""
+        from app import artifact_index, UPLOAD_TTL
+
+        self._hashers.pop(upload_id, None)
+        stored = self.upload_store.commit(data_path, hasher.hexdigest(), info['filename'], info['length'])
+        artifact_index.register(self.upload_store.directory_for(stored.digest), UPLOAD_TTL, kind='upload')
+
+        info['complete'] = True
+        info['digest'] = stored.digest
+        info['path'] = stored.path
+        self._write_info(upload_id, info)
+        logger.info(f"Completed resumable upload {upload_id} ({info['length']} bytes)")
+
+    def _hasher_for(self, upload_id, data_path, offset):
+        """Return the running hash of an upload's first offset bytes"""
+        hasher, hashed = self._hashers.pop(upload_id, (None, None))
+        if hasher is None or hashed != offset:
+            # After a restart or an interrupted chunk, hash what is on disk
+            hasher = hashlib.sha256()
+            with open(data_path, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+        return hasher
+
+    def _register(self, upload_id):
+        """Give the upload directory (another) ttl seconds before it is reaped"""
+        from app import artifact_index
+
+        artifact_index.register(self._directory(upload_id), self.ttl, kind='resumable')
+
+    def _write_info(self, upload_id, info):
+        record = {key: value for key, value in info.items() if key != 'offset'}
+        info_path = os.path.join(self._directory(upload_id), 'info.json')
+        temp_path = info_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(record, f)
+        os.replace(temp_path, info_path)
+
+    def _directory(self, upload_id):
+        return os.path.join(self.root, upload_id)
+
+
+def parse_upload_metadata(value):
+    """Parse a tus Upload-Metadata header ('key base64value,key base64value')"""
+    metadata = {}
+    for item in (value or '').split(','):
+        parts = item.strip().split(' ', 1)
+        if not parts[0]:
+            continue
+        try:
+            metadata[parts[0]] = base64.b64decode(parts[1]).decode('utf-8') if len(parts) > 1 else ''
+        except (ValueError, UnicodeDecodeError):
+            logger.warning(f"Ignoring invalid upload metadata for {parts[0]}")
+    return metadata
+
+
+def _valid_id(upload_id):
+    return isinstance(upload_id, str) and len(upload_id) == 32 and all(c in '0123456789abcdef' for c in upload_id)
+
+
+def _tus_headers(response, info=None):
+    response.headers['Tus-Resumable'] = TUS_VERSION
+    response.headers['Cache-Control'] = 'no-store'
+    if info is not None:
+        response.headers['Upload-Offset'] = str(info['offset'])
+        response.headers['Upload-Length'] = str(info['length'])
+    return response
+
+
+def _status(info):
+    return {
+        'upload_id': info['upload_id'],
+        'filename': info['filename'],
+        'offset': info['offset'],
+        'length': info['length'],
+        'complete': info['complete']
+    }
+
+
+def register_routes(app, socketio):
+    """Register routes with the Flask app"""
+    app.register_blueprint(resumable_bp)
+
+    @app.route('/uploads', methods=['POST'])
+    def create_upload():
+        from app import resumable_uploads
+
+        try:
+            length = int(request.headers.get('Upload-Length', ''))
+        except ValueError:
+            return _tus_headers(jsonify({'status': 'error', 'message': 'Upload-Length header is required.'})), 400
+        if length <= 0 or length > app.config['MAX_CONTENT_LENGTH']:
+            return _tus_headers(jsonify({'status': 'error', 'message': 'File is too large or empty.'})), 413
+
+        metadata = parse_upload_metadata(request.headers.get('Upload-Metadata'))
+        filename = metadata.get('filename') or request.args.get('filename', '')
+
+        info = resumable_uploads.create(filename, length)
+        info['offset'] = 0
+        response = jsonify(dict(_status(info), status='created'))
+        response.headers['Location'] = f"/uploads/{info['upload_id']}"
+        return _tus_headers(response, info), 201
+
+    @app.route('/uploads/<upload_id>', methods=['HEAD', 'GET'])
+    def upload_status(upload_id):
+        from app import resumable_uploads
+
+        info = resumable_uploads.get(upload_id)
+        if info is None:
+            return _tus_headers(jsonify({'status': 'error', 'message': 'Upload not found.'})), 404
+        return _tus_headers(jsonify(_status(info)), info)
+
+    @app.route('/uploads/<upload_id>', methods=['PATCH'])
+    def append_upload(upload_id):
+        from app import resumable_uploads
+
+        if request.mimetype != 'application/offset+octet-stream':
+            return _tus_headers(jsonify({
+                'status': 'error',
+                'message': 'Chunks must be sent as application/offset+octet-stream.'
+            })), 415
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return _tus_headers(jsonify({'status': 'error', 'message': 'Upload-Offset header is required.'})), 400
+
+        try:
+            info = resumable_uploads.append(upload_id, offset, request.stream)
+        except OffsetMismatchError as e:
+            response = jsonify({'status': 'error', 'message': 'Offset does not match the upload.', 'offset': e.offset})
+            response.headers['Upload-Offset'] = str(e.offset)
+            return _tus_headers(response), 409
+        except UploadInProgressError:
+            return _tus_headers(jsonify({'status': 'error', 'message': 'Another chunk is still being written.'})), 409
+        except Exception as e:
+            logger.error(f"Error writing chunk for upload {upload_id}: {str(e)}")
+            return _tus_headers(jsonify({'status': 'error', 'message': 'Chunk could not be written.'})), 500
+
+        if info is None:
+            return _tus_headers(jsonify({'status': 'error', 'message': 'Upload not found.'})), 404
+        return _tus_headers(jsonify(_status(info)), info)
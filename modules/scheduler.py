@@ -0,0 +1,710 @@
+import uuid
+import time
+import hashlib
+import logging
+from modules.executors import ThreadBackend
+from modules.fair_queue import FairQueue
+from modules.admission import JobTooLargeError
+from modules.cancellation import JobCancelled
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept any more work"""
+
+
+class Job:
+    """A unit of work waiting for or running on the scheduler"""
+
+    def __init__(self, tool, func, kwargs, cache_key=None, profile=None, client=None, lane='bulk', job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.tool = tool
+        # Who submitted the job, and which lane it waits in (see FairQueue)
+        self.client = client
+        self.lane = lane
+        self.fair_tag = 0.0
+        self.func = func
+        self.kwargs = kwargs
+        self.cache_key = cache_key
+        self.profile = profile
+        # Estimated peak memory, set when admission control is on
+        self.cost = None
+        # Pages in the job's PDF inputs, counted once when it is submitted
+        self.pages = None
+        # Set to ask the job to stop; see JobScheduler.cancel()
+        self.cancel_event = original_threading().Event()
+        self.cancel_reason = None
+        self.state = 'queued'
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        # Latest status reported by the worker function
+        self.status = 'queued'
+        self.message = None
+        self.progress = 0
+        self.result = None
+        self.error = None
+
+    def to_dict(self):
+        """Return the job's public status"""
+        info = {
+            'job_id': self.id,
+            'tool': self.tool,
+            'lane': self.lane,
+            'state': self.state,
+            'status': self.status,
+            'message': self.message,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.cost:
+            info['cost'] = self.cost.to_dict()
+        if self.profile:
+            info['profile'] = {'mode': self.profile, 'url': f'/admin/profiles/{self.id}'}
+        return info
+
+
+class JobEmitter:
+    """Stand-in for socketio that is handed to a job's worker function.
+
+    Every event is tagged with the job ID and sent only to the job's room
+    instead of being broadcast to every connected client. Status updates
+    that carry a message are also recorded on the job so it can be polled.
+    """
+
+    def __init__(self, socketio, job):
+        self.socketio = socketio
+        self.job = job
+
+    def emit(self, event, data=None, **kwargs):
+        if event == 'status_update' and data:
+            data = dict(data, job_id=self.job.id)
+            self._record(data)
+        kwargs.setdefault('to', self.job.id)
+        self.socketio.emit(event, data, **kwargs)
+
+    def _record(self, data):
+        job = self.job
+        # Events without a message are log lines, e.g. a single file that
+        # failed during a merge; they don't change the job's status
+        if 'message' not in data:
+            return
+        job.status = data.get('status', job.status)
+        job.message = data['message']
+        if 'progress' in data:
+            job.progress = data['progress']
+        if job.status == 'success':
+            job.progress = 100
+            job.result = _result_of(data)
+        elif job.status == 'error':
+            job.error = data['message']
+        elif job.status == 'cancelled':
+            job.error = data['message']
+            # A cancelled batch still offers the files it finished
+            if 'downloads' in data:
+                job.result = _result_of(data)
+
+
+def _result_of(data):
+    """Return the result fields of a status update"""
+    return {key: value for key, value in data.items()
+            if key not in ('status', 'message', 'progress', 'log_entry', 'tool', 'job_id')}
+
+
+class JobScheduler:
+    """Run tool jobs on a fixed set of worker threads.
+
+    Jobs wait in a bounded queue that is fair across clients (see
+    FairQueue). Small jobs of the interactive tools go in an interactive
+    lane that is served first and has interactive_workers workers to
+    itself, so a rotate never waits behind bulk OCR. A job is only started
+    when its tool is below its concurrency limit, so a burst of OCR uploads
+    cannot rasterize more documents at once than the box can hold.
+    """
+
+    def __init__(self, max_workers=4, max_queue_size=100, tool_limits=None, default_limit=4,
+                 backends=None, tool_backends=None, job_retention=3600, offloader=None,
+                 admission=None, client_weights=None, max_queued_per_client=None,
+                 interactive_tools=(), interactive_max_pages=20, interactive_workers=1,
+                 default_backend='thread'):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.max_queued_per_client = max_queued_per_client
+        self.job_retention = job_retention
+        self.tool_limits = dict(tool_limits or {})
+        self.default_limit = default_limit
+
+        # Execution backends by name, and which one each tool runs on
+        self.backends = {'thread': ThreadBackend()}
+        self.backends.update(backends or {})
+        self.tool_backends = dict(tool_backends or {})
+        self.default_backend = default_backend
+
+        # Runs the blocking part of a job off the eventlet/gevent hub, if any
+        self.offloader = offloader
+
+        # Estimates each job's peak memory; running jobs share its budget
+        self.admission = admission
+        self._memory_in_use = 0
+
+        # Callables run with each job just before it is queued, and with the
+        # job again if the queue then turns it away
+        self.submit_hooks = []
+        self.rejection_hooks = []
+
+        # Callables run with each job after it finishes, successfully or not
+        self.completion_hooks = []
+
+        # Callables run with a job from open_job() when it is cancelled, so
+        # whatever coordinates its work (e.g. a batch) can stop it
+        self.cancel_hooks = []
+
+        # Small jobs of these tools run in the interactive lane; bulk jobs
+        # always leave interactive_workers workers free for them
+        self.interactive_tools = set(interactive_tools)
+        self.interactive_max_pages = interactive_max_pages
+        self.interactive_workers = min(interactive_workers, max_workers - 1) if self.interactive_tools else 0
+
+        self._pending = FairQueue(client_weights)
+        self._jobs = {}
+        self._running = {}
+        self._running_by_lane = {'interactive': 0, 'bulk': 0}
+        self._busy = 0
+        # Real OS threads and locks even under eventlet/gevent: workers block
+        # in tool code, and hooks reach the scheduler from offloaded threads
+        native = original_threading()
+        self._lock = native.Lock()
+        self._condition = native.Condition(self._lock)
+        self._workers = []
+        self._started = False
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for backend in self.backends.values():
+                backend.start()
+            for i in range(self.max_workers):
+                worker = original_threading().Thread(target=self._worker_loop, name=f'job-worker-{i}', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, tool, func, cache_key=None, profile=None, client=None, lane=None, job_id=None, **kwargs):
+        """Queue a job and return it, or raise QueueFullError or JobTooLargeError.
+
+        client identifies who submitted the job for fair queuing; lane is
+        'interactive' or 'bulk', or None to decide from the tool and page count.
+        job_id keeps the ID a job already has, e.g. one from the shared queue.
+        """
+        self.start()
+        # Probing the input reads the PDF, so under eventlet/gevent it runs off the hub too
+        if self.offloader:
+            cost, lane, pages = self.offloader.call(self._assess, tool, kwargs, lane)
+        else:
+            cost, lane, pages = self._assess(tool, kwargs, lane)
+        if cost is not None and cost.degraded:
+            # The result doesn't match what was asked for, so don't cache it
+            cache_key = None
+        job = Job(tool, func, kwargs, cache_key=cache_key, profile=profile, client=client, lane=lane, job_id=job_id)
+        job.cost = cost
+        job.pages = pages
+        if kwargs.get('socketio') is not None:
+            socketio = kwargs['socketio']
+            if self.offloader:
+                socketio = self.offloader.emitter(socketio)
+            kwargs['socketio'] = JobEmitter(socketio, job)
+        # Before queueing, so a hook always runs before the job can finish
+        self._run_hooks(self.submit_hooks, job)
+        backend = self.backend_for(tool)
+        try:
+            if getattr(backend, 'durable', False):
+                self._submit_durable(job, backend)
+            else:
+                with self._condition:
+                    if len(self._pending) >= self.max_queue_size:
+                        raise QueueFullError(f'Job queue is full ({self.max_queue_size} jobs waiting)')
+                    if self.max_queued_per_client and client is not None and \
+                            self._pending.count_for(client) >= self.max_queued_per_client:
+                        raise QueueFullError(f'Too many jobs waiting for one client ({self.max_queued_per_client})')
+                    self._prune_jobs()
+                    self._jobs[job.id] = job
+                    self._pending.append(job)
+                    self._condition.notify()
+        except Exception:
+            self._run_hooks(self.rejection_hooks, job)
+            raise
+        return job
+
+    def _submit_durable(self, job, backend):
+        """Hand a job straight to a backend that queues it itself, e.g. the shared queue.
+
+        The backend applies the queue size and per-client limits and calls
+        _finish_durable() when the job has ended, so no worker waits for it.
+        """
+        with self._lock:
+            self._prune_jobs()
+            self._jobs[job.id] = job
+        args = (job, self._finish_durable, self.max_queue_size, self.max_queued_per_client)
+        try:
+            if self.offloader:
+                self.offloader.call(backend.submit, *args)
+            else:
+                backend.submit(*args)
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise
+
+    def _finish_durable(self, job, state, error=None):
+        """Record the end of a job queued by a durable backend"""
+        if job.finished_at is not None:
+            return
+        if state == 'cancelled':
+            self._mark_cancelled(job)
+            logger.info(f"Stopped cancelled {job.tool} job {job.id}")
+        elif state == 'failed' and job.status != 'error':
+            # Failed without reporting it, e.g. the worker function couldn't be loaded
+            job.state = 'failed'
+            job.status = 'error'
+            job.error = job.error or error or 'The job failed on the worker.'
+            logger.error(f"Unhandled error in {job.tool} job {job.id}: {job.error}")
+        else:
+            # Worker functions report their own errors instead of raising
+            job.state = 'failed' if job.status == 'error' else 'finished'
+        job.finished_at = time.time()
+        self._run_completion_hooks(job)
+
+    def _assess(self, tool, kwargs, lane):
+        """Return the job's cost (if admission control is on), its lane and its PDF page count"""
+        from modules.metrics import input_pages
+
+        cost = self.admission.admit(tool, kwargs) if self.admission else None
+        if cost is not None and cost.dpi is not None:
+            # Admission control already read every page of a rendering job
+            pages = cost.pages
+        else:
+            pages = input_pages(kwargs)
+        if lane is None:
+            lane = self.lane_for(tool, kwargs, pages)
+        return cost, lane, pages
+
+    def lane_for(self, tool, kwargs, pages):
+        """Return 'interactive' for a small job of an interactive tool, else 'bulk'"""
+        from modules.metrics import job_input_paths
+
+        if tool not in self.interactive_tools:
+            return 'bulk'
+        # Images and office documents count as one page each
+        others = sum(1 for path in job_input_paths(kwargs) if not path.lower().endswith('.pdf'))
+        return 'interactive' if pages + others <= self.interactive_max_pages else 'bulk'
+
+    def add_finished_job(self, tool, message, result):
+        """Register a job that was answered without running, e.g. from the result cache"""
+        job = Job(tool, None, {})
+        job.state = 'finished'
+        job.status = 'success'
+        job.message = message
+        job.progress = 100
+        job.result = result
+        job.started_at = job.finished_at = job.submitted_at
+        with self._lock:
+            self._prune_jobs()
+            self._jobs[job.id] = job
+        self._run_completion_hooks(job)
+        return job
+
+    def add_failed_job(self, tool, error):
+        """Register a job that was refused before it could run, e.g. by admission control"""
+        job = Job(tool, None, {})
+        job.state = 'failed'
+        job.status = 'error'
+        job.message = job.error = error
+        job.started_at = job.finished_at = job.submitted_at
+        with self._lock:
+            self._prune_jobs()
+            self._jobs[job.id] = job
+        self._run_completion_hooks(job)
+        return job
+
+    def open_job(self, tool, message=None):
+        """Register a job whose work is coordinated outside the workers, e.g. a batch"""
+        job = Job(tool, None, {})
+        job.state = 'running'
+        job.status = 'processing'
+        job.message = message
+        job.started_at = job.submitted_at
+        with self._lock:
+            self._prune_jobs()
+            self._jobs[job.id] = job
+        return job
+
+    def finish_job(self, job):
+        """Mark a job from open_job() as done, going by the last status it reported"""
+        if job.status == 'cancelled':
+            job.state = 'cancelled'
+        else:
+            job.state = 'failed' if job.status == 'error' else 'finished'
+        job.finished_at = time.time()
+        self._run_completion_hooks(job)
+
+    def cancel(self, job_id, reason='Cancelled.'):
+        """Stop a job and return it, or None if it is unknown.
+
+        A queued job is dropped from the queue. A running job is stopped by
+        its backend: thread jobs at their next status update, process jobs
+        by terminating their process group. Finished jobs are left as they are.
+        """
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished_at is not None or job.cancel_event.is_set():
+                return job
+            job.cancel_event.set()
+            job.cancel_reason = reason
+            queued = job in self._pending
+            if queued:
+                self._pending.remove(job)
+
+        logger.info(f"Cancelling {job.tool} job {job.id}: {reason}")
+        if queued:
+            self._mark_cancelled(job)
+            self._run_completion_hooks(job)
+        elif job.func is not None:
+            self.backend_for(job.tool).cancel(job)
+        else:
+            self._run_hooks(self.cancel_hooks, job)
+        return job
+
+    def _mark_cancelled(self, job):
+        """Record a job as cancelled and tell its listeners"""
+        reason = job.cancel_reason or 'Cancelled.'
+        job.state = 'cancelled'
+        job.status = 'cancelled'
+        job.message = job.error = reason
+        job.finished_at = time.time()
+        socketio = job.kwargs.get('socketio')
+        if socketio is not None:
+            try:
+                socketio.emit('status_update', {'status': 'cancelled', 'message': f'⏹ {reason}', 'tool': job.tool})
+            except Exception as e:
+                logger.error(f"Error reporting cancellation of {job.id}: {str(e)}")
+
+    def get_job(self, job_id):
+        """Return a job by ID, or None if it is unknown or has expired"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune_jobs(self):
+        """Forget finished jobs older than the retention period (lock must be held)"""
+        cutoff = time.time() - self.job_retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def queue_position(self, job):
+        """Return the 1-based position of a job that has to wait, or 0 if it can start now"""
+        backend = self.backend_for(job.tool)
+        if getattr(backend, 'durable', False) and job.func is not None:
+            return backend.position(job) if job.state == 'queued' else 0
+        with self._lock:
+            if job not in self._pending:
+                return 0
+            free_workers = self.max_workers - self._busy
+            if job.lane != 'interactive':
+                free_workers = min(free_workers, self._bulk_slots())
+            ahead = 0
+            same_tool_ahead = 0
+            for pending_job in self._pending:
+                if pending_job is job:
+                    break
+                ahead += 1
+                if pending_job.tool == job.tool:
+                    same_tool_ahead += 1
+            tool_slots = self.limit_for(job.tool) - self._running.get(job.tool, 0)
+            fits = self.admission is None or not self._busy or \
+                self._reserved_memory(job) <= self.admission.memory_budget - self._memory_in_use
+            if ahead < free_workers and same_tool_ahead < tool_slots and fits:
+                return 0
+            return ahead + 1
+
+    def limit_for(self, tool):
+        """Return the concurrency limit for a tool"""
+        return self.tool_limits.get(tool, self.default_limit)
+
+    def backend_for(self, tool):
+        """Return the execution backend for a tool"""
+        name = self.tool_backends.get(tool, self.default_backend)
+        if name not in self.backends:
+            logger.warning(f"Unknown backend '{name}' for {tool}, using threads")
+            name = 'thread'
+        return self.backends[name]
+
+    def stats(self):
+        """Return a snapshot of queue and running counts"""
+        # Jobs of durable backends wait in the backend's own queue: {(tool, lane): jobs}
+        queued = {}
+        for backend in self.backends.values():
+            if getattr(backend, 'durable', False):
+                queued.update(backend.queued_jobs())
+        with self._lock:
+            for job in self._pending:
+                queued[job.tool, job.lane] = queued.get((job.tool, job.lane), 0) + 1
+            queued_by_tool = {}
+            queued_by_lane = {'interactive': 0, 'bulk': 0}
+            for (tool, lane), jobs in queued.items():
+                queued_by_tool[tool] = queued_by_tool.get(tool, 0) + jobs
+                queued_by_lane[lane] += jobs
+            return {
+                'queued': sum(queued.values()),
+                'queued_by_tool': queued_by_tool,
+                'queued_by_lane': queued_by_lane,
+                'running': dict(self._running),
+                'running_by_lane': dict(self._running_by_lane),
+                'max_queue_size': self.max_queue_size,
+                'max_workers': self.max_workers,
+                'memory_in_use': self._memory_in_use,
+                'memory_budget': self.admission.memory_budget if self.admission else None
+            }
+
+    def _reserved_memory(self, job):
+        """Return the memory a job holds while it runs; jobs on remote backends hold none here"""
+        if job.cost is None or getattr(self.backend_for(job.tool), 'remote', False):
+            return 0
+        return job.cost.memory
+
+    def _bulk_slots(self):
+        """Return how many more bulk jobs may start (lock must be held)"""
+        return self.max_workers - self.interactive_workers - self._running_by_lane['bulk']
+
+    def _next_runnable(self):
+        """Pop the first job in fair order whose tool and lane have a free slot and whose memory fits (lock must be held)"""
+        free_memory = self.admission.memory_budget - self._memory_in_use if self.admission else None
+        bulk_slots = self._bulk_slots()
+        for job in self._pending:
+            if self._running.get(job.tool, 0) >= self.limit_for(job.tool):
+                continue
+            if job.lane != 'interactive' and bulk_slots <= 0:
+                continue
+            memory = self._reserved_memory(job)
+            # An idle scheduler always starts the oldest job; admission
+            # control has made sure it fits in the budget on its own
+            if free_memory is not None and memory > free_memory and self._busy:
+                # Set the memory aside for this job, so a stream of
+                # smaller jobs behind it can't keep it waiting forever
+                free_memory -= memory
+                continue
+            self._pending.remove(job)
+            self._pending.started(job)
+            return job
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                job = self._next_runnable()
+                while job is None:
+                    self._condition.wait()
+                    job = self._next_runnable()
+                self._running[job.tool] = self._running.get(job.tool, 0) + 1
+                self._running_by_lane[job.lane] += 1
+                self._busy += 1
+                memory = self._reserved_memory(job)
+                self._memory_in_use += memory
+
+            self._run(job)
+
+            with self._condition:
+                self._running[job.tool] -= 1
+                self._running_by_lane[job.lane] -= 1
+                self._busy -= 1
+                self._memory_in_use -= memory
+                # A slot for this tool opened up; wake every worker so one
+                # of them can pick a job that was held back by the limit
+                self._condition.notify_all()
+
+    def _run(self, job):
+        if job.cancel_event.is_set():
+            # Cancelled after being picked from the queue
+            self._mark_cancelled(job)
+            self._run_completion_hooks(job)
+            return
+
+        job.state = 'running'
+        job.started_at = time.time()
+        try:
+            # Workers are OS threads, so this never blocks the eventlet/gevent hub
+            self.backend_for(job.tool).run(job)
+            # Worker functions report their own errors instead of raising
+            job.state = 'failed' if job.status == 'error' else 'finished'
+        except JobCancelled:
+            self._mark_cancelled(job)
+            logger.info(f"Stopped cancelled {job.tool} job {job.id}")
+        except Exception as e:
+            job.state = 'failed'
+            job.status = 'error'
+            job.error = job.error or str(e)
+            logger.error(f"Unhandled error in {job.tool} job {job.id}: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+
+        self._run_completion_hooks(job)
+
+    def _run_completion_hooks(self, job):
+        self._run_hooks(self.completion_hooks, job)
+
+    def _run_hooks(self, hooks, job):
+        # Hooks do file and SQLite I/O, so those run from the hub (e.g. when
+        # a request cancels a queued job) are offloaded like tool work
+        if self.offloader:
+            self.offloader.call(self._call_hooks, hooks, job)
+        else:
+            self._call_hooks(hooks, job)
+
+    def _call_hooks(self, hooks, job):
+        for hook in hooks:
+            try:
+                hook(job)
+            except Exception as e:
+                logger.error(f"Error in job hook for {job.id}: {str(e)}")
+
+
+def parse_tool_limits(value):
+    """Parse a 'tool=limit,tool=limit' string into a dict"""
+    limits = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        tool, limit = item.split('=', 1)
+        try:
+            limits[tool.strip()] = int(limit)
+        except ValueError:
+            logger.warning(f"Ignoring invalid tool concurrency limit: {item}")
+    return limits
+
+
+def parse_client_weights(value):
+    """Parse a 'client=weight,client=weight' string into a dict.
+
+    Clients are written as client_id() returns them ('ip:10.0.0.5'), except
+    that API keys are given in the clear ('key:SECRET') and hashed here.
+    """
+    weights = {}
+    for item in value.split(','):
+        if '=' not in item:
+            continue
+        client, weight = item.rsplit('=', 1)
+        client = client.strip()
+        if client.startswith('key:'):
+            client = _api_key_client(client[len('key:'):])
+        try:
+            weights[client] = float(weight)
+        except ValueError:
+            logger.warning(f"Ignoring invalid client weight: {item}")
+            continue
+        if weights[client] <= 0:
+            logger.warning(f"Ignoring invalid client weight: {item}")
+            del weights[client]
+    return weights
+
+
+def parse_api_keys(value):
+    """Parse a comma-separated list of API keys into the set of their client IDs"""
+    return {_api_key_client(key) for key in value.split(',') if key.strip()}
+
+
+def client_id(request):
+    """Return who is making a request, for fair queuing.
+
+    A known API key wins, then the browser session, then the remote address.
+    Only keys in API_KEYS or CLIENT_WEIGHTS count, and a session is only
+    trusted once its cookie comes back, so a client can't get a new identity
+    (and a new share of the queue) by sending a new key or dropping cookies.
+    """
+    from flask import session
+    from app import API_CLIENTS
+
+    api_key = request.headers.get('X-API-Key')
+    if api_key and _api_key_client(api_key) in API_CLIENTS:
+        return _api_key_client(api_key)
+    if 'client_id' in session:
+        return 'session:' + session['client_id']
+    session['client_id'] = uuid.uuid4().hex
+    return 'ip:' + (request.remote_addr or 'unknown')
+
+
+def _api_key_client(api_key):
+    # Keys end up in logs and stats, so only a hash of them is kept
+    return 'key:' + hashlib.sha256(api_key.strip().encode()).hexdigest()[:16]
+
+
+def start_job(tool, func, message, **kwargs):
+    """Submit a tool job from a route and build the JSON response"""
+    from flask import jsonify
+    from flask import request
+    from app import job_scheduler, result_cache, tool_metrics, profiling_switch, CACHEABLE_TOOLS, ADMIN_TOKEN
+    from modules.profiling import requested_profile_mode
+
+    # Profiled runs come from the X-Profile header or from the admin API
+    profile = requested_profile_mode(request, ADMIN_TOKEN) or profiling_switch.take(tool)
+
+    # Answer repeated requests for the same input and options from the cache;
+    # a profiled job always runs so there is something to profile
+    cache_key = result_cache.key_for(tool, kwargs) if tool in CACHEABLE_TOOLS else None
+    if cache_key and not profile:
+        cached = result_cache.get(cache_key)
+        if cached:
+            cached_message, result = cached
+            job = job_scheduler.add_finished_job(tool, cached_message, result)
+            logger.info(f"Serving {tool} job {job.id} from the result cache")
+            tool_metrics.record_request(tool, 'cached')
+            response = {
+                'status': 'success',
+                'message': cached_message,
+                'job_id': job.id,
+                'status_url': f'/jobs/{job.id}',
+                'queue_position': 0,
+                'cached': True
+            }
+            response.update(result)
+            return jsonify(response)
+
+    try:
+        job = job_scheduler.submit(tool, func, cache_key=cache_key, profile=profile,
+                                   client=client_id(request), **kwargs)
+    except JobTooLargeError as e:
+        logger.warning(f"Rejected {tool} job: {str(e)}")
+        tool_metrics.record_request(tool, 'too_large')
+        return jsonify({'status': 'error', 'message': str(e)}), 413
+    except QueueFullError as e:
+        logger.warning(f"Rejected {tool} job: {str(e)}")
+        tool_metrics.record_request(tool, 'rejected')
+        response = jsonify({'status': 'error', 'message': 'The server is busy. Please try again in a moment.'})
+        response.headers['Retry-After'] = '30'
+        return response, 429
+
+    tool_metrics.record_request(tool, 'queued')
+    position = job_scheduler.queue_position(job)
+    if job.cost and job.cost.degraded:
+        message = f'{message} Rendering at {job.cost.dpi} DPI instead of {job.cost.requested_dpi} to fit the memory limit.'
+    if position:
+        message = f'{message} (position {position} in queue)'
+
+    # Return immediately with a processing message; the client joins the
+    # job's Socket.IO room or polls /jobs/<job_id> for progress
+    return jsonify({
+        'status': 'processing',
+        'message': message,
+        'job_id': job.id,
+        'status_url': f'/jobs/{job.id}',
+        'queue_position': position
+    })
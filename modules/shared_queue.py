@@ -0,0 +1,516 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import importlib
+import logging
+from contextlib import contextmanager
+
+from modules.scheduler import QueueFullError
+from modules.offload import original_threading
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds without a heartbeat after which a running job's worker is presumed
+# dead and the job is queued again, and how often a job may be tried
+STALE_AFTER = 60
+MAX_ATTEMPTS = 3
+
+# Lanes in the order workers take jobs from them (see modules.fair_queue)
+LANE_ORDER = "CASE lane WHEN 'interactive' THEN 0 ELSE 1 END"
+
+
+class SharedJobQueue:
+    """Durable job queue in a SQLite database shared by every node.
+
+    Web nodes put jobs in; `python -m modules.worker` processes claim and run
+    them. Status updates a job emits are appended to an events table that
+    the web node which queued the job reads back and relays to Socket.IO,
+    along with a final job_finished event. Jobs survive restarts of either
+    tier: a job whose worker stops sending heartbeats is queued again.
+
+    Workers take interactive jobs first, then the job of the client with the
+    fewest running jobs (relative to its weight), then the oldest. The
+    database can live on a volume every node mounts, as long as it supports
+    file locking; WAL mode is left off because it doesn't work over NFS.
+    """
+
+    def __init__(self, path, stale_after=STALE_AFTER, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    function TEXT NOT NULL,
+                    kwargs TEXT NOT NULL,
+                    profile TEXT,
+                    client TEXT,
+                    weight REAL NOT NULL DEFAULT 1,
+                    lane TEXT NOT NULL DEFAULT 'bulk',
+                    owner TEXT,
+                    state TEXT NOT NULL,
+                    worker TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    status TEXT,
+                    message TEXT,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    submitted_at REAL NOT NULL,
+                    started_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, submitted_at)")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    owner TEXT,
+                    event TEXT NOT NULL,
+                    data TEXT
+                )
+            """)
+            db.execute("CREATE INDEX IF NOT EXISTS events_owner ON events (owner, seq)")
+
+    def put(self, job_id, tool, func, kwargs, owner=None, profile=None, client=None, weight=1, lane='bulk',
+            max_queued=None, max_queued_per_client=None):
+        """Queue a job; kwargs must be JSON-serializable and func importable by name.
+
+        Raises QueueFullError if max_queued jobs are already waiting, or
+        max_queued_per_client jobs of the same client.
+        """
+        kwargs = json.dumps(kwargs)
+        with self._connect(immediate=True) as db:
+            queued = db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+            if max_queued and queued >= max_queued:
+                raise QueueFullError(f'Job queue is full ({max_queued} jobs waiting)')
+            if max_queued_per_client and client is not None:
+                queued = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND client = ?", (client,)
+                ).fetchone()[0]
+                if queued >= max_queued_per_client:
+                    raise QueueFullError(f'Too many jobs waiting for one client ({max_queued_per_client})')
+            db.execute(
+                "INSERT INTO jobs (id, tool, function, kwargs, profile, client, weight, lane, owner, state, submitted_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (job_id, tool, function_name(func), kwargs, profile, client, weight, lane, owner, time.time())
+            )
+
+    def claim(self, worker, lanes=('interactive', 'bulk'), exclude_tools=()):
+        """Take the next job for a worker and return it as a dict, or None if there is nothing to do"""
+        lanes = list(lanes)
+        exclude_tools = list(exclude_tools)
+        if not lanes:
+            return None
+        now = time.time()
+        with self._connect(immediate=True) as db:
+            row = db.execute(
+                f"SELECT * FROM jobs AS q WHERE state = 'queued' "
+                f"AND lane IN ({_placeholders(lanes)}) AND tool NOT IN ({_placeholders(exclude_tools)}) "
+                f"ORDER BY {LANE_ORDER}, "
+                f"(SELECT COUNT(*) FROM jobs AS r WHERE r.state = 'running' AND r.client IS q.client) / q.weight, "
+                f"submitted_at LIMIT 1",
+                lanes + exclude_tools
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET state = 'running', worker = ?, attempts = attempts + 1, "
+                "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                (worker, now, now, row['id'])
+            )
+            db.execute(
+                "INSERT INTO events (job_id, owner, event, data) VALUES (?, ?, 'job_started', ?)",
+                (row['id'], row['owner'], json.dumps({'worker': worker}))
+            )
+        job = dict(row)
+        job['kwargs'] = json.loads(job['kwargs'])
+        return job
+
+    def heartbeat(self, worker, job_ids):
+        """Record that a worker is still running these jobs"""
+        job_ids = list(job_ids)
+        if not job_ids:
+            return
+        with self._connect() as db:
+            db.execute(
+                f"UPDATE jobs SET heartbeat_at = ? WHERE worker = ? AND state = 'running' "
+                f"AND id IN ({_placeholders(job_ids)})",
+                [time.time(), worker] + job_ids
+            )
+
+    def requeue_stale(self, now=None):
+        """Queue again the running jobs of workers that stopped sending heartbeats; return their IDs"""
+        now = time.time() if now is None else now
+        with self._connect(immediate=True) as db:
+            rows = db.execute(
+                "SELECT id, tool, worker, attempts, cancel_requested FROM jobs "
+                "WHERE state = 'running' AND heartbeat_at < ?",
+                (now - self.stale_after,)
+            ).fetchall()
+            for row in rows:
+                if row['cancel_requested'] or row['attempts'] >= self.max_attempts:
+                    cancelled = bool(row['cancel_requested'])
+                    error = 'Cancelled.' if cancelled else \
+                        f"❌ Error processing file: the worker stopped responding {row['attempts']} times."
+                    self._finish(db, row['id'], 'cancelled' if cancelled else 'failed',
+                                 {'status': 'cancelled' if cancelled else 'error', 'message': error, 'error': error})
+                else:
+                    db.execute(
+                        "UPDATE jobs SET state = 'queued', worker = NULL, started_at = NULL WHERE id = ?",
+                        (row['id'],)
+                    )
+                logger.warning(f"Worker {row['worker']} stopped responding; "
+                               f"{'giving up on' if row['attempts'] >= self.max_attempts else 'requeueing'} "
+                               f"{row['tool']} job {row['id']}")
+        return [row['id'] for row in rows]
+
+    def release(self, job_id):
+        """Put a claimed job back in the queue, e.g. when the worker couldn't take it after all"""
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET state = 'queued', worker = NULL, started_at = NULL, attempts = attempts - 1 "
+                "WHERE id = ? AND state = 'running'",
+                (job_id,)
+            )
+
+    def add_event(self, job_id, event, data, status=None):
+        """Append an event a job emitted, and update the job's latest status if given"""
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO events (job_id, owner, event, data) "
+                "SELECT id, owner, ?, ? FROM jobs WHERE id = ?",
+                (event, json.dumps(data), job_id)
+            )
+            if status:
+                self._set_status(db, job_id, status)
+
+    def finish(self, job_id, state, status=None):
+        """Record a job's final state and tell the web node that queued it"""
+        with self._connect() as db:
+            self._finish(db, job_id, state, status or {})
+
+    def cancel(self, job_id):
+        """Ask for a job to be cancelled; return its state, or None if it is unknown.
+
+        A queued job is cancelled right away. A running one is stopped by its
+        worker, which checks for cancel requests every time it polls the queue.
+        """
+        with self._connect(immediate=True) as db:
+            row = db.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row['state'] == 'queued':
+                self._finish(db, job_id, 'cancelled', {'status': 'cancelled', 'message': 'Cancelled.'})
+                return 'cancelled'
+            if row['state'] == 'running':
+                db.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            return row['state']
+
+    def cancel_requests(self, worker):
+        """Return the IDs of a worker's running jobs that somebody asked to cancel"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id FROM jobs WHERE worker = ? AND state = 'running' AND cancel_requested = 1",
+                (worker,)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def events(self, owner, after=0, limit=1000):
+        """Return (seq, job_id, event, data) of the events for a web node's jobs after seq"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT seq, job_id, event, data FROM events WHERE owner = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (owner, after, limit)
+            ).fetchall()
+        return [(row['seq'], row['job_id'], row['event'], json.loads(row['data'])) for row in rows]
+
+    def position(self, job_id):
+        """Return the 1-based position of a queued job, or 0 if none is ahead of it or it isn't queued.
+
+        Counts the queued jobs of the same or an earlier lane that were
+        queued before it; the fair order between clients is left out.
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT lane, state, submitted_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row['state'] != 'queued':
+                return 0
+            lane = 0 if row['lane'] == 'interactive' else 1
+            ahead = db.execute(
+                f"SELECT COUNT(*) FROM jobs WHERE state = 'queued' AND id != ? "
+                f"AND ({LANE_ORDER} < ? OR ({LANE_ORDER} = ? AND submitted_at <= ?))",
+                (job_id, lane, lane, row['submitted_at'])
+            ).fetchone()[0]
+        return ahead + 1 if ahead else 0
+
+    def queued_jobs(self):
+        """Return {(tool, lane): jobs} for the jobs waiting in the queue"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT tool, lane, COUNT(*) AS jobs FROM jobs WHERE state = 'queued' GROUP BY tool, lane"
+            ).fetchall()
+        return {(row['tool'], row['lane']): row['jobs'] for row in rows}
+
+    def last_seq(self):
+        with self._connect() as db:
+            return db.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+
+    def get(self, job_id):
+        """Return a job's public status like Job.to_dict(), or None if it is unknown"""
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            'job_id': row['id'],
+            'tool': row['tool'],
+            'lane': row['lane'],
+            'state': row['state'],
+            'status': row['status'] or row['state'],
+            'message': row['message'],
+            'progress': row['progress'],
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'submitted_at': row['submitted_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+            'worker': row['worker']
+        }
+
+    def stats(self):
+        """Return the number of jobs in each state"""
+        with self._connect() as db:
+            rows = db.execute("SELECT state, COUNT(*) AS jobs FROM jobs GROUP BY state").fetchall()
+        return {row['state']: row['jobs'] for row in rows}
+
+    def prune(self, retention, now=None):
+        """Forget jobs that finished more than retention seconds ago, and their events"""
+        cutoff = (time.time() if now is None else now) - retention
+        with self._connect() as db:
+            db.execute(
+                "DELETE FROM events WHERE job_id IN (SELECT id FROM jobs WHERE finished_at < ?)", (cutoff,))
+            return db.execute("DELETE FROM jobs WHERE finished_at < ?", (cutoff,)).rowcount
+
+    def _finish(self, db, job_id, state, status):
+        # The arguments can hold passwords, and aren't needed once the job is done
+        updated = db.execute(
+            "UPDATE jobs SET state = ?, finished_at = ?, kwargs = '{}' "
+            "WHERE id = ? AND state NOT IN ('finished', 'failed', 'cancelled')",
+            (state, time.time(), job_id)
+        ).rowcount
+        if not updated:
+            return
+        self._set_status(db, job_id, status)
+        db.execute(
+            "INSERT INTO events (job_id, owner, event, data) SELECT id, owner, 'job_finished', ? FROM jobs WHERE id = ?",
+            (json.dumps({'state': state, 'error': status.get('error')}), job_id)
+        )
+
+    def _set_status(self, db, job_id, status):
+        db.execute(
+            "UPDATE jobs SET status = COALESCE(?, status), message = COALESCE(?, message), "
+            "progress = COALESCE(?, progress), result = COALESCE(?, result), error = COALESCE(?, error) WHERE id = ?",
+            (status.get('status'), status.get('message'), status.get('progress'),
+             json.dumps(status['result']) if status.get('result') is not None else None,
+             status.get('error'), job_id)
+        )
+
+    @contextmanager
+    def _connect(self, immediate=False):
+        db = sqlite3.connect(self.path, timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:
+                if immediate:
+                    # Take the write lock up front so two workers can't claim the same job
+                    db.execute('BEGIN IMMEDIATE')
+                yield db
+        finally:
+            db.close()
+
+
+class SharedQueueBackend:
+    """Scheduler backend that runs jobs on the queue workers instead of locally.
+
+    The scheduler hands a job to submit() as soon as it is submitted, so it
+    is in the durable queue before the request returns and nothing waits in
+    this process's memory. One poller thread per web node reads the events
+    of all its jobs, relays them to the job's socketio, so polling
+    /jobs/<job_id> and Socket.IO rooms keep working, and reports each job
+    back to the scheduler when it ends.
+    """
+
+    name = 'shared'
+
+    # The job runs elsewhere, so it holds no local memory budget
+    remote = True
+
+    # Jobs are queued in the shared queue by submit() instead of waiting in
+    # the scheduler's own queue for a local worker
+    durable = True
+
+    def __init__(self, queue, owner=None, poll_interval=0.25, client_weights=None, retention=3600):
+        self.queue = queue
+        self.owner = owner or node_name()
+        self.poll_interval = poll_interval
+        self.client_weights = dict(client_weights or {})
+        self.retention = retention
+        self._waiting = {}
+        # The poller and the threads that submit and cancel jobs are OS
+        # threads, even under eventlet/gevent
+        self._lock = original_threading().Lock()
+        self._idle = original_threading().Event()
+        self._thread = None
+
+    def start(self):
+        """Start the poller thread (idempotent)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            # Events from before this process started belong to jobs it no longer waits for
+            seq = self.queue.last_seq()
+            self._thread = original_threading().Thread(target=self._poll, args=(seq,), name='shared-queue-poller',
+                                                       daemon=True)
+            self._thread.start()
+
+    def submit(self, job, on_finished, max_queued=None, max_queued_per_client=None):
+        """Put a job in the shared queue, or raise QueueFullError.
+
+        on_finished(job, state, error) is called from the poller thread when
+        the job has ended on a worker.
+        """
+        self.start()
+        kwargs = dict(job.kwargs)
+        socketio = kwargs.pop('socketio', None)
+        with self._lock:
+            self._waiting[job.id] = _Waiter(job, socketio, on_finished)
+        try:
+            self.queue.put(job.id, job.tool, job.func, kwargs, owner=self.owner, profile=job.profile,
+                           client=job.client, weight=self.client_weights.get(job.client, 1), lane=job.lane,
+                           max_queued=max_queued, max_queued_per_client=max_queued_per_client)
+        except Exception:
+            with self._lock:
+                self._waiting.pop(job.id, None)
+            raise
+        if job.cancel_event.is_set():
+            # Cancelled while it was being queued
+            self.queue.cancel(job.id)
+
+    def cancel(self, job):
+        self.queue.cancel(job.id)
+
+    def position(self, job):
+        """Return the job's position in the shared queue, or 0 if none is ahead of it"""
+        return self.queue.position(job.id)
+
+    def queued_jobs(self):
+        """Return {(tool, lane): jobs} for every job waiting in the shared queue"""
+        return self.queue.queued_jobs()
+
+    def _poll(self, seq):
+        last_prune = time.monotonic()
+        while True:
+            try:
+                for seq, job_id, event, data in self.queue.events(self.owner, seq):
+                    with self._lock:
+                        waiter = self._waiting.get(job_id)
+                    if waiter is not None and waiter.handle(event, data):
+                        with self._lock:
+                            self._waiting.pop(job_id, None)
+                if time.monotonic() - last_prune >= self.retention / 10:
+                    last_prune = time.monotonic()
+                    self.queue.prune(self.retention)
+            except Exception as e:
+                logger.error(f"Error reading the shared job queue: {str(e)}")
+            # Never set; an OS-thread sleep that monkey-patching doesn't turn green
+            self._idle.wait(self.poll_interval)
+
+
+class _Waiter:
+    """A queued job's web-side end: relays its events and reports when it ends"""
+
+    def __init__(self, job, socketio, on_finished):
+        self.job = job
+        self.socketio = socketio
+        self.on_finished = on_finished
+
+    def handle(self, event, data):
+        """Handle one of the job's events; return True once the job has ended"""
+        if event == 'job_started':
+            self.job.state = 'running'
+            self.job.started_at = time.time()
+        elif event == 'job_finished':
+            self.on_finished(self.job, data['state'], data.get('error'))
+            return True
+        elif self.socketio is not None:
+            try:
+                self.socketio.emit(event, data)
+            except Exception as e:
+                logger.error(f"Error relaying {event} event: {str(e)}")
+        return False
+
+
+class SharedQueueEmitter:
+    """Stand-in for socketio for a job a queue worker runs.
+
+    Events are written to the shared queue for the web node to relay, with
+    the job's latest status so /jobs/<job_id> can be answered by any node.
+    """
+
+    def __init__(self, queue, scheduler, job_id):
+        self.queue = queue
+        self.scheduler = scheduler
+        self.job_id = job_id
+
+    def emit(self, event, data=None, **kwargs):
+        job = self.scheduler.get_job(self.job_id)
+        try:
+            self.queue.add_event(self.job_id, event, data, status=job_status(job) if job else None)
+        except Exception as e:
+            logger.error(f"Error writing {event} event of job {self.job_id}: {str(e)}")
+
+
+def job_status(job):
+    """Return the status fields of a Job that the shared queue keeps"""
+    return {
+        'status': job.status,
+        'message': job.message,
+        'progress': job.progress,
+        'result': job.result,
+        'error': job.error
+    }
+
+
+def function_name(func):
+    """Return the 'module:function' name a worker loads a job's function by"""
+    return f'{func.__module__}:{func.__qualname__}'
+
+
+def load_function(name):
+    """Import the function named by function_name()"""
+    module_name, func_name = name.split(':', 1)
+    func = importlib.import_module(module_name)
+    for attribute in func_name.split('.'):
+        func = getattr(func, attribute)
+    return func
+
+
+def node_name():
+    """Return a name for this process that is unique across nodes"""
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+
+
+def _placeholders(values):
+    # "tool NOT IN ()" is valid in SQLite and matches every row
+    return ', '.join('?' * len(values))
@@ -5,6 +5,8 @@ from PyPDF2 import PdfReader, PdfWriter
 import uuid
 import time
 import logging
+from modules.scheduler import start_job
+from modules.upload_store import save_upload, has_upload, get_upload
 import zipfile
 
 # Configure logging
@@ -19,7 +21,7 @@ def register_routes(app, socketio):
     
     @app.route('/split', methods=['POST'])
     def split_route():
-        if 'pdf' not in request.files:
+        if not has_upload('pdf'):
             socketio.emit('status_update', {
                 'status': 'error', 
                 'message': '⚠️ No PDF file was uploaded.',
@@ -27,7 +29,7 @@ def register_routes(app, socketio):
             })
             return jsonify({'status': 'error', 'message': 'No PDF file was uploaded.'})
         
-        pdf_file = request.files['pdf']
+        pdf_file = get_upload('pdf')
         if pdf_file.filename == '':
             socketio.emit('status_update', {
                 'status': 'error', 
@@ -42,23 +44,19 @@ def register_routes(app, socketio):
         odd_even = request.form.get('odd_even', 'all')
         
         # Save the uploaded file
-        filename = secure_filename(pdf_file.filename)
-        from app import UPLOAD_FOLDER
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        pdf_file.save(file_path)
+        file_path = save_upload(pdf_file)
         
-        # Start a background thread for processing
-        thread = socketio.start_background_task(
-            split_pdf, 
+        # Queue the job on the scheduler
+        return start_job(
+            'split',
+            split_pdf,
+            'Splitting PDF...',
             file_path=file_path,
             split_method=split_method,
             page_range=page_range,
             odd_even=odd_even,
             socketio=socketio
         )
-        
-        # Return immediately with a processing message
-        return jsonify({'status': 'processing', 'message': 'Splitting PDF...'})
 
 def split_pdf(file_path, split_method='all', page_range='', odd_even='all', socketio=None):
     """Split PDF into multiple files"""
@@ -72,7 +70,8 @@ def split_pdf(file_path, split_method='all', page_range='', odd_even='all', sock
     
     try:
         # Get paths
-        from app import OUTPUT_FOLDER
+        from modules.config import output_folder
+        OUTPUT_FOLDER = output_folder()
         
         # Generate a unique ID for this operation
         operation_id = uuid.uuid4().hex[:8]
@@ -0,0 +1,137 @@
+import time
+import threading
+import importlib
+import logging
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Routes of each tool module: (rule, endpoint, methods). Registering these
+# only needs this table; the module itself (and pandas, python-pptx,
+# python-docx, pdfminer, PyPDF2...) is imported when one of its routes is
+# first requested or when the background warm-up gets to it.
+TOOL_ROUTES = {
+    'modules.merge_pdf': [
+        ('/merge', 'merge_route', ['POST'])
+    ],
+    'modules.split_pdf': [
+        ('/split', 'split_route', ['POST'])
+    ],
+    'modules.compress_pdf': [
+        ('/compress', 'compress_route', ['POST'])
+    ],
+    'modules.convert_pdf': [
+        ('/pdf_to_img', 'pdf_to_img_route', ['POST']),
+        ('/img_to_pdf', 'img_to_pdf_route', ['POST']),
+        ('/pdf_to_word', 'pdf_to_word_route', ['POST']),
+        ('/pdf_to_excel', 'pdf_to_excel_route', ['POST']),
+        ('/pdf_to_ppt', 'pdf_to_ppt_route', ['POST']),
+        ('/word_to_pdf', 'word_to_pdf_route', ['POST']),
+        ('/excel_to_pdf', 'excel_to_pdf_route', ['POST']),
+        ('/ppt_to_pdf', 'ppt_to_pdf_route', ['POST'])
+    ],
+    'modules.extract_pdf': [
+        ('/extract_text', 'extract_text_route', ['POST'])
+    ],
+    'modules.ocr_pdf': [
+        ('/ocr', 'ocr_route', ['POST'])
+    ],
+    'modules.protect_pdf': [
+        ('/protect', 'protect_route', ['POST']),
+        ('/unlock', 'unlock_route', ['POST'])
+    ],
+    'modules.organize_pdf': [
+        ('/rotate', 'rotate_route', ['POST']),
+        ('/watermark', 'watermark_route', ['POST'])
+    ],
+    'modules.edit_pdf': [
+        ('/edit', 'edit_route', ['POST'])
+    ],
+    'modules.pipeline': [
+        ('/pipeline', 'pipeline_route', ['POST'])
+    ]
+}
+
+
+class _RouteCollector:
+    """Stand-in for the Flask app passed to a tool module's register_routes.
+
+    Route decorators record the view functions instead of adding URL rules
+    (the rules already exist); everything else is forwarded to the real app.
+    """
+
+    def __init__(self, app):
+        self._app = app
+        self.views = {}
+
+    def route(self, rule, **options):
+        def decorator(func):
+            self.views[options.get('endpoint', func.__name__)] = func
+            return func
+        return decorator
+
+    def register_blueprint(self, blueprint, **options):
+        # The tool blueprints carry no routes of their own
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._app, name)
+
+
+class ToolRegistry:
+    """Register tool routes up front and import the tool modules on demand"""
+
+    def __init__(self, app, socketio, routes=None):
+        self.app = app
+        self.socketio = socketio
+        self.routes = routes or TOOL_ROUTES
+        self.load_times = {}
+
+        self._views = {}
+        self._locks = {module_name: threading.Lock() for module_name in self.routes}
+
+    def register_routes(self):
+        """Add a lazy view for every tool route"""
+        for module_name, routes in self.routes.items():
+            for rule, endpoint, methods in routes:
+                self.app.add_url_rule(
+                    rule,
+                    endpoint=endpoint,
+                    view_func=self._lazy_view(module_name, endpoint),
+                    methods=methods
+                )
+
+    def load(self, module_name):
+        """Import a tool module and collect its view functions (idempotent)"""
+        with self._locks[module_name]:
+            if module_name in self.load_times:
+                return
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            collector = _RouteCollector(self.app)
+            module.register_routes(collector, self.socketio)
+            self._views.update(collector.views)
+            self.load_times[module_name] = time.perf_counter() - start
+            logger.info(f"Loaded {module_name} in {self.load_times[module_name]:.2f}s")
+
+    def warm_up(self):
+        """Load every tool module in a background thread"""
+        def run():
+            for module_name in self.routes:
+                try:
+                    self.load(module_name)
+                except Exception as e:
+                    logger.error(f"Error loading {module_name}: {str(e)}")
+
+        threading.Thread(target=run, name='tool-warmup', daemon=True).start()
+
+    def _lazy_view(self, module_name, endpoint):
+        def view(**kwargs):
+            func = self._views.get(endpoint)
+            if func is None:
+                self.load(module_name)
+                func = self._views[endpoint]
+            return func(**kwargs)
+
+        view.__name__ = endpoint
+        return view
@@ -0,0 +1,282 @@
+import os
+import stat
+import shutil
+import hashlib
+import uuid
+import logging
+from werkzeug.utils import secure_filename
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+DIGEST_PREFIX_LENGTH = 32
+
+
+class StoredUpload:
+    """An uploaded file in the content-addressed store"""
+
+    def __init__(self, digest, path, size, reused):
+        self.digest = digest
+        self.path = path
+        self.filename = os.path.basename(path)
+        self.size = size
+        self.reused = reused
+
+
+class UploadStore:
+    """Content-addressed storage for uploaded files.
+
+    Each distinct file content gets a directory named after its SHA-256
+    digest, holding the file under its (sanitized) original name:
+
+        uploads/<digest>/<filename>
+
+    Two users uploading different files called "scan.pdf" land in different
+    directories, and uploading the same document again reuses the existing
+    copy without writing it a second time. Stored files are never modified,
+    so the path is an immutable input handle that can be passed to a job.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.temp_dir = os.path.join(root, '.incoming')
+
+    def save(self, file_storage):
+        """Store an uploaded werkzeug FileStorage and return a StoredUpload"""
+        filename = safe_upload_name(file_storage.filename)
+        stream = file_storage.stream
+
+        if not _is_seekable(stream):
+            return self.save_stream(stream, filename)
+
+        # The upload is already spooled by werkzeug, so hash it in place
+        # first and only copy it into the store if the content is new
+        start = stream.tell()
+        digest = _hash_stream(stream)
+        existing = self._find(digest, filename)
+        if existing:
+            return existing
+
+        stream.seek(start)
+        return self.save_stream(stream, filename)
+
+    def save_stream(self, stream, filename):
+        """Copy a stream into the store, hashing it while it is written"""
+        temp_path = self.new_temp_path()
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            return self.commit(temp_path, hasher.hexdigest(), filename, size)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def new_temp_path(self):
+        """Return a fresh path for staging a file before it is committed"""
+        os.makedirs(self.temp_dir, exist_ok=True)
+        return os.path.join(self.temp_dir, uuid.uuid4().hex)
+
+    def commit(self, temp_path, digest, filename, size):
+        """Move a fully written temp file into the store under its digest"""
+        existing = self._find(digest, filename)
+        if existing:
+            os.remove(temp_path)
+            return existing
+
+        target_dir = self.directory_for(digest)
+        os.makedirs(target_dir, exist_ok=True)
+        target_path = os.path.join(target_dir, filename)
+        try:
+            os.link(temp_path, target_path)
+        except FileExistsError:
+            # Another request stored the same content under the same name first
+            os.remove(temp_path)
+            return StoredUpload(digest, target_path, size, reused=True)
+        except OSError:
+            # Filesystems without hard links
+            shutil.copyfile(temp_path, target_path)
+        os.remove(temp_path)
+        _make_read_only(target_path)
+        return StoredUpload(digest, target_path, size, reused=False)
+
+    def directory_for(self, digest):
+        """Return the directory that holds files with the given digest"""
+        return os.path.join(self.root, digest[:DIGEST_PREFIX_LENGTH])
+
+    def digest_for(self, path):
+        """Return the digest prefix of a stored file, or None if the path isn't in the store"""
+        directory = os.path.dirname(os.path.abspath(path))
+        if os.path.dirname(directory) != os.path.abspath(self.root):
+            return None
+        name = os.path.basename(directory)
+        if len(name) != DIGEST_PREFIX_LENGTH:
+            return None
+        return name
+
+    def _find(self, digest, filename):
+        """Return the stored file for a digest, adding the filename if needed"""
+        target_dir = self.directory_for(digest)
+        target_path = os.path.join(target_dir, filename)
+
+        if os.path.isfile(target_path):
+            _touch(target_dir, target_path)
+            return StoredUpload(digest, target_path, os.path.getsize(target_path), reused=True)
+
+        # Same content uploaded under another name: link it under this name
+        try:
+            names = os.listdir(target_dir)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            source_path = os.path.join(target_dir, name)
+            try:
+                try:
+                    os.link(source_path, target_path)
+                except FileExistsError:
+                    pass
+                except OSError:
+                    shutil.copyfile(source_path, target_path)
+                    _make_read_only(target_path)
+            except FileNotFoundError:
+                # Removed by the cleanup thread while we were looking
+                continue
+            _touch(target_dir, target_path)
+            return StoredUpload(digest, target_path, os.path.getsize(target_path), reused=True)
+        return None
+
+
+def safe_upload_name(filename):
+    """Return a filesystem-safe name for an uploaded file"""
+    name = secure_filename(filename or '')
+    if not name or name.startswith('.'):
+        name = f"upload{name}"
+    return name
+
+
+class UploadReference:
+    """A completed resumable upload named by ID in a tool route's form"""
+
+    def __init__(self, upload_id, filename, path):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.path = path
+
+
+def has_upload(field):
+    """Return True if the request carries a file (or a completed upload ID) for a form field"""
+    return bool(get_uploads(field))
+
+
+def get_upload(field):
+    """Return the file for a form field: an uploaded file or an UploadReference"""
+    uploads = get_uploads(field)
+    return uploads[0] if uploads else None
+
+
+def get_uploads(field):
+    """Return every file for a form field.
+
+    Besides a regular multipart file, a field can hold the ID of a completed
+    resumable upload (see POST /uploads), so a large file only has to be
+    sent once.
+    """
+    from flask import request
+    from app import resumable_uploads
+
+    uploads = list(request.files.getlist(field))
+    for upload_id in request.form.getlist(field):
+        info = resumable_uploads.get(upload_id.strip())
+        if info is None or not info['complete'] or not os.path.isfile(info['path']):
+            logger.warning(f"Ignoring unknown or incomplete upload ID for {field}: {upload_id}")
+            continue
+        uploads.append(UploadReference(info['upload_id'], info['filename'], info['path']))
+    return uploads
+
+
+def save_upload(file_storage):
+    """Store an uploaded file and return the path to hand to a job"""
+    from app import upload_store, artifact_index, UPLOAD_TTL
+
+    if isinstance(file_storage, UploadReference):
+        # Already in the store; just keep it around for another UPLOAD_TTL
+        path = file_storage.path
+        digest = upload_store.digest_for(path)
+        artifact_index.register(upload_store.directory_for(digest), UPLOAD_TTL, kind='upload')
+        return path
+
+    stored = upload_store.save(file_storage)
+    if stored.reused:
+        logger.info(f"Reusing stored upload {stored.digest[:12]} for {stored.filename}")
+    artifact_index.register(upload_store.directory_for(stored.digest), UPLOAD_TTL, kind='upload')
+    return stored.path
+
+
+def pin_inputs(paths):
+    """Keep the stored uploads behind these paths until release_inputs() is called"""
+    from app import artifact_index
+
+    for directory in _upload_directories(paths):
+        artifact_index.pin(directory)
+
+
+def release_inputs(paths):
+    """Undo pin_inputs(), keeping the uploads for another UPLOAD_TTL"""
+    from app import artifact_index, UPLOAD_TTL
+
+    for directory in _upload_directories(paths):
+        artifact_index.release(directory, UPLOAD_TTL)
+
+
+def _upload_directories(paths):
+    from app import upload_store
+
+    directories = []
+    for path in paths:
+        digest = upload_store.digest_for(path) if isinstance(path, str) else None
+        if digest is not None:
+            directory = upload_store.directory_for(digest)
+            if directory not in directories:
+                directories.append(directory)
+    return directories
+
+
+def _hash_stream(stream):
+    hasher = hashlib.sha256()
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _is_seekable(stream):
+    try:
+        return stream.seekable()
+    except AttributeError:
+        return False
+
+
+def _touch(*paths):
+    """Refresh modification times so the cleanup thread keeps reused uploads"""
+    for path in paths:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+
+def _make_read_only(path):
+    # On Windows a read-only flag would stop the cleanup thread from
+    # removing the file, so only POSIX systems get the permission change
+    if os.name != 'nt':
+        os.chmod(path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
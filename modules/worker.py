@@ -0,0 +1,179 @@
+"""Run jobs from the shared job queue, for web nodes started with NODE_ROLE=web.
+
+    STORAGE_DIR=/mnt/shared python -m modules.worker --workers 8
+
+Web and worker nodes must see the same SHARED_QUEUE_PATH and storage
+folders (uploads, output, temp) at the same paths. Each worker runs jobs on
+a local JobScheduler, so TOOL_CONCURRENCY, TOOL_BACKENDS, PROCESS_WORKERS
+and JOB_MEMORY_BUDGET_MB apply per worker node exactly as they do in the
+web app. Add worker processes to run more jobs at once; stopping one puts
+its running jobs back in the queue once their heartbeats run out.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import logging
+
+from modules.config import (SHARED_QUEUE_PATH, OUTPUT_FOLDER, TEMP_FOLDER, DEFAULT_TOOL_CONCURRENCY, DEFAULT_TOOL_BACKENDS,
+                            DEFAULT_INTERACTIVE_TOOLS)
+from modules.shared_queue import SharedJobQueue, SharedQueueEmitter, job_status, load_function, node_name
+from modules.scheduler import JobScheduler, QueueFullError, parse_tool_limits
+from modules.executors import ProcessBackend, parse_tool_backends
+from modules.admission import AdmissionControl, JobTooLargeError, default_memory_budget
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Seconds between heartbeats for running jobs
+HEARTBEAT_INTERVAL = 10
+
+
+class QueueWorker:
+    """Claim jobs from the shared queue whenever the local scheduler has room.
+
+    A job is only claimed when a local worker thread is free for it, its
+    tool is below its concurrency limit and, for bulk jobs, the bulk lane
+    has a free worker, so jobs this node can't start yet stay in the shared
+    queue for other nodes to take.
+    """
+
+    def __init__(self, queue, scheduler, name=None, poll_interval=0.5, heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.queue = queue
+        self.scheduler = scheduler
+        self.name = name or node_name()
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        # job ID -> (tool, lane) of the jobs this worker has claimed and not finished
+        self._claimed = {}
+        # Set when a local job finishes, so the next one is claimed right away
+        self._wake = threading.Event()
+        scheduler.completion_hooks.append(self._on_job_finished)
+
+    def run(self):
+        logger.info(f"Worker {self.name} taking jobs from {self.queue.path}")
+        self.scheduler.start()
+        last_heartbeat = 0
+        while True:
+            try:
+                self.queue.requeue_stale()
+                while self._take_job():
+                    pass
+                if self._claimed:
+                    for job_id in self.queue.cancel_requests(self.name):
+                        self.scheduler.cancel(job_id, 'Cancelled by the user.')
+                if time.monotonic() - last_heartbeat >= self.heartbeat_interval:
+                    last_heartbeat = time.monotonic()
+                    self.queue.heartbeat(self.name, list(self._claimed))
+            except Exception as e:
+                logger.error(f"Error in queue worker {self.name}: {str(e)}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _take_job(self):
+        """Claim and start one job if there is room; return whether one was started"""
+        claimed = list(self._claimed.values())
+        if len(claimed) >= self.scheduler.max_workers:
+            return False
+        lanes = ['interactive']
+        bulk = sum(1 for _, lane in claimed if lane != 'interactive')
+        if bulk < self.scheduler.max_workers - self.scheduler.interactive_workers:
+            lanes.append('bulk')
+        by_tool = {}
+        for tool, _ in claimed:
+            by_tool[tool] = by_tool.get(tool, 0) + 1
+        saturated = [tool for tool, jobs in by_tool.items() if jobs >= self.scheduler.limit_for(tool)]
+
+        row = self.queue.claim(self.name, lanes=lanes, exclude_tools=saturated)
+        if row is None:
+            return False
+        self._claimed[row['id']] = (row['tool'], row['lane'])
+        logger.info(f"Running {row['tool']} job {row['id']}")
+
+        try:
+            func = load_function(row['function'])
+            self.scheduler.submit(
+                row['tool'], func, profile=row['profile'], client=row['client'], lane=row['lane'],
+                job_id=row['id'], socketio=SharedQueueEmitter(self.queue, self.scheduler, row['id']),
+                **row['kwargs']
+            )
+        except QueueFullError:
+            self._claimed.pop(row['id'], None)
+            self.queue.release(row['id'])
+            return False
+        except JobTooLargeError as e:
+            self._fail(row['id'], str(e))
+        except Exception as e:
+            logger.error(f"Could not start {row['tool']} job {row['id']}: {str(e)}")
+            self._fail(row['id'], f'❌ Error starting job: {str(e)}')
+        return True
+
+    def _fail(self, job_id, message):
+        self._claimed.pop(job_id, None)
+        self.queue.finish(job_id, 'failed', {'status': 'error', 'message': message, 'error': message})
+
+    def _on_job_finished(self, job):
+        """Scheduler completion hook"""
+        if self._claimed.pop(job.id, None) is None:
+            return
+        try:
+            self.queue.finish(job.id, job.state, job_status(job))
+        except Exception as e:
+            logger.error(f"Error recording the result of job {job.id}: {str(e)}")
+        self._wake.set()
+
+
+def build_scheduler(workers):
+    """Create the local scheduler, configured from the same environment variables as the web app"""
+    tool_limits = dict(DEFAULT_TOOL_CONCURRENCY)
+    tool_limits.update(parse_tool_limits(os.environ.get('TOOL_CONCURRENCY', '')))
+    tool_backends = dict(DEFAULT_TOOL_BACKENDS)
+    tool_backends.update(parse_tool_backends(os.environ.get('TOOL_BACKENDS', '')))
+    process_workers = int(os.environ.get('PROCESS_WORKERS', os.cpu_count() or 1))
+
+    memory_budget_mb = int(os.environ.get('JOB_MEMORY_BUDGET_MB', default_memory_budget() // (1024 * 1024)))
+    admission = None
+    if memory_budget_mb:
+        admission = AdmissionControl(memory_budget_mb * 1024 * 1024, min_dpi=int(os.environ.get('MIN_RENDER_DPI', 100)))
+
+    return JobScheduler(
+        max_workers=workers,
+        tool_limits=tool_limits,
+        default_limit=int(os.environ.get('JOB_DEFAULT_CONCURRENCY', 4)),
+        backends={'process': ProcessBackend(max_processes=process_workers)},
+        tool_backends=tool_backends,
+        job_retention=int(os.environ.get('JOB_RETENTION', 3600)),
+        admission=admission,
+        interactive_tools=[tool.strip() for tool in os.environ.get('INTERACTIVE_TOOLS', DEFAULT_INTERACTIVE_TOOLS).split(',')
+                           if tool.strip()],
+        interactive_workers=int(os.environ.get('INTERACTIVE_WORKERS', 1))
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m modules.worker', description=__doc__.split('\n')[0])
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('JOB_WORKERS', max(4, os.cpu_count() or 1))),
+                        help='jobs to run at once (default: JOB_WORKERS)')
+    parser.add_argument('--queue', default=SHARED_QUEUE_PATH, help='shared queue database (default: SHARED_QUEUE_PATH)')
+    parser.add_argument('--name', help='worker name shown in job status (default: host, PID and a random suffix)')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='seconds between queue checks when idle')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    os.makedirs(TEMP_FOLDER, exist_ok=True)
+
+    queue = SharedJobQueue(args.queue)
+    worker = QueueWorker(queue, build_scheduler(args.workers), name=args.name, poll_interval=args.poll_interval)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
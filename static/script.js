@@ -3,6 +3,10 @@
 // Initialize Socket.IO connection
 let socket;
 
+// Jobs this tab is waiting for, kept across reloads so they can be re-joined
+const ACTIVE_JOBS_KEY = 'activeJobs';
+const MAX_ACTIVE_JOBS = 20;
+
 // Connect to Socket.IO server
 function connectSocket() {
     socket = io();
@@ -18,6 +22,12 @@ function connectSocket() {
             connectionText.textContent = 'Connected';
             showNotification('Connected to server', 'success');
         }
+        
+        // Re-join after a reload or reconnect, so the server doesn't take
+        // the jobs for abandoned
+        getActiveJobs().forEach(jobId => {
+            socket.emit('join_job', { job_id: jobId });
+        });
     });
 
     socket.on('disconnect', () => {
@@ -36,6 +46,11 @@ function connectSocket() {
     socket.on('status_update', (data) => {
         const { status, message, progress, tool, downloads, filename, original_size, compressed_size, reduction_percent, preview_text, log_entry, detail } = data;
         
+        // Finished jobs no longer need re-joining
+        if (data.job_id && (status === 'success' || status === 'error' || status === 'cancelled')) {
+            forgetActiveJob(data.job_id);
+        }
+        
         // Play notification sounds for status changes
         if (status === 'success') {
             playNotificationSound('success');
@@ -64,7 +79,7 @@ function connectSocket() {
                 progressContainer.classList.remove('hidden');
                 
                 // Progress handling (entertainment features removed)
-            } else if (status === 'success' || status === 'error') {
+            } else if (status === 'success' || status === 'error' || status === 'cancelled') {
                 // Hide progress after a delay
                 setTimeout(() => {
                     progressContainer.classList.add('hidden');
@@ -81,6 +96,8 @@ function connectSocket() {
             // Second notification removed
         } else if (status === 'error' || status === 'warning') {
             showNotification(message, status);
+        } else if (status === 'cancelled') {
+            showNotification(message, 'warning');
         } else if (status === 'processing') {
             // Processing notifications removed
         }
@@ -319,6 +336,33 @@ function connectSocket() {
     });
 }
 
+// Active Job Tracking
+function getActiveJobs() {
+    try {
+        return JSON.parse(sessionStorage.getItem(ACTIVE_JOBS_KEY)) || [];
+    } catch (e) {
+        return [];
+    }
+}
+
+function setActiveJobs(jobIds) {
+    try {
+        sessionStorage.setItem(ACTIVE_JOBS_KEY, JSON.stringify(jobIds.slice(-MAX_ACTIVE_JOBS)));
+    } catch (e) {
+        // Storage unavailable (e.g. private browsing); jobs just aren't re-joined
+    }
+}
+
+function rememberActiveJob(jobId) {
+    const jobIds = getActiveJobs().filter(id => id !== jobId);
+    jobIds.push(jobId);
+    setActiveJobs(jobIds);
+}
+
+function forgetActiveJob(jobId) {
+    setActiveJobs(getActiveJobs().filter(id => id !== jobId));
+}
+
 // DOM Ready Event
 document.addEventListener('DOMContentLoaded', () => {
     // Connect to Socket.IO
@@ -665,8 +709,9 @@ function initForms() {
                 body: formData
             })
             .then(response => {
-                // Check if the response is valid JSON
-                if (!response.ok) {
+                // Check if the response is valid JSON (a busy server answers 429, and a job
+                // too large for the memory budget 413, with a JSON message)
+                if (!response.ok && response.status !== 429 && response.status !== 413) {
                     throw new Error(`Server responded with status: ${response.status}`);
                 }
                 
@@ -678,6 +723,12 @@ function initForms() {
                 return response.json();
             })
             .then(data => {
+                // Subscribe to this job's status updates
+                if (data.job_id) {
+                    rememberActiveJob(data.job_id);
+                    socket.emit('join_job', { job_id: data.job_id });
+                }
+                
                 if (data.status === 'error') {
                     showNotification(data.message, 'error');
                     
@@ -953,7 +1004,8 @@ function showEmailModal(filename) {
                 filename,
                 email,
                 subject,
-                message
+                message,
+                socket_id: socket ? socket.id : null
             })
         })
         .then(response => response.json())